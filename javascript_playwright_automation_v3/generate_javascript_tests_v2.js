@@ -17,7 +17,90 @@ function sanitizeTestName(name) {
     return sanitized.substring(0, 50);
 }
 
-function generateJsTestFile(csvFilePath, pageName) {
+function rowTestName(elementData, i) {
+    const elementType = elementData.element_type;
+    const elementTextForName = String(elementData.text || "");
+    const elementSelectorForName = String(elementData.selector_css || "");
+    let baseName = elementTextForName.trim() || elementSelectorForName.trim() || `${elementType}_item_${i}`;
+    return sanitizeTestName(`${elementType}_${baseName}_${i}`);
+}
+
+// Splits the columns into values shared by every row (e.g. page_url) and the columns
+// that vary, dropping columns that are empty in every row.
+function tableColumns(elements) {
+    const header = Object.keys(elements[0]);
+    const used = header.filter(column => elements.some(row => row[column]));
+    const shared = {};
+    const columns = [];
+    for (const column of used) {
+        if (elements.every(row => row[column] === elements[0][column])) {
+            shared[column] = elements[0][column];
+        } else {
+            columns.push(column);
+        }
+    }
+    return { shared, columns };
+}
+
+// One table-driven spec per page: an embedded row table and a loop creating one test per row
+// with the same names as the verbose output (e.g. link_test_automation_0).
+function writeCompactJsTestFile(testFilePath, csvFilePath, pageName, elements) {
+    const { shared, columns } = tableColumns(elements);
+    // Empty cells are null, as loadCsvData returns them.
+    const rows = elements.map((elementData, i) =>
+        `    ${JSON.stringify([rowTestName(elementData, i), ...columns.map(column => elementData[column] || null)])},`);
+    const testFileContent =
+`// @ts-check
+const { test } = require("@playwright/test");
+const { navigateToUrl, verifyLinkElement, verifyContentElement } = require("${COMMON_MODULE_PATH}");
+
+const PAGE_URL = "${elements[0].page_url}";
+// Generated from data/${path.basename(csvFilePath)}; regenerate after editing it.
+const SHARED = ${JSON.stringify(shared)};
+const COLUMNS = ${JSON.stringify(columns)};
+// [test name, ...COLUMNS] for each CSV row
+const ROWS = [
+${rows.join("\n")}
+];
+
+test.describe.configure({ mode: "parallel" }); // Enable parallel execution for tests within this file
+
+test.describe("${pageName} page tests", () => {
+    let sharedPage;
+
+    test.beforeAll(async ({ browser }) => {
+        sharedPage = await browser.newPage();
+        if (!(await navigateToUrl(sharedPage, PAGE_URL))) {
+            console.error("Failed to navigate in beforeAll for ${pageName}, subsequent tests may fail.");
+        }
+    });
+
+    test.afterAll(async () => {
+        if (sharedPage) {
+            await sharedPage.close();
+        }
+    });
+
+    for (const [testName, ...values] of ROWS) {
+        const elementData = { ...SHARED, ...Object.fromEntries(COLUMNS.map((column, i) => [column, values[i]])) };
+        test(testName, async () => {
+            if (!sharedPage) test.skip(true, "Page setup failed in beforeAll.");
+            if (elementData.element_type === "link") {
+                await verifyLinkElement(sharedPage, elementData, test);
+            } else if (elementData.element_type === "content") {
+                await verifyContentElement(sharedPage, elementData, test);
+            } else {
+                test.skip(true, \`Unsupported element type: \${elementData.element_type}\`);
+            }
+        });
+    }
+});
+`;
+    fs.writeFileSync(testFilePath, testFileContent);
+    console.log(`Generated compact JavaScript test file: ${testFilePath}`);
+}
+
+function generateJsTestFile(csvFilePath, pageName, compact = false) {
     const testFileName = `${pageName}.spec.js`;
     const testFilePath = path.join(TESTS_DIR, testFileName);
     let elements;
@@ -64,6 +147,11 @@ test.describe("${pageName} tests - (Data error)", () => {
         return;
     }
 
+    if (compact) {
+        writeCompactJsTestFile(testFilePath, csvFilePath, pageName, elements);
+        return;
+    }
+
     const pageUrl = elements[0].page_url;
 
     let testFileContent = 
@@ -115,10 +203,7 @@ test.describe("${pageName} page tests", () => {
 
     elements.forEach((elementData, i) => {
         const elementType = elementData.element_type;
-        const elementTextForName = String(elementData.text || "");
-        const elementSelectorForName = String(elementData.selector_css || "");
-        let baseName = elementTextForName.trim() || elementSelectorForName.trim() || `${elementType}_item_${i}`;
-        const testName = sanitizeTestName(`${elementType}_${baseName}_${i}`);
+        const testName = rowTestName(elementData, i);
 
         testFileContent += 
 `        test("${testName}", async () => {
@@ -171,6 +256,8 @@ test.describe("${pageName} page tests", () => {
 }
 
 function main() {
+    // --compact: one table-driven spec per page instead of a block of code per row
+    const compact = process.argv.includes("--compact");
     if (!fs.existsSync(TESTS_DIR)) {
         fs.mkdirSync(TESTS_DIR, { recursive: true });
     }
@@ -188,7 +275,7 @@ function main() {
             if (pageNameMatch) {
                 const pageName = pageNameMatch[1];
                 const csvFilePath = path.join(DATA_DIR, fileName);
-                generateJsTestFile(csvFilePath, pageName);
+                generateJsTestFile(csvFilePath, pageName, compact);
             }
         }
     });
@@ -1,5 +1,6 @@
 const fs = require("fs");
 const { expect } = require("@playwright/test");
+const resultCache = require("./result_cache.js");
 
 /**
  * Loads data from a CSV file and converts it to an array of objects.
@@ -49,8 +50,15 @@ function loadCsvData(filePath) {
 async function navigateToUrl(page, url) {
     try {
         console.log(`Navigating to URL: ${url}`);
-        await page.goto(url, { waitUntil: "domcontentloaded", timeout: 30000 });
+        const response = await page.goto(url, { waitUntil: "domcontentloaded", timeout: 30000 });
         await expect(page).toHaveURL(url, { timeout: 15000 });
+        if (response && !resultCache.getPageFingerprint(url)) {
+            try {
+                resultCache.rememberPageFingerprint(url, await response.body());
+            } catch (fpError) {
+                console.warn(`Could not fingerprint ${url}: ${fpError.message}`);
+            }
+        }
         console.log(`Successfully navigated to ${url}`);
         return true;
     } catch (error) {
@@ -69,6 +77,11 @@ async function verifyLinkElement(page, elementData) {
     const pageUrl = page.url();
     console.log(`DEBUG: Raw selector from elementData for link: "${selector}"`); // DEBUG LOG ADDED
     console.log(`Verifying link on ${pageUrl} with selector "${selector}", expected text "${expectedText}", expected href "${expectedHref}"`);
+    const fingerprint = resultCache.getPageFingerprint(pageUrl);
+    if (resultCache.isRowVerified(fingerprint, elementData)) {
+        console.log(`Link row for selector "${selector}" already verified against this page version, reusing result.`);
+        return;
+    }
 
     const linkElement = page.locator(selector).first();
     await linkElement.scrollIntoViewIfNeeded({ timeout: 5000 });
@@ -99,12 +112,19 @@ async function verifyLinkElement(page, elementData) {
                 const { URL } = require("url");
                 urlToCheck = new URL(urlToCheck, page.url()).href;
             }
+            const cachedStatus = resultCache.getLinkStatus(urlToCheck);
+            if (cachedStatus !== null) {
+                console.log(`Link ${urlToCheck} accessible per result cache. Status: ${cachedStatus}`);
+                resultCache.recordRowVerified(fingerprint, elementData);
+                return;
+            }
             console.log(`Checking accessibility of link: ${urlToCheck}`);
             const newPage = await page.context().newPage();
             try {
                 const response = await newPage.goto(urlToCheck, { waitUntil: "domcontentloaded", timeout: 20000 });
                 expect(response.status(), `Link ${urlToCheck} is broken or inaccessible.`).toBeLessThan(400);
                 console.log(`Link ${urlToCheck} is accessible. Status: ${response.status()}`);
+                resultCache.recordLinkStatus(urlToCheck, response.status());
             } catch (e) {
                 console.error(`Failed to access link ${urlToCheck}: ${e.message}`);
                 // For 403s on specific URLs, we might log a warning instead of failing if that's desired
@@ -115,6 +135,7 @@ async function verifyLinkElement(page, elementData) {
             }
         }
     }
+    resultCache.recordRowVerified(fingerprint, elementData);
 }
 
 /**
@@ -126,6 +147,11 @@ async function verifyContentElement(page, elementData) {
     const { selector, text: expectedText } = elementData;
     const pageUrl = page.url();
     console.log(`Verifying content on ${pageUrl} with selector "${selector}", expected text "${expectedText}"`);
+    const fingerprint = resultCache.getPageFingerprint(pageUrl);
+    if (resultCache.isRowVerified(fingerprint, elementData)) {
+        console.log(`Content row for selector "${selector}" already verified against this page version, reusing result.`);
+        return;
+    }
 
     const contentElement = page.locator(selector).first();
     await contentElement.scrollIntoViewIfNeeded({ timeout: 5000 });
@@ -137,6 +163,7 @@ async function verifyContentElement(page, elementData) {
 
     expect(normalizedActualText, `Content mismatch for selector "${selector}"`).toBe(normalizedExpectedText);
     console.log(`Content MATCH: Selector "${selector}"`);
+    resultCache.recordRowVerified(fingerprint, elementData);
 }
 
 module.exports = {
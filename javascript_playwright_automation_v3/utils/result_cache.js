@@ -0,0 +1,167 @@
+const fs = require("fs");
+const path = require("path");
+const crypto = require("crypto");
+
+// Shared with python_playwright_automation_v3/result_cache.py. Both suites must agree
+// on the directory layout, fingerprinting and key derivation below.
+const CACHE_DIR = process.env.PLATO_CACHE_DIR || path.join(__dirname, "..", "..", ".verification_cache");
+const CACHE_ENABLED = process.env.PLATO_RESULT_CACHE !== "0";
+const CACHE_TTL_SECONDS = parseInt(process.env.PLATO_RESULT_CACHE_TTL || "3600", 10);
+
+// Row passes are stored per rule set and only reused under the same rules: the Python suite
+// matches text and hrefs more loosely (similarity mode, canonical hrefs, its HTTP tier), so its
+// passes don't count here. Link statuses don't depend on the rules and stay shared.
+const RULES = "javascript";
+
+const SCRIPT_RE = /<script\b[^>]*>[\s\S]*?<\/script>/gi;
+const COMMENT_RE = /<!--[\s\S]*?-->/g;
+
+const pageFingerprints = new Map();
+
+function sha256(text) {
+    return crypto.createHash("sha256").update(text, "utf-8").digest("hex");
+}
+
+/**
+ * Hashes a page's document HTML, ignoring scripts, comments and whitespace.
+ * @param {string|Buffer} documentHtml - The raw document HTML.
+ * @returns {string} The page fingerprint.
+ */
+function computePageFingerprint(documentHtml) {
+    const html = Buffer.isBuffer(documentHtml) ? documentHtml.toString("utf-8") : String(documentHtml);
+    const stripped = html.replace(SCRIPT_RE, "").replace(COMMENT_RE, "");
+    return sha256(stripped.split(/\s+/).filter(Boolean).join(" "));
+}
+
+/**
+ * Fingerprints the document served for pageUrl and remembers it for this run.
+ * @param {string} pageUrl - The page URL.
+ * @param {string|Buffer} documentHtml - The raw document HTML.
+ * @returns {string} The page fingerprint.
+ */
+function rememberPageFingerprint(pageUrl, documentHtml) {
+    const fingerprint = computePageFingerprint(documentHtml);
+    pageFingerprints.set(pageUrl, fingerprint);
+    return fingerprint;
+}
+
+/**
+ * Returns the fingerprint recorded for pageUrl in this run, or null.
+ * @param {string} pageUrl - The page URL.
+ */
+function getPageFingerprint(pageUrl) {
+    return pageFingerprints.get(pageUrl) || null;
+}
+
+/**
+ * Derives a stable key for a CSV row from the fields that affect verification.
+ * @param {Object} elementData - The CSV row.
+ * @returns {string} The row key.
+ */
+function computeRowKey(elementData) {
+    const fields = [
+        elementData.element_type,
+        elementData.selector_css || elementData.selector,
+        elementData.text,
+        elementData.href,
+        elementData.match_mode,
+        elementData.min_similarity,
+    ];
+    const values = fields.map(value => (value === null || value === undefined ? "" : String(value).trim()));
+    return sha256(JSON.stringify(values));
+}
+
+function readEntry(filePath) {
+    let entry;
+    try {
+        entry = JSON.parse(fs.readFileSync(filePath, "utf-8"));
+    } catch (error) {
+        return null;
+    }
+    if (Date.now() / 1000 - (entry.checked_at || 0) > CACHE_TTL_SECONDS) {
+        return null;
+    }
+    return entry;
+}
+
+function writeEntry(filePath, entry) {
+    const directory = path.dirname(filePath);
+    try {
+        fs.mkdirSync(directory, { recursive: true });
+        const tmpPath = path.join(directory, `.${process.pid}.${crypto.randomBytes(6).toString("hex")}.tmp`);
+        fs.writeFileSync(tmpPath, JSON.stringify(entry));
+        fs.renameSync(tmpPath, filePath);
+    } catch (error) {
+        console.warn(`Could not write result cache entry ${filePath}: ${error.message}`);
+    }
+}
+
+function rowPath(fingerprint, rowKey) {
+    return path.join(CACHE_DIR, "results", fingerprint, RULES, `${rowKey}.json`);
+}
+
+function linkPath(url) {
+    return path.join(CACHE_DIR, "links", `${sha256(url)}.json`);
+}
+
+/**
+ * Returns true when this row already passed under this suite's rules against the same page fingerprint.
+ * @param {string|null} fingerprint - The page fingerprint.
+ * @param {Object} elementData - The CSV row.
+ */
+function isRowVerified(fingerprint, elementData) {
+    if (!CACHE_ENABLED || !fingerprint) {
+        return false;
+    }
+    const entry = readEntry(rowPath(fingerprint, computeRowKey(elementData)));
+    return Boolean(entry && entry.status === "passed");
+}
+
+/**
+ * Records that this row passed against the given page fingerprint.
+ * @param {string|null} fingerprint - The page fingerprint.
+ * @param {Object} elementData - The CSV row.
+ */
+function recordRowVerified(fingerprint, elementData) {
+    if (!CACHE_ENABLED || !fingerprint) {
+        return;
+    }
+    writeEntry(rowPath(fingerprint, computeRowKey(elementData)),
+        { status: "passed", checked_at: Date.now() / 1000, suite: "javascript", rules: RULES });
+}
+
+/**
+ * Returns a cached, successful HTTP status for url, or null.
+ * @param {string} url - The link URL.
+ */
+function getLinkStatus(url) {
+    if (!CACHE_ENABLED) {
+        return null;
+    }
+    const entry = readEntry(linkPath(url));
+    return entry ? entry.status : null;
+}
+
+/**
+ * Caches a link status. Only successful statuses are cached so failures are re-probed.
+ * @param {string} url - The link URL.
+ * @param {number} status - The HTTP status.
+ */
+function recordLinkStatus(url, status) {
+    if (!CACHE_ENABLED || status === null || status === undefined || status >= 400) {
+        return;
+    }
+    writeEntry(linkPath(url), { url, status, checked_at: Date.now() / 1000, suite: "javascript" });
+}
+
+module.exports = {
+    CACHE_DIR,
+    computePageFingerprint,
+    rememberPageFingerprint,
+    getPageFingerprint,
+    computeRowKey,
+    isRowVerified,
+    recordRowVerified,
+    getLinkStatus,
+    recordLinkStatus,
+};
@@ -0,0 +1,255 @@
+import csv
+import hashlib
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends aren't serialised between processes
+    fcntl = None
+
+import result_cache
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: set PLATO_A11Y_AUDIT=1 to audit each page navigate_to_url loads (one more in-page script per navigation).
+A11Y_AUDIT_ENABLED = os.environ.get("PLATO_A11Y_AUDIT", "0") == "1"
+# Optional path to axe.min.js (axe-core). When set, axe runs instead of the built-in rules.
+AXE_SCRIPT = os.environ.get("PLATO_AXE_SCRIPT", "")
+A11Y_DIR = "a11y"
+FINDINGS_FILE = os.path.join(A11Y_DIR, "a11y_findings.csv")
+FINDING_COLUMNS = ["rule", "impact", "selector", "message", "snippet"]
+# Elements with their own text checked for contrast; bounds the audit's cost on very long pages.
+MAX_CONTRAST_ELEMENTS = 2000
+
+# Built-in rules: alt text, link names, text contrast and landmarks, in a single page.evaluate.
+AUDIT_JS = """
+(maxContrastElements) => {
+    const findings = [];
+    const isHidden = el => {
+        for (let node = el; node && node.nodeType === 1; node = node.parentElement) {
+            if (node.getAttribute("aria-hidden") === "true" || node.hidden) return true;
+        }
+        const style = getComputedStyle(el);
+        return style.display === "none" || style.visibility === "hidden" || el.getClientRects().length === 0;
+    };
+    const cssPath = el => {
+        const parts = [];
+        for (let node = el; node && node.nodeType === 1 && parts.length < 5; node = node.parentElement) {
+            if (node.id) { parts.unshift("#" + CSS.escape(node.id)); break; }
+            let part = node.tagName.toLowerCase();
+            const siblings = node.parentElement ? [...node.parentElement.children].filter(s => s.tagName === node.tagName) : [];
+            if (siblings.length > 1) part += `:nth-of-type(${siblings.indexOf(node) + 1})`;
+            parts.unshift(part);
+        }
+        return parts.join(" > ");
+    };
+    const report = (rule, impact, el, message) => findings.push({
+        rule, impact, message, selector: el ? cssPath(el) : "html",
+        snippet: el ? el.outerHTML.slice(0, 160) : "",
+    });
+    const labelledBy = el => (el.getAttribute("aria-labelledby") || "").split(/\\s+/).filter(Boolean)
+        .map(id => (document.getElementById(id) || {}).textContent || "").join(" ").trim();
+    const accessibleName = el => (el.getAttribute("aria-label") || "").trim() || labelledBy(el)
+        || (el.innerText || el.textContent || "").trim()
+        || [...el.querySelectorAll("img[alt], [role=img][aria-label], svg title")]
+            .map(img => (img.getAttribute("alt") || img.getAttribute("aria-label") || img.textContent || "").trim())
+            .join(" ").trim()
+        || (el.getAttribute("title") || "").trim();
+
+    // image-alt: informative images need a text alternative; alt="" marks an image as decorative.
+    for (const img of document.querySelectorAll("img, input[type=image], [role=img]")) {
+        if (isHidden(img) || img.getAttribute("role") === "presentation" || img.getAttribute("role") === "none") continue;
+        const hasAlt = img.tagName === "IMG" || img.tagName === "INPUT" ? img.hasAttribute("alt") : false;
+        const svgTitle = img.querySelector(":scope > title");
+        if (!hasAlt && !(img.getAttribute("aria-label") || "").trim() && !labelledBy(img)
+                && !(img.getAttribute("title") || "").trim() && !(svgTitle && svgTitle.textContent.trim())) {
+            report("image-alt", "critical", img, "Image has no alt text, aria-label or title.");
+        }
+    }
+
+    // link-name: every link needs an accessible name.
+    for (const link of document.querySelectorAll("a[href], [role=link]")) {
+        if (!isHidden(link) && !accessibleName(link)) {
+            report("link-name", "serious", link, "Link has no discernible text.");
+        }
+    }
+
+    // color-contrast: WCAG AA, 4.5:1 for normal text and 3:1 for large text.
+    const parseColor = value => {
+        const match = value.match(/rgba?\\(([^)]+)\\)/);
+        if (!match) return null;
+        const [r, g, b, a = 1] = match[1].split(/[\\s,/]+/).filter(Boolean).map(Number);
+        return { r, g, b, a };
+    };
+    const luminance = ({ r, g, b }) => {
+        const channel = c => { c /= 255; return c <= 0.03928 ? c / 12.92 : ((c + 0.055) / 1.055) ** 2.4; };
+        return 0.2126 * channel(r) + 0.7152 * channel(g) + 0.0722 * channel(b);
+    };
+    const background = el => {
+        for (let node = el; node && node.nodeType === 1; node = node.parentElement) {
+            const style = getComputedStyle(node);
+            if (style.backgroundImage && style.backgroundImage !== "none") return null;  // can't tell over images
+            const color = parseColor(style.backgroundColor);
+            if (color && color.a >= 1) return color;
+            if (color && color.a > 0) return null;  // translucent layers: not measurable without compositing
+        }
+        return { r: 255, g: 255, b: 255, a: 1 };
+    };
+    let contrastChecked = 0;
+    for (const el of document.body ? document.body.querySelectorAll("*") : []) {
+        if (contrastChecked >= maxContrastElements) break;
+        const ownText = [...el.childNodes].some(node => node.nodeType === 3 && node.textContent.trim());
+        if (!ownText || ["SCRIPT", "STYLE", "NOSCRIPT", "OPTION"].includes(el.tagName) || isHidden(el)) continue;
+        contrastChecked++;
+        const style = getComputedStyle(el);
+        const foreground = parseColor(style.color);
+        const back = background(el);
+        if (!foreground || !back || foreground.a < 1) continue;
+        const [light, dark] = [luminance(foreground), luminance(back)].sort((x, y) => y - x);
+        const ratio = (light + 0.05) / (dark + 0.05);
+        const size = parseFloat(style.fontSize);
+        const large = size >= 24 || (size >= 18.66 && Number(style.fontWeight) >= 700);
+        const required = large ? 3 : 4.5;
+        if (ratio < required) {
+            report("color-contrast", "serious", el,
+                   `Contrast ${ratio.toFixed(2)}:1 is below ${required}:1 (${style.color} on rgb(${back.r}, ${back.g}, ${back.b})).`);
+        }
+    }
+
+    // landmarks: exactly one main, and at most one top-level banner and contentinfo.
+    const mains = [...document.querySelectorAll("main, [role=main]")].filter(el => !isHidden(el));
+    if (mains.length === 0) report("landmark-one-main", "moderate", null, "Page has no main landmark.");
+    if (mains.length > 1) report("landmark-no-duplicate-main", "moderate", mains[1], "Page has more than one main landmark.");
+    const sectioning = "article, aside, main, nav, section";
+    for (const [selector, rule] of [["header, [role=banner]", "landmark-no-duplicate-banner"],
+                                    ["footer, [role=contentinfo]", "landmark-no-duplicate-contentinfo"]]) {
+        const topLevel = [...document.querySelectorAll(selector)]
+            .filter(el => !isHidden(el) && (el.getAttribute("role") || !el.parentElement.closest(sectioning)));
+        if (topLevel.length > 1) report(rule, "moderate", topLevel[1], `Page has ${topLevel.length} top-level ${rule.split("-").pop()} landmarks.`);
+    }
+    return findings;
+}
+"""
+
+# Maps axe-core's results onto the same finding shape as the built-in rules.
+AXE_RUN_JS = """
+async () => {
+    const results = await axe.run(document, { resultTypes: ["violations"] });
+    return results.violations.flatMap(violation => violation.nodes.map(node => ({
+        rule: violation.id, impact: violation.impact || node.impact || "minor",
+        selector: node.target.join(" "), message: violation.help, snippet: (node.html || "").slice(0, 160),
+    })));
+}
+"""
+
+_page_findings = {}
+_reported_pages = set()
+_write_lock = threading.Lock()
+_ruleset_version = None
+
+
+def ruleset_version():
+    """Identifies the rule set, so cached findings are dropped when the rules change."""
+    global _ruleset_version
+    if _ruleset_version is None:
+        digest = hashlib.sha256(AUDIT_JS.encode("utf-8"))
+        if AXE_SCRIPT:
+            with open(AXE_SCRIPT, "rb") as f:
+                digest.update(f.read())
+        _ruleset_version = digest.hexdigest()[:16]
+    return _ruleset_version
+
+
+def run_audit(page):
+    """Runs the audit in the loaded page (axe-core if PLATO_AXE_SCRIPT is set) and returns its findings."""
+    if AXE_SCRIPT:
+        page.add_script_tag(path=AXE_SCRIPT)
+        return page.evaluate(AXE_RUN_JS)
+    return page.evaluate(AUDIT_JS, MAX_CONTRAST_ELEMENTS)
+
+
+def record_findings(page_url, findings):
+    """Appends page_url's findings to the findings file, once per page per process.
+
+    Appends are serialised between threads and (with fcntl) processes, like the metrics file's.
+    """
+    os.makedirs(A11Y_DIR, exist_ok=True)
+    with _write_lock, open(FINDINGS_FILE + ".lock", "a") as lock_file:
+        if page_url in _reported_pages:
+            return
+        _reported_pages.add(page_url)
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            write_header = not os.path.exists(FINDINGS_FILE)
+            with open(FINDINGS_FILE, "a", newline="") as f:
+                writer = csv.writer(f)
+                if write_header:
+                    writer.writerow(["timestamp", "page_url"] + FINDING_COLUMNS)
+                timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+                for finding in findings:
+                    writer.writerow([timestamp, page_url] + [finding.get(column) for column in FINDING_COLUMNS])
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def audit_loaded_page(page, page_url):
+    """Audits a page navigate_to_url has just loaded, once per page version.
+
+    Findings are reused from this process, then from the result cache by page fingerprint,
+    and only computed in the browser when neither has them.
+    """
+    if not A11Y_AUDIT_ENABLED:
+        return None
+    if page_url in _page_findings:
+        return _page_findings[page_url]
+    fingerprint = result_cache.get_page_fingerprint(page_url)
+    try:
+        findings = result_cache.get_a11y_findings(fingerprint, ruleset_version())
+        if findings is None:
+            findings = run_audit(page)
+            result_cache.record_a11y_findings(fingerprint, ruleset_version(), findings)
+        _page_findings[page_url] = findings
+        record_findings(page_url, findings)
+    except Exception as e:
+        logger.warning(f"Could not run the accessibility audit on {page_url}: {e}")
+        return None
+    if findings:
+        logger.warning(f"Accessibility audit of {page_url}: {summarize(findings)}")
+    else:
+        logger.info(f"Accessibility audit of {page_url}: no findings")
+    return findings
+
+
+def forget_page(page_url):
+    """Drops page_url's findings, so its next navigation is audited (and reported) again."""
+    _page_findings.pop(page_url, None)
+    _reported_pages.discard(page_url)
+
+
+def get_findings(page_url):
+    """Returns the findings recorded for page_url in this process, or None if it wasn't audited."""
+    return _page_findings.get(page_url)
+
+
+def summarize(findings):
+    """Returns e.g. "3 findings: color-contrast x2, image-alt x1"."""
+    counts = {}
+    for finding in findings:
+        counts[finding["rule"]] = counts.get(finding["rule"], 0) + 1
+    rules = ", ".join(f"{rule} x{count}" for rule, count in sorted(counts.items(), key=lambda item: -item[1]))
+    return f"{len(findings)} finding{'s' if len(findings) > 1 else ''}: {rules}" if findings else "no findings"
+
+
+def format_findings():
+    """Returns printable lines for every page audited in this process."""
+    lines = []
+    for page_url, findings in sorted(_page_findings.items()):
+        lines.append(f"{page_url}: {summarize(findings)}")
+        for finding in findings:
+            lines.append(f"  [{finding['impact']}] {finding['rule']} {finding['selector']}: {finding['message']}")
+    return lines
@@ -0,0 +1,100 @@
+"""Memory benchmark: peak RSS of the CSV data paths as a page grows from 10 to 100,000 rows.
+
+Each scenario runs in a fresh subprocess against a synthetic single-page CSV, so the reported
+peak is that scenario's alone. The streaming paths stop short of the browser: they read, group,
+batch and resolve selector candidates for every row, which is everything that scales with rows.
+
+Usage:
+    python bench_memory.py [--rows 10,1000,100000] [--batch-size 200]
+"""
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_COLUMNS = ["page_url", "element_type", "selector_css", "text", "href", "id", "classes", "tag_name"]
+
+SCENARIOS = {
+    "load_csv_data (pandas, all rows)": """
+from common import load_csv_data
+rows = load_csv_data(CSV_PATH)
+assert len(rows) == ROWS
+""",
+    "CsvRows fixture (every row accessed)": """
+from common import load_csv_rows
+rows = load_csv_rows(CSV_PATH)
+assert sum(1 for i in range(len(rows)) if rows[i]["element_type"]) == ROWS
+""",
+    "streaming pipeline (spool + batches)": """
+import tempfile
+from common import iter_csv_rows
+from selector_resolver import build_candidates
+from streaming_runner import batched, iter_spooled_rows, spool_rows_by_page
+seen = 0
+with tempfile.TemporaryDirectory() as spool_dir:
+    for page_url, spool_path in spool_rows_by_page(enumerate(iter_csv_rows(CSV_PATH)), spool_dir).items():
+        for batch in batched(iter_spooled_rows(spool_path), BATCH_SIZE):
+            seen += sum(1 for _, row in batch if build_candidates(row))
+assert seen == ROWS
+""",
+    "v2 generator (one module)": """
+import os, tempfile
+import generate_python_tests_v2 as generator
+generator.TESTS_DIR = tempfile.mkdtemp()
+generator.generate_python_test_file(CSV_PATH, "bench")
+assert os.path.getsize(os.path.join(generator.TESTS_DIR, "test_bench.py")) > 0
+""",
+}
+
+
+def write_synthetic_csv(path, rows):
+    """Writes a single-page data CSV with `rows` alternating link and content rows."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for i in range(rows):
+            if i % 2:
+                writer.writerow(["https://platotech.com/bench/", "content", f"div.section-{i} > p", f"Paragraph text {i}",
+                                 "", "", f"section-{i}", "p"])
+            else:
+                writer.writerow(["https://platotech.com/bench/", "link", f"a.nav-{i}", f"Link {i}",
+                                 f"https://platotech.com/page-{i}/", f"link-{i}", f"nav-{i}", "a"])
+
+
+def peak_rss_mb(code):
+    """Runs code in a fresh interpreter and returns its peak resident set size in MB."""
+    probe = code + "\nimport resource, sys\nsys.stdout.write(str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))\n"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=PROJECT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return int(result.stdout.strip().splitlines()[-1]) / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of the CSV data paths by row count.")
+    parser.add_argument("--rows", default="10,1000,100000", help="Comma-separated row counts.")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args(argv)
+    row_counts = [int(n) for n in args.rows.split(",") if n]
+
+    print(f"{'scenario':<40}" + "".join(f"{f'{n} rows':>14}" for n in row_counts) + "   (peak RSS, MB)")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_paths = {}
+        for rows in row_counts:
+            csv_paths[rows] = os.path.join(tmp_dir, f"bench_{rows}_data.csv")
+            write_synthetic_csv(csv_paths[rows], rows)
+        for name, body in SCENARIOS.items():
+            cells = []
+            for rows in row_counts:
+                header = f"CSV_PATH = {csv_paths[rows]!r}\nROWS = {rows}\nBATCH_SIZE = {args.batch_size}\n"
+                peak = peak_rss_mb(header + body)
+                cells.append(f"{peak:>14.1f}" if peak is not None else f"{'error':>14}")
+            print(f"{name:<40}" + "".join(cells), flush=True)
+
+
+if __name__ == "__main__":
+    main()
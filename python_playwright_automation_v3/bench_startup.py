@@ -0,0 +1,58 @@
+"""Startup benchmark: import time of common.py and pytest collection time.
+
+Usage:
+    python bench_startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = [
+    ("import common", [sys.executable, "-c", "import common"]),
+    ("import generated test module", [sys.executable, "-c", "import tests.test_careers"]),
+    ("pytest --collect-only", [sys.executable, "-m", "pytest", "--collect-only", "-q", "-p", "no:cacheprovider", "tests"]),
+    ("pytest --collect-only -k careers", [sys.executable, "-m", "pytest", "--collect-only", "-q", "-p", "no:cacheprovider",
+                                         "tests", "-k", "careers"]),
+]
+
+HEAVY_MODULES = ("pandas", "playwright.sync_api", "lxml", "requests")
+
+
+def time_command(command, runs):
+    """Runs command `runs` times and returns the wall-clock durations in milliseconds."""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def heavy_modules_loaded_by_import():
+    """Returns which heavy dependencies importing common.py pulls in."""
+    probe = f"import sys, common; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=PROJECT_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or "none"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark module import and pytest collection startup.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    baseline = time_command([sys.executable, "-c", "pass"], args.runs)
+    print(f"{'scenario':<36}{'min ms':>10}{'median ms':>12}")
+    print(f"{'python interpreter startup':<36}{min(baseline):>10.0f}{statistics.median(baseline):>12.0f}")
+    for name, command in SCENARIOS:
+        durations = time_command(command, args.runs)
+        print(f"{name:<36}{min(durations):>10.0f}{statistics.median(durations):>12.0f}")
+    print(f"Heavy modules loaded by 'import common': {heavy_modules_loaded_by_import()}")
+
+
+if __name__ == "__main__":
+    main()
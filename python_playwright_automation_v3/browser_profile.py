@@ -0,0 +1,237 @@
+"""Opt-in persistent browser profile with a warm HTTP disk cache.
+
+Set PLATO_BROWSER_PROFILE=1 to verify in a persistent context instead of a fresh one. The first
+worker of a run seeds <PLATO_CACHE_DIR>/browser_profile/<browser> by loading every data page once
+(the site's CSS, JS bundles and fonts land in the profile's HTTP cache). Each worker then launches
+from its own copy of the seeded profile, so parallel workers share it read-only and never write to
+it. Repeat navigations then cost little more than the HTML document.
+
+The seed is rebuilt when it is older than PLATO_PROFILE_MAX_AGE seconds (default 86400), when it
+lacks a page being verified, or once per run with PLATO_PROFILE_RESET=1.
+`python browser_profile.py --invalidate` deletes it.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: seeding isn't serialised between workers
+    fcntl = None
+
+import result_cache
+import storage_state
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENABLED = os.environ.get("PLATO_BROWSER_PROFILE", "0") == "1"
+PROFILE_DIR = os.environ.get("PLATO_PROFILE_DIR", os.path.join(result_cache.CACHE_DIR, "browser_profile"))
+PROFILE_MAX_AGE_SECONDS = int(os.environ.get("PLATO_PROFILE_MAX_AGE", "86400"))
+PROFILE_RESET = os.environ.get("PLATO_PROFILE_RESET", "0") == "1"
+# Workers of one run share this ID, so PLATO_PROFILE_RESET rebuilds the seed once, not once per worker.
+# pytest-xdist sets PYTEST_XDIST_TESTRUNUID; distributed.py passes PLATO_PROFILE_RUN_ID to its workers.
+RUN_ID = os.environ.get("PLATO_PROFILE_RUN_ID") or os.environ.get("PYTEST_XDIST_TESTRUNUID") or uuid.uuid4().hex
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+BROWSER_NAMES = ("chromium", "firefox", "webkit")
+SEED_STAMP = "plato_seed.json"
+SEED_TIMEOUT = 60000
+# Per-instance lock files; a copy that kept them would look like a profile already in use.
+LOCK_FILES = ("SingletonLock", "SingletonCookie", "SingletonSocket", "lockfile", "lock", ".parentlock", "parent.lock")
+
+
+def default_page_urls(data_dir=DATA_DIR):
+    """Returns the page_url of every current (non-archived) data CSV, read from its first row."""
+    from common import iter_csv_rows
+
+    page_urls = set()
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, "*_data.csv"))):
+        if csv_path.endswith("_archived_data.csv"):
+            continue
+        first_row = next(iter_csv_rows(csv_path), None)
+        if first_row and (first_row.get("page_url") or "").strip():
+            page_urls.add(first_row["page_url"].strip())
+    return sorted(page_urls)
+
+
+def seed_dir(browser_name):
+    return os.path.join(PROFILE_DIR, browser_name)
+
+
+def read_stamp(browser_name):
+    """Returns the seed's stamp ({"seeded_at", "run_id", "page_urls"}), or None if it isn't seeded."""
+    try:
+        with open(os.path.join(seed_dir(browser_name), SEED_STAMP), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def needs_seeding(browser_name, page_urls):
+    stamp = read_stamp(browser_name)
+    if stamp is None:
+        return True
+    if PROFILE_RESET and stamp.get("run_id") != RUN_ID:
+        return True
+    if time.time() - stamp.get("seeded_at", 0) > PROFILE_MAX_AGE_SECONDS:
+        return True
+    if storage_state.STATE_ENABLED and not stamp.get("consent"):
+        return True
+    return not set(page_urls) <= set(stamp.get("page_urls", []))
+
+
+@contextmanager
+def _profile_lock(browser_name, exclusive):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{browser_name}.lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _seed(browser_type, page_urls, launch_args, context_args):
+    """Builds a fresh profile by loading every page once, then swaps it in for the old seed."""
+    target = seed_dir(browser_type.name)
+    building = tempfile.mkdtemp(prefix=f"{browser_type.name}_seeding_", dir=PROFILE_DIR)
+    started = time.monotonic()
+    context = browser_type.launch_persistent_context(building, **launch_args, **context_args)
+    if storage_state.STATE_ENABLED:
+        storage_state.install_routes(context, browser_type.name)
+    try:
+        page = context.new_page()
+        for page_url in page_urls:
+            try:
+                page.goto(page_url, wait_until="load", timeout=SEED_TIMEOUT)
+                if storage_state.STATE_ENABLED:
+                    storage_state.accept_overlays(page)
+            except Exception as e:
+                logger.warning(f"Browser profile: could not seed {page_url}: {e}")
+    finally:
+        context.close()
+    with open(os.path.join(building, SEED_STAMP), "w", encoding="utf-8") as f:
+        json.dump({"seeded_at": time.time(), "run_id": RUN_ID, "page_urls": sorted(page_urls),
+                   "consent": storage_state.STATE_ENABLED}, f)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(building, target)
+    logger.info(f"Browser profile: seeded {target} with {len(page_urls)} pages in {time.monotonic() - started:.1f}s")
+
+
+def ensure_seeded(browser_type, page_urls, launch_args=None, context_args=None):
+    """Seeds the shared profile for browser_type unless a current seed already covers page_urls."""
+    browser_name = browser_type.name
+    if not needs_seeding(browser_name, page_urls):
+        return
+    with _profile_lock(browser_name, exclusive=True):
+        # Another worker may have seeded while this one waited for the lock.
+        if needs_seeding(browser_name, page_urls):
+            stamp = read_stamp(browser_name)
+            if stamp and not (PROFILE_RESET and stamp.get("run_id") != RUN_ID):
+                page_urls = sorted(set(page_urls) | set(stamp.get("page_urls", [])))
+            _seed(browser_type, page_urls, launch_args or {}, context_args or {})
+
+
+def copy_seed(browser_name):
+    """Copies the seeded profile into a private directory for one worker and returns its path."""
+    copy = tempfile.mkdtemp(prefix=f"plato_profile_{browser_name}_")
+    with _profile_lock(browser_name, exclusive=False):
+        shutil.copytree(seed_dir(browser_name), copy, symlinks=True, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns(*LOCK_FILES))
+    return copy
+
+
+@contextmanager
+def open_context(browser_type, page_urls=None, launch_args=None, **context_args):
+    """Yields a browser context for a runner, from a warm copy of the profile if PLATO_BROWSER_PROFILE=1.
+
+    Without the profile this is browser_type.launch() + new_context(), as the runners did before.
+    page_urls are the pages to seed; by default the page_url of every data CSV. With
+    PLATO_STORAGE_STATE=1 the context also starts with the overlays accepted and widgets blocked.
+    """
+    launch_args = launch_args or {}
+    if page_urls is None and (PROFILE_ENABLED or storage_state.STATE_ENABLED):
+        page_urls = default_page_urls()
+    if storage_state.STATE_ENABLED:
+        launch_args = storage_state.with_launch_args(browser_type.name, launch_args)
+    if not PROFILE_ENABLED:
+        if storage_state.STATE_ENABLED:
+            storage_state.prepare(browser_type, page_urls, launch_args)
+            context_args = storage_state.with_context_args(context_args)
+        browser = browser_type.launch(**launch_args)
+        context = browser.new_context(**context_args)
+        if storage_state.STATE_ENABLED:
+            storage_state.install_routes(context, browser_type.name)
+        try:
+            yield context
+        finally:
+            context.close()
+            browser.close()
+        return
+
+    # A persistent context keeps the consent cookies in the profile itself; it takes no storage_state.
+    context_args.pop("storage_state", None)
+    ensure_seeded(browser_type, page_urls, launch_args, context_args)
+    profile_copy = copy_seed(browser_type.name)
+    context = browser_type.launch_persistent_context(profile_copy, **launch_args, **context_args)
+    if storage_state.STATE_ENABLED:
+        storage_state.install_routes(context, browser_type.name)
+    try:
+        yield context
+    finally:
+        context.close()
+        shutil.rmtree(profile_copy, ignore_errors=True)
+
+
+def invalidate(browser_names=None):
+    """Deletes the seeded profiles (all browsers by default). Returns the directories removed."""
+    removed = []
+    for browser_name in browser_names or BROWSER_NAMES:
+        if not os.path.isdir(seed_dir(browser_name)):
+            continue
+        with _profile_lock(browser_name, exclusive=True):
+            shutil.rmtree(seed_dir(browser_name), ignore_errors=True)
+            removed.append(seed_dir(browser_name))
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed, inspect or invalidate the shared browser profile.")
+    parser.add_argument("--browser", action="append", choices=BROWSER_NAMES,
+                        help="Browser(s) to act on. Default: chromium for --seed, all for --invalidate.")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--seed", action="store_true", help="Seed now (rebuilding if stale or PLATO_PROFILE_RESET=1).")
+    action.add_argument("--invalidate", action="store_true", help="Delete the seeded profile(s).")
+    action.add_argument("--status", action="store_true", help="Show each seeded profile's age and pages.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.invalidate:
+        removed = invalidate(args.browser)
+        print("\n".join(f"Removed {path}" for path in removed) or "No seeded profiles to remove.")
+    elif args.seed:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as playwright:
+            for browser_name in args.browser or ["chromium"]:
+                ensure_seeded(getattr(playwright, browser_name), default_page_urls())
+    else:
+        for browser_name in args.browser or BROWSER_NAMES:
+            stamp = read_stamp(browser_name)
+            if stamp:
+                age_hours = (time.time() - stamp["seeded_at"]) / 3600
+                print(f"{browser_name}: seeded {age_hours:.1f}h ago with {len(stamp['page_urls'])} pages")
+            else:
+                print(f"{browser_name}: not seeded")
+
+
+if __name__ == "__main__":
+    main()
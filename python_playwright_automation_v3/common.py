@@ -1,25 +1,50 @@
-import pandas as pd
+from __future__ import annotations
+
+import csv
 import logging
 import os
-from playwright.sync_api import Page, expect
+from array import array
+from typing import TYPE_CHECKING
 import pytest # Ensure pytest is imported if used directly for fail
 from urllib.parse import urljoin # Ensure urljoin is imported
+import a11y_audit
+import failure_artifacts
+import perf_metrics
+import result_cache
+import selector_resolver
+import text_matching
+import tracing
+import url_canonical
+
+# pandas and Playwright are imported where they are used so that importing this
+# module (and every generated test module) stays cheap for collection and -k runs.
+if TYPE_CHECKING:
+    from playwright.sync_api import Page
+
+# How long a missing selector may take to attach before the page text index is searched instead
+SELECTOR_ATTACH_TIMEOUT = 2000
 
-# Setup logging
 LOGS_DIR = "logs"
-if not os.path.exists(LOGS_DIR):
-    os.makedirs(LOGS_DIR)
-
-logging.basicConfig(level=logging.INFO,
-                    format="%(asctime)s - %(levelname)s - %(message)s",
-                    filename=
-                    "logs/automation_python.log",
-                    filemode=
-                    "w") 
+LOG_FILE = os.path.join(LOGS_DIR, "automation_python.log")
+
 logger = logging.getLogger(__name__)
 
+def configure_logging(filemode="w"):
+    """Sets up file logging. Called from conftest.py and from script entry points.
+
+    Child processes of a run pass filemode="a" so they don't truncate the parent's log.
+    """
+    if not os.path.exists(LOGS_DIR):
+        os.makedirs(LOGS_DIR)
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s",
+                        filename=LOG_FILE,
+                        filemode=filemode)
+
 def load_csv_data(csv_path):
     """Loads data from a CSV file."""
+    import pandas as pd
+
     try:
         df = pd.read_csv(csv_path)
         logger.info(f"Successfully loaded CSV data from {csv_path}")
@@ -32,12 +57,147 @@ def load_csv_data(csv_path):
         logger.error(f"Error loading CSV {csv_path}: {e}")
         return []
 
+# Strings pandas reads as NaN by default; load_csv_data turns them into "" via fillna.
+CSV_NA_VALUES = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                 "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+def iter_csv_rows(csv_path):
+    """Yields CSV rows as dicts using the csv module, without importing pandas.
+
+    Missing values are blanked the same way load_csv_data does, so rows compare equal.
+    """
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield _blank_missing(row)
+
+def _blank_missing(row):
+    return {key: "" if value is None or value in CSV_NA_VALUES else value for key, value in row.items()}
+
+class CsvRows:
+    """Read-only sequence over a CSV file that parses a row only when it is accessed.
+
+    Only the byte offset of each row is kept in memory (8 bytes a row), so a module fixture
+    can hand every test its row without materialising the whole file as dicts.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self._offsets = array("q")
+        with open(csv_path, "rb") as f:
+            self._fieldnames = next(csv.reader([f.readline().decode("utf-8")]), [])
+            in_quotes = False
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                # A quoted field can span lines; a row only starts on a line read outside quotes.
+                if not in_quotes and line.strip():
+                    self._offsets.append(offset)
+                in_quotes ^= line.count(b'"') % 2 == 1
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self._offsets)
+        offset = self._offsets[index]
+        with open(self.csv_path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read(self._offsets[index + 1] - offset) if index + 1 < len(self._offsets) else f.read()
+        return self._parse(chunk.decode("utf-8"))
+
+    def _parse(self, text):
+        row = next(csv.DictReader(text.splitlines(keepends=True), fieldnames=self._fieldnames))
+        return _blank_missing(row)
+
+    def __iter__(self):
+        return iter_csv_rows(self.csv_path)
+
+    def __bool__(self):
+        return len(self._offsets) > 0
+
+class RowTable:
+    """Read-only sequence of row dicts over a generated module's embedded tuple-of-tuples table.
+
+    shared holds the values every row has in common (e.g. page_url), kept out of the tuples.
+    """
+
+    def __init__(self, columns, rows, shared=None):
+        self.columns = columns
+        self.rows = rows
+        self.shared = shared or {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return dict(self.shared, **dict(zip(self.columns, self.rows[index])))
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self.rows)))
+
+def load_csv_rows(csv_path):
+    """Returns the rows of a CSV file as a lazily parsed CsvRows sequence ([] if unreadable)."""
+    try:
+        rows = CsvRows(csv_path)
+        logger.info(f"Indexed {len(rows)} CSV rows in {csv_path}")
+        return rows
+    except FileNotFoundError:
+        logger.error(f"CSV file not found: {csv_path}")
+        return []
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        logger.error(f"Error indexing CSV {csv_path}: {e}")
+        return []
+
+def normalize_text(text):
+    """Collapses runs of whitespace so expected and actual text compare equal."""
+    return " ".join(str(text).split()).strip()
+
+def normalize_href(href):
+    """Strips surrounding whitespace and a trailing slash from an href."""
+    return str(href).strip().rstrip("/")
+
+def hrefs_match(expected_href, actual_href, base_url):
+    """Compares hrefs as written, then in canonical form (no requests are made). Returns (matched, how)."""
+    if normalize_href(actual_href) == normalize_href(expected_href):
+        return True, "exact"
+    if not expected_href or not actual_href:
+        return False, "exact"
+    return url_canonical.hrefs_equivalent(expected_href, actual_href, base_url)
+
+def is_checkable_link(href):
+    """Returns True when an href should be probed for accessibility."""
+    return bool(href) and not href.startswith("mailto:") and not href.startswith("tel:") and not href.startswith("#")
+
+def is_link_status_ok(status):
+    """Returns True when a link probe status counts as accessible."""
+    return status is not None and status < 400
+
 def navigate_to_url(page: Page, url: str):
     """Navigates the Playwright page to the specified URL."""
+    from playwright.sync_api import expect
+
     try:
         logger.info(f"Navigating to URL: {url}")
-        page.goto(url, wait_until="domcontentloaded", timeout=30000) 
-        expect(page).to_have_url(url, timeout=15000)
+        with tracing.span("page.goto", url=url):
+            response = page.goto(url, wait_until="domcontentloaded", timeout=30000) 
+        with tracing.span("expect.to_have_url"):
+            expect(page).to_have_url(url, timeout=15000)
+        if response and result_cache.get_page_fingerprint(url) is None:
+            try:
+                with tracing.span("response.body"):
+                    body = response.body()
+                result_cache.remember_page_fingerprint(url, body)
+            except Exception as fp_e:
+                logger.warning(f"Could not fingerprint {url}: {fp_e}")
+        with tracing.span("perf_metrics.capture"):
+            perf_metrics.capture_navigation_metrics(page, url)
+        with tracing.span("a11y_audit.audit_loaded_page"):
+            a11y_audit.audit_loaded_page(page, url)
         logger.info(f"Successfully navigated to {url}")
         return True
     except Exception as e:
@@ -46,23 +206,36 @@ def navigate_to_url(page: Page, url: str):
 
 def verify_link_element(page: Page, element_data: dict):
     """Verifies a link element based on data from CSV."""
-    selector = element_data.get("selector") 
+    from playwright.sync_api import expect
+
+    with tracing.span("selector_resolver.resolve"):
+        selector = selector_resolver.resolve_selector(page, element_data)
+    failure_artifacts.record_resolved_selector(selector)
     expected_text = str(element_data.get("text", "")).strip()
     expected_href = str(element_data.get("href", "")).strip()
     page_url = page.url 
 
+    if selector is None:
+        selector = selector_resolver.get_row_selector(element_data)
+        logger.error(f"Link NOT FOUND on {page_url}: no selector in the fallback chain matched for '{selector}'")
+        pytest.fail(f"Link NOT FOUND for {selector}: no candidate in the id / selector_css / tag+classes+text chain matched.")
+
     logger.info(f"Verifying link on {page_url} with selector 	'{selector}	', expected text 	'{expected_text}	', expected href 	'{expected_href}	'")
 
     try:
         link_element = page.locator(selector).first
-        link_element.scroll_into_view_if_needed(timeout=5000)
-        expect(link_element).to_be_visible(timeout=10000)
+        with tracing.span("locator.scroll_into_view_if_needed"):
+            link_element.scroll_into_view_if_needed(timeout=5000)
+        with tracing.span("expect.to_be_visible"):
+            expect(link_element).to_be_visible(timeout=10000)
         
-        actual_text_raw = link_element.inner_text()
-        actual_text = " ".join(actual_text_raw.split()).strip() 
+        with tracing.span("locator.inner_text"):
+            actual_text_raw = link_element.inner_text()
+        actual_text = normalize_text(actual_text_raw)
         
         if expected_text.lower() == "plato logo":
-            img_alt = link_element.locator("img").first.get_attribute("alt")
+            with tracing.span("locator.get_attribute"):
+                img_alt = link_element.locator("img").first.get_attribute("alt")
             if img_alt and "plato" in img_alt.lower():
                 logger.info(f"Logo image found with alt text: 	'{img_alt}	'")
                 actual_text = expected_text 
@@ -75,13 +248,13 @@ def verify_link_element(page: Page, element_data: dict):
                 logger.error(f"Link text MISMATCH: Selector 	'{selector}	', Expected: 	'{expected_text}	', Actual: 	'{actual_text}	'")
                 pytest.fail(f"Link text MISMATCH for {selector}. Expected: 	'{expected_text}	', Got: 	'{actual_text}	'")
 
-        actual_href = link_element.get_attribute("href")
+        with tracing.span("locator.get_attribute"):
+            actual_href = link_element.get_attribute("href")
         if actual_href:
             actual_href = actual_href.strip()
-            normalized_actual_href = actual_href.rstrip("/")
-            normalized_expected_href = expected_href.rstrip("/")
-            if normalized_actual_href == normalized_expected_href:
-                logger.info(f"Link href MATCH: Selector 	'{selector}	', Expected: 	'{expected_href}	', Actual: 	'{actual_href}	'")
+            href_matched, matched_by = hrefs_match(expected_href, actual_href, page.url)
+            if href_matched:
+                logger.info(f"Link href MATCH ({matched_by}): Selector 	'{selector}	', Expected: 	'{expected_href}	', Actual: 	'{actual_href}	'")
             else:
                 logger.error(f"Link href MISMATCH: Selector 	'{selector}	', Expected: 	'{expected_href}	', Actual: 	'{actual_href}	'")
                 pytest.fail(f"Link href MISMATCH for {selector}. Expected: 	'{expected_href}	', Got: 	'{actual_href}	'")
@@ -90,20 +263,36 @@ def verify_link_element(page: Page, element_data: dict):
              pytest.fail(f"Link href MISSING for {selector}. Expected: {expected_href}")
 
         # Link accessibility check using Playwright navigation
-        if expected_href and not expected_href.startswith("mailto:") and not expected_href.startswith("tel:") and not expected_href.startswith("#"):
+        if is_checkable_link(expected_href):
             url_to_check = actual_href if actual_href else expected_href
             if not url_to_check.startswith("http"):
                 url_to_check = urljoin(page.url, url_to_check)
             
+            chain = url_canonical.get_cached_chain(url_to_check)
+            if chain is not None and is_link_status_ok(chain.status):
+                logger.info(f"Link {url_to_check} accessible per recorded redirect chain ending at {chain.final_url}. Status: {chain.status}")
+                return True
+            cached_status = result_cache.get_link_status(url_to_check)
+            if cached_status is not None:
+                logger.info(f"Link {url_to_check} accessible per result cache. Status: {cached_status}")
+                return True
+
             logger.info(f"Attempting Playwright navigation to check link accessibility: {url_to_check}")
             new_page = None
             try:
-                new_page = page.context.new_page()
-                response = new_page.goto(url_to_check, wait_until="domcontentloaded", timeout=20000)
+                with tracing.span("link_probe.new_page"):
+                    new_page = page.context.new_page()
+                with tracing.span("link_probe.goto", url=url_to_check):
+                    response = new_page.goto(url_to_check, wait_until="domcontentloaded", timeout=20000)
                 if response:
                     status = response.status
                     logger.info(f"Playwright navigation to {url_to_check} successful. Status: {status}")
-                    if status >= 400:
+                    result_cache.record_link_status(url_to_check, status)
+                    try:
+                        url_canonical.record_chain(url_canonical.chain_from_playwright_response(response))
+                    except Exception as chain_e:
+                        logger.warning(f"Could not record redirect chain for {url_to_check}: {chain_e}")
+                    if not is_link_status_ok(status):
                         logger.error(f"Link {url_to_check} (selector '{selector}') is broken. Status code: {status}")
                         pytest.fail(f"Link {url_to_check} is broken. Status: {status}")
                 else:
@@ -115,7 +304,8 @@ def verify_link_element(page: Page, element_data: dict):
                 pytest.fail(f"Link {url_to_check} (selector '{selector}') failed during Playwright navigation: {pw_e}")
             finally:
                 if new_page:
-                    new_page.close()
+                    with tracing.span("link_probe.close"):
+                        new_page.close()
         return True
 
     except Exception as e:
@@ -123,28 +313,70 @@ def verify_link_element(page: Page, element_data: dict):
         pytest.fail(f"Error verifying link {selector}: {e}")
         return False
 
+def fail_with_text_location(page: Page, selector, expected_text, problem):
+    """Fails the test, reporting where on the page the expected text can be found now."""
+    try:
+        with tracing.span("text_index.build"):
+            index = text_matching.build_page_text_index(page)
+        hit = text_matching.find_text_in_index(index, expected_text)
+    except Exception as e:
+        logger.warning(f"Could not build page text index for {page.url}: {e}")
+        hit = None
+    if hit and hit.selector != selector:
+        location = f"expected text found at '{hit.selector}' (similarity {hit.score:.2f}): '{hit.text}'"
+    elif hit:
+        location = f"closest text on the page has similarity {hit.score:.2f}"
+    else:
+        location = "expected text not found anywhere on the page"
+    logger.error(f"Content check for selector '{selector}' on {page.url}: {problem}; {location}")
+    pytest.fail(f"Content check for {selector}: {problem}; {location}")
+
 def verify_content_element(page: Page, element_data: dict):
     """Verifies a content element based on data from CSV."""
-    selector = element_data.get("selector") 
+    from playwright.sync_api import expect
+
+    with tracing.span("selector_resolver.resolve"):
+        selector = selector_resolver.resolve_selector(page, element_data)
+    failure_artifacts.record_resolved_selector(selector)
     expected_text = str(element_data.get("text", "")).strip()
     page_url = page.url 
 
+    if selector is None:
+        fail_with_text_location(page, selector_resolver.get_row_selector(element_data), expected_text,
+                                "no candidate in the id / selector_css / tag+classes+text chain matched")
+
     logger.info(f"Verifying content on {page_url} with selector 	'{selector}	', expected text 	'{expected_text}	'")
 
     try:
+        mode, min_similarity = text_matching.match_settings(element_data)
         content_element = page.locator(selector).first
-        content_element.scroll_into_view_if_needed(timeout=5000)
-        expect(content_element).to_be_visible(timeout=10000)
+        with tracing.span("locator.count"):
+            count = content_element.count()
+        if count == 0:
+            try:
+                with tracing.span("locator.wait_for"):
+                    content_element.wait_for(state="attached", timeout=SELECTOR_ATTACH_TIMEOUT)
+            except Exception:
+                fail_with_text_location(page, selector, expected_text, "not found")
+        with tracing.span("locator.scroll_into_view_if_needed"):
+            content_element.scroll_into_view_if_needed(timeout=5000)
+        with tracing.span("expect.to_be_visible"):
+            expect(content_element).to_be_visible(timeout=10000)
         
-        actual_text_raw = content_element.inner_text()
-        normalized_actual_text = " ".join(actual_text_raw.split()).strip()
-        normalized_expected_text = " ".join(expected_text.split()).strip()
+        with tracing.span("locator.inner_text"):
+            actual_text_raw = content_element.inner_text()
+        normalized_actual_text = normalize_text(actual_text_raw)
+        normalized_expected_text = normalize_text(expected_text)
+        match = text_matching.match_text(normalized_expected_text, normalized_actual_text, mode, min_similarity)
 
-        if normalized_actual_text == normalized_expected_text:
+        if match.matched:
+            if match.score < 1.0:
+                logger.warning(f"Content matched in {mode} mode with similarity {match.score:.2f}: Selector '{selector}', Expected: '{normalized_expected_text}', Actual: '{normalized_actual_text}'")
             logger.info(f"Content MATCH: Selector 	'{selector}	', Expected: 	'{normalized_expected_text}	', Actual: 	'{normalized_actual_text}	'")
         else:
             logger.error(f"Content MISMATCH: Selector 	'{selector}	'. Expected: 	'{normalized_expected_text}	', Actual: 	'{normalized_actual_text}	'")
-            pytest.fail(f"Content MISMATCH for {selector}. Expected: 	'{normalized_expected_text}	', Got: 	'{normalized_actual_text}	'")
+            fail_with_text_location(page, selector, normalized_expected_text,
+                                    f"text mismatch ({mode} mode, similarity {match.score:.2f}), got '{normalized_actual_text}'")
         return True
             
     except Exception as e:
@@ -152,3 +384,78 @@ def verify_content_element(page: Page, element_data: dict):
         pytest.fail(f"Error verifying content {selector}: {e}")
         return False
 
+def verify_row_over_http(page_url: str, element_data: dict):
+    """Tries the HTTP tier (and the result cache) for a row. Returns True when no browser is needed."""
+    from http_verifier import HTTP_TIER_ENABLED, fetch_document, verify_row_http
+
+    if not HTTP_TIER_ENABLED:
+        return False
+    element_type = element_data.get("element_type")
+    fetch_document(page_url)
+    fingerprint = result_cache.get_page_fingerprint(page_url)
+    # A pass in the browser is at least as strict as one over HTTP.
+    if any(result_cache.is_row_verified(fingerprint, element_data, rules)
+           for rules in (result_cache.BROWSER_RULES, result_cache.HTTP_RULES)):
+        logger.info(f"{element_type} row on {page_url} already verified against this page version, reusing result.")
+        return True
+    verified, reason = verify_row_http(page_url, element_data)
+    if verified:
+        result_cache.record_row_verified(fingerprint, element_data, result_cache.HTTP_RULES)
+        return True
+    logger.info(f"Escalating {element_type} row on {page_url} to Playwright: {reason}")
+    return False
+
+def verify_element(request, page_url: str, element_data: dict, page_rows=None):
+    """Verifies a CSV row, over plain HTTP first with PLATO_HTTP_TIER=1, escalating to Playwright only when needed.
+
+    Passing all of the page's rows as page_rows lets the first escalated row resolve
+    selectors for every row of the page in one browser call.
+    """
+    from http_verifier import HTTP_TIER_ENABLED
+
+    element_type = element_data.get("element_type")
+    if verify_row_over_http(page_url, element_data):
+        return True
+
+    if page_rows:
+        selector_resolver.prime_page_rows(page_url, page_rows)
+    page = request.getfixturevalue("page")
+    with tracing.row(request.node.nodeid, page.context), \
+            failure_artifacts.watch(page, element_data, request.node.nodeid):
+        if not navigate_to_url(page, page_url):
+            pytest.fail(f"Failed to navigate to {page_url}.")
+        findings = a11y_audit.get_findings(page_url)
+        if findings is not None:
+            # Reported with the row's result (e.g. in --junitxml); findings don't fail the row.
+            request.node.user_properties.append(("accessibility", a11y_audit.summarize(findings)))
+        fingerprint = result_cache.get_page_fingerprint(page_url)
+        if not HTTP_TIER_ENABLED and result_cache.is_row_verified(fingerprint, element_data):
+            logger.info(f"{element_type} row on {page_url} already verified against this page version, reusing result.")
+            return True
+        if element_type == "link":
+            verified = verify_link_element(page, element_data)
+        elif element_type == "content":
+            verified = verify_content_element(page, element_data)
+        else:
+            pytest.skip(f"Unsupported element type: {element_type} on {page_url}.")
+        if verified:
+            result_cache.record_row_verified(fingerprint, element_data)
+        return verified
+
+def check_element(page: Page, element_data: dict):
+    """Runs the verify_* check for a row and returns (outcome, message) instead of failing the test."""
+    element_type = element_data.get("element_type")
+    try:
+        label = f"{page.url} {element_type} {element_data.get('text', '')}"
+        with tracing.row(label, page.context), failure_artifacts.watch(page, element_data, label):
+            if element_type == "link":
+                verify_link_element(page, element_data)
+            elif element_type == "content":
+                verify_content_element(page, element_data)
+            else:
+                return "skipped", f"unsupported element type {element_type}"
+        return "passed", ""
+    except pytest.skip.Exception as e:
+        return "skipped", str(e)
+    except (pytest.fail.Exception, Exception) as e:
+        return "failed", str(e)
@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+import a11y_audit
+import browser_profile
+import common
+import failure_artifacts
+import storage_state
+import tracing
+
+
+class BrowserProfilePlugin:
+    """Replaces pytest-playwright's per-test context with one persistent, pre-seeded context per worker.
+
+    Registered only with PLATO_BROWSER_PROFILE=1. Each test still gets its own page, closed after the test.
+    """
+
+    @pytest.fixture(scope="session")
+    def persistent_context(self, browser_type, browser_type_launch_args, browser_context_args):
+        with browser_profile.open_context(browser_type, launch_args=browser_type_launch_args,
+                                          **browser_context_args) as context:
+            yield context
+
+    @pytest.fixture
+    def context(self, persistent_context):
+        return persistent_context
+
+    @pytest.fixture
+    def page(self, persistent_context):
+        page = persistent_context.new_page()
+        yield page
+        page.close()
+
+
+@pytest.fixture(scope="session")
+def browser_type_launch_args(browser_type_launch_args, browser_name):
+    if not storage_state.STATE_ENABLED:
+        return browser_type_launch_args
+    return storage_state.with_launch_args(browser_name, browser_type_launch_args)
+
+
+@pytest.fixture(scope="session")
+def browser_context_args(browser_context_args, browser_type, browser_type_launch_args):
+    """With PLATO_STORAGE_STATE=1, every context starts from the saved consent state (seeded once per run)."""
+    if not storage_state.STATE_ENABLED:
+        return browser_context_args
+    storage_state.prepare(browser_type, launch_args=browser_type_launch_args)
+    return storage_state.with_context_args(browser_context_args)
+
+
+@pytest.fixture
+def context(context, browser_name):
+    if storage_state.STATE_ENABLED and not browser_profile.PROFILE_ENABLED:
+        storage_state.install_routes(context, browser_name)
+    return context
+
+
+def pytest_addoption(parser):
+    parser.addoption("--soft-assertions", action="store_true",
+                     default=os.environ.get("PLATO_SOFT_ASSERTIONS", "0") == "1",
+                     help="Run one soft-assertion test per page (a single page load) instead of one test per row.")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "soft_batch: page-level soft-assertion test, selected by --soft-assertions")
+    # Logging is configured here rather than as a side effect of importing common.py,
+    # so helper scripts and collection-only runs don't truncate the run log.
+    if not config.option.collectonly:
+        common.configure_logging()
+    if browser_profile.PROFILE_ENABLED:
+        config.pluginmanager.register(BrowserProfilePlugin(), "plato_browser_profile")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Per-row tests and the page-level soft-assertion test cover the same rows; run one or the other.
+    # Only modules that have a soft_batch test are switched: legacy modules (e.g. test_homepage.py)
+    # have no batch test, so their row tests always run.
+    soft = config.getoption("--soft-assertions")
+    batch_modules = {item.nodeid.split("::")[0] for item in items if item.get_closest_marker("soft_batch")}
+    selected, deselected = [], []
+    for item in items:
+        is_batch = item.get_closest_marker("soft_batch") is not None
+        is_row = (not is_batch and item.nodeid.split("::")[0] in batch_modules
+                  and "page_elements_data" in getattr(item, "fixturenames", ()))
+        (deselected if (is_batch and not soft) or (is_row and soft) else selected).append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+
+def pytest_terminal_summary(terminalreporter):
+    if failure_artifacts.ARTIFACTS_ENABLED:
+        stats = failure_artifacts.flush()
+        if stats["failures"]:
+            terminalreporter.section("Failure artifacts (PLATO_FAILURE_ARTIFACTS)")
+            terminalreporter.write_line(
+                f"{stats['failures']} failures, {stats['blobs_written']} artifacts written "
+                f"({stats['bytes_written'] / 1024:.0f} KB), {stats['blobs_deduplicated']} deduplicated, "
+                f"{stats['blobs_over_budget']} dropped over budget: {failure_artifacts.RUN_DIR}")
+    findings = a11y_audit.format_findings()
+    if findings:
+        terminalreporter.section("Accessibility findings")
+        for line in findings:
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(f"Full findings: {a11y_audit.FINDINGS_FILE}")
+    if not tracing.TRACE_ENABLED:
+        return
+    trace_path = tracing.write_reports()
+    if trace_path is None:
+        return
+    terminalreporter.section("Playwright call timings (PLATO_TRACE)")
+    for line in tracing.format_histograms():
+        terminalreporter.write_line(line)
+    for duration_ms, path in tracing.slowest_row_traces():
+        terminalreporter.write_line(f"slow row trace: {duration_ms:.0f} ms {path}")
+    terminalreporter.write_line(f"Chrome trace-event JSON (open in https://ui.perfetto.dev): {trace_path}")
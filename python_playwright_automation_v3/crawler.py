@@ -0,0 +1,355 @@
+"""Site-wide broken-link crawl seeded from the data/ CSVs and/or a sitemap.xml.
+
+Usage:
+    python crawler.py                                   # seed from data/*_data.csv
+    python crawler.py --sitemap https://platotech.com/sitemap.xml
+    python crawler.py --seed http://127.0.0.1:8000/ --no-csv-seeds --report crawl_report.json
+"""
+import argparse
+import asyncio
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+from lxml import html as lxml_html
+
+import result_cache
+from common import configure_logging, is_checkable_link, is_link_status_ok
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+USER_AGENT = "PlatoAutomationCrawler/1.0 (+https://platotech.com/)"
+REQUEST_TIMEOUT = 20
+MAX_SOURCES_PER_LINK = 5
+# Pages found past --max-pages are counted; this many of them are listed in the report.
+MAX_REPORTED_UNCRAWLED = 100
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+def normalize_crawl_url(url):
+    """Normalises a URL for the visited set: lower-case scheme/host, no default port, no fragment."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    return urlunsplit((scheme, host, path, parts.query, ""))
+
+
+def origin_of(url):
+    """Returns scheme://host[:port] for a normalised URL."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def load_csv_seeds(data_dir=DATA_DIR):
+    """Returns the distinct page_url values from data/*_data.csv (archived files excluded)."""
+    seeds = []
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, "*_data.csv"))):
+        if csv_path.endswith("_archived_data.csv"):
+            continue
+        with open(csv_path, newline="") as f:
+            for row in csv.DictReader(f):
+                page_url = (row.get("page_url") or "").strip()
+                if page_url.startswith("http") and page_url not in seeds:
+                    seeds.append(page_url)
+    return seeds
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host by at least 1 / rate seconds."""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._locks = {}
+        self._next_slot = {}
+
+    async def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            slot = self._next_slot.get(host, now)
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            self._next_slot[host] = max(slot, now) + self.interval
+
+
+class LinkCrawler:
+    """Breadth-first, same-origin crawler that checks every internal and outbound link it finds."""
+
+    def __init__(self, seeds, concurrency=16, requests_per_second=4.0, max_pages=5000, max_depth=None,
+                 respect_robots=True, check_external=True):
+        self.seeds = [normalize_crawl_url(seed) for seed in seeds]
+        self.allowed_origins = {origin_of(seed) for seed in self.seeds}
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.respect_robots = respect_robots
+        self.check_external = check_external
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.visited = set()
+        self.checked = {}
+        self.sources = {}
+        self.pages_crawled = 0
+        self.uncrawled_count = 0
+        self.uncrawled_sample = []
+        self._robots = {}
+        self._robots_locks = {}
+        self._queue = None
+        self._session = None
+
+    async def run(self):
+        """Crawls from the seeds and returns the report dict."""
+        started = time.monotonic()
+        self._queue = asyncio.Queue()
+        for seed in self.seeds:
+            self._enqueue_page(seed, 0, None)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"User-Agent": USER_AGENT}) as session:
+            self._session = session
+            workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+            await self._queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return self.build_report(time.monotonic() - started)
+
+    def _enqueue_page(self, url, depth, source):
+        self._add_source(url, source)
+        if url in self.visited:
+            return
+        self.visited.add(url)
+        if len(self.visited) > self.max_pages:
+            self.uncrawled_count += 1
+            if len(self.uncrawled_sample) < MAX_REPORTED_UNCRAWLED:
+                self.uncrawled_sample.append(url)
+            return
+        self._queue.put_nowait(("page", url, depth))
+
+    def _enqueue_link(self, url, source):
+        self._add_source(url, source)
+        if url in self.checked or url in self.visited:
+            return
+        self.checked[url] = None
+        self._queue.put_nowait(("link", url, None))
+
+    def _add_source(self, url, source):
+        if source is None:
+            return
+        sources = self.sources.setdefault(url, [])
+        if len(sources) < MAX_SOURCES_PER_LINK and source not in sources:
+            sources.append(source)
+
+    async def _worker(self):
+        while True:
+            kind, url, depth = await self._queue.get()
+            try:
+                if kind == "page":
+                    await self._crawl_page(url, depth)
+                else:
+                    await self._check_link(url)
+            except Exception as e:
+                logger.error(f"Crawler: unexpected error on {url}: {e}")
+                self.checked[url] = {"status": None, "error": str(e)}
+            finally:
+                self._queue.task_done()
+
+    async def _allowed_by_robots(self, url):
+        if not self.respect_robots:
+            return True
+        origin = origin_of(url)
+        # Workers reaching a new origin together wait for one robots.txt fetch.
+        async with self._robots_locks.setdefault(origin, asyncio.Lock()):
+            if origin not in self._robots:
+                parser = RobotFileParser()
+                try:
+                    async with self._session.get(f"{origin}/robots.txt") as response:
+                        lines = (await response.text()).splitlines() if response.status < 400 else []
+                except Exception:
+                    lines = []
+                parser.parse(lines)
+                self._robots[origin] = parser
+        return self._robots[origin].can_fetch(USER_AGENT, url)
+
+    async def _fetch(self, url, read_body):
+        if not await self._allowed_by_robots(url):
+            return {"status": None, "error": "disallowed by robots.txt", "skipped": True}, None
+        await self.rate_limiter.wait(url)
+        try:
+            async with self._session.get(url, allow_redirects=True) as response:
+                body = None
+                if read_body and is_link_status_ok(response.status) and "html" in response.headers.get("Content-Type", ""):
+                    body = await response.read()
+                    final_url = str(response.url)
+                else:
+                    final_url = None
+                return {"status": response.status}, (body, final_url)
+        except Exception as e:
+            return {"status": None, "error": f"{type(e).__name__}: {e}"}, None
+
+    async def _crawl_page(self, url, depth):
+        result, payload = await self._fetch(url, read_body=True)
+        self.checked[url] = result
+        if is_link_status_ok(result["status"]):
+            result_cache.record_link_status(url, result["status"])
+        if not payload or payload[0] is None:
+            return
+        self.pages_crawled += 1
+        if self.max_depth is not None and depth >= self.max_depth:
+            return
+        body, final_url = payload
+        try:
+            tree = lxml_html.fromstring(body)
+        except Exception as e:
+            logger.warning(f"Crawler: could not parse {url}: {e}")
+            return
+        for href in tree.xpath("//a/@href"):
+            href = href.strip()
+            if not is_checkable_link(href) or href.startswith(("javascript:", "data:")):
+                continue
+            target = normalize_crawl_url(urljoin(final_url or url, href))
+            if not target.startswith(("http://", "https://")):
+                continue
+            if origin_of(target) in self.allowed_origins:
+                self._enqueue_page(target, depth + 1, url)
+            elif self.check_external:
+                self._enqueue_link(target, url)
+
+    async def _check_link(self, url):
+        cached_status = result_cache.get_link_status(url)
+        if cached_status is not None:
+            self.checked[url] = {"status": cached_status, "cached": True}
+            return
+        result, _ = await self._fetch(url, read_body=False)
+        self.checked[url] = result
+        if is_link_status_ok(result["status"]):
+            result_cache.record_link_status(url, result["status"])
+
+    def build_report(self, elapsed_seconds):
+        """Summarises the crawl, listing every broken link with the pages that reference it.
+
+        Same-origin pages found after max_pages was reached are neither crawled nor checked;
+        they are counted under pages_not_crawled so a truncated crawl is never mistaken for a clean one.
+        """
+        broken = []
+        for url, result in self.checked.items():
+            if not result or result.get("skipped") or is_link_status_ok(result.get("status")):
+                continue
+            broken.append({
+                "url": url,
+                "status": result.get("status"),
+                "error": result.get("error"),
+                "internal": origin_of(url) in self.allowed_origins,
+                "found_on": self.sources.get(url, []),
+            })
+        broken.sort(key=lambda item: (not item["internal"], item["url"]))
+        return {
+            "seeds": self.seeds,
+            "pages_crawled": self.pages_crawled,
+            "links_checked": len(self.checked),
+            "max_pages_reached": self.uncrawled_count > 0,
+            "pages_not_crawled": self.uncrawled_count,
+            "pages_not_crawled_sample": self.uncrawled_sample,
+            "broken_links": broken,
+            "elapsed_seconds": round(elapsed_seconds, 2),
+        }
+
+
+async def load_sitemap_urls(sitemap_url, limit=50000):
+    """Returns page URLs from a sitemap.xml, following nested sitemap indexes."""
+    urls, pending, seen = [], [sitemap_url], set()
+    async with aiohttp.ClientSession(headers={"User-Agent": USER_AGENT},
+                                     timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as session:
+        while pending and len(urls) < limit:
+            current = pending.pop(0)
+            if current in seen:
+                continue
+            seen.add(current)
+            try:
+                async with session.get(current) as response:
+                    root = ET.fromstring(await response.read())
+            except Exception as e:
+                logger.error(f"Crawler: could not read sitemap {current}: {e}")
+                continue
+            for loc in root.iter(f"{SITEMAP_NS}loc"):
+                location = (loc.text or "").strip()
+                if root.tag == f"{SITEMAP_NS}sitemapindex":
+                    pending.append(location)
+                elif location:
+                    urls.append(location)
+    return urls[:limit]
+
+
+def print_report(report):
+    """Prints a human-readable crawl summary."""
+    print(f"Crawled {report['pages_crawled']} pages, checked {report['links_checked']} links "
+          f"in {report['elapsed_seconds']}s.")
+    if report["max_pages_reached"]:
+        print(f"Stopped at --max-pages: {report['pages_not_crawled']} more pages were found but not crawled "
+              f"(their links are unchecked), e.g.:")
+        for url in report["pages_not_crawled_sample"][:10]:
+            print(f"  {url}")
+    if not report["broken_links"]:
+        print("No broken links found.")
+        return
+    print(f"{len(report['broken_links'])} broken links:")
+    for item in report["broken_links"]:
+        scope = "internal" if item["internal"] else "outbound"
+        reason = item["status"] if item["status"] is not None else item["error"]
+        print(f"  [{scope}] {item['url']} -> {reason}")
+        for source in item["found_on"]:
+            print(f"      found on {source}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl the site breadth-first and report broken links.")
+    parser.add_argument("--seed", action="append", default=[], help="Extra seed URL (repeatable).")
+    parser.add_argument("--sitemap", action="append", default=[], help="sitemap.xml URL to seed from (repeatable).")
+    parser.add_argument("--no-csv-seeds", action="store_true", help="Don't seed from data/*_data.csv page_urls.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=4.0, help="Max requests per second per host (0 = unlimited).")
+    parser.add_argument("--max-pages", type=int, default=5000)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--ignore-robots", action="store_true")
+    parser.add_argument("--internal-only", action="store_true", help="Skip checking outbound links.")
+    parser.add_argument("--report", help="Write the JSON report to this path.")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    seeds = list(args.seed)
+    if not args.no_csv_seeds:
+        seeds.extend(load_csv_seeds())
+    for sitemap_url in args.sitemap:
+        seeds.extend(asyncio.run(load_sitemap_urls(sitemap_url)))
+    if not seeds:
+        parser.error("No seed URLs. Pass --seed/--sitemap or add page_url rows to data/*_data.csv.")
+
+    crawler = LinkCrawler(dict.fromkeys(seeds), concurrency=args.concurrency, requests_per_second=args.rate,
+                          max_pages=args.max_pages, max_depth=args.max_depth,
+                          respect_robots=not args.ignore_robots, check_external=not args.internal_only)
+    report = asyncio.run(crawler.run())
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+    return 1 if report["broken_links"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
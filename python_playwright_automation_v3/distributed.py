@@ -0,0 +1,420 @@
+"""Coordinator/worker execution of the data/ rows through a shared SQLite work queue.
+
+The coordinator splits every data CSV into page-level work units (a contiguous row range of
+one page_url) and writes them to a SQLite queue file. Worker processes on the same host claim
+units, load each page once and verify its rows. An idle worker steals the unstarted second half of the largest unit still
+in progress, and reclaims units whose worker stopped sending heartbeats. When every unit is
+done the coordinator merges the per-row results and worker logs into one report.
+
+The queue runs in WAL mode, which needs shared memory between its users: keep the queue file on
+a local disk and every worker on the coordinator's host. Over a network filesystem claims can
+be lost or the file corrupted.
+
+Usage:
+    python distributed.py coordinate --queue run.sqlite --workers 4 [--include-archived] [--pages careers]
+    python distributed.py worker --queue run.sqlite [--name extra-1]              # an extra worker, same host
+    python distributed.py report --queue run.sqlite                               # re-merge a finished run
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import browser_profile
+from common import CsvRows, check_element, configure_logging, navigate_to_url
+from streaming_runner import find_data_files
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Units larger than this are split up front so several workers can share one big page.
+MAX_UNIT_ROWS = 500
+# A unit is only split by a thief when both halves keep at least this many rows.
+MIN_STEAL_ROWS = 4
+# A claimed unit whose worker hasn't sent a heartbeat for this long is handed to another worker.
+LEASE_TIMEOUT = 120.0
+IDLE_POLL_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    page_name TEXT NOT NULL,
+    csv_path TEXT NOT NULL,
+    page_url TEXT NOT NULL,
+    row_start INTEGER NOT NULL,
+    row_end INTEGER NOT NULL,
+    next_row INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS units_status ON units (status);
+CREATE TABLE IF NOT EXISTS results (
+    page_name TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    page_url TEXT NOT NULL,
+    element_type TEXT,
+    text TEXT,
+    outcome TEXT NOT NULL,
+    message TEXT,
+    elapsed_ms REAL,
+    worker TEXT NOT NULL,
+    PRIMARY KEY (page_name, row_index)
+);
+CREATE TABLE IF NOT EXISTS logs (
+    created REAL NOT NULL,
+    worker TEXT NOT NULL,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+"""
+
+
+class WorkQueue:
+    """The SQLite-file queue shared by the coordinator and every worker."""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _write(self, sql, params=()):
+        return self._db.execute(sql, params)
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can't claim the same unit.
+        self._db.execute("BEGIN IMMEDIATE")
+        return self._db
+
+    def add_units(self, units):
+        """units: [(page_name, csv_path, page_url, row_start, row_end)]."""
+        db = self._transaction()
+        try:
+            db.executemany("INSERT INTO units (page_name, csv_path, page_url, row_start, row_end, next_row) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", [unit + (unit[3],) for unit in units])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def claim(self, worker):
+        """Claims a pending unit, reclaims an abandoned one, or steals half of a running one."""
+        now = time.time()
+        db = self._transaction()
+        try:
+            unit = db.execute("SELECT * FROM units WHERE status = 'pending' ORDER BY row_end - row_start DESC "
+                              "LIMIT 1").fetchone()
+            if unit is None:
+                unit = db.execute("SELECT * FROM units WHERE status = 'claimed' AND heartbeat_at < ? "
+                                  "ORDER BY heartbeat_at LIMIT 1", (now - LEASE_TIMEOUT,)).fetchone()
+                if unit is not None:
+                    logger.warning(f"{worker}: reclaiming unit {unit['id']} abandoned by {unit['worker']}")
+            if unit is not None:
+                db.execute("UPDATE units SET status = 'claimed', worker = ?, heartbeat_at = ? WHERE id = ?",
+                           (worker, now, unit["id"]))
+                db.execute("COMMIT")
+                return self.get_unit(unit["id"])
+            unit = self._steal(db, worker, now)
+            db.execute("COMMIT")
+            return unit
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _steal(self, db, worker, now):
+        victim = db.execute("SELECT * FROM units WHERE status = 'claimed' AND worker != ? "
+                            "ORDER BY row_end - next_row DESC LIMIT 1", (worker,)).fetchone()
+        # The row at next_row may already be in progress, so only rows after it can be taken.
+        if victim is None or victim["row_end"] - victim["next_row"] - 1 < 2 * MIN_STEAL_ROWS:
+            return None
+        middle = victim["next_row"] + 1 + (victim["row_end"] - victim["next_row"] - 1) // 2
+        db.execute("UPDATE units SET row_end = ? WHERE id = ?", (middle, victim["id"]))
+        cursor = db.execute("INSERT INTO units (page_name, csv_path, page_url, row_start, row_end, next_row, status, "
+                            "worker, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?, 'claimed', ?, ?)",
+                            (victim["page_name"], victim["csv_path"], victim["page_url"], middle, victim["row_end"],
+                             middle, worker, now))
+        logger.info(f"{worker}: stole rows {middle}-{victim['row_end'] - 1} of {victim['page_name']} "
+                    f"from {victim['worker']}")
+        return dict(victim, id=cursor.lastrowid, row_start=middle, next_row=middle, status="claimed", worker=worker)
+
+    def get_unit(self, unit_id):
+        return dict(self._db.execute("SELECT * FROM units WHERE id = ?", (unit_id,)).fetchone())
+
+    def advance(self, unit_id, worker, next_row):
+        """Records progress and renews the lease. Returns the unit's current row_end (it shrinks when stolen from)."""
+        self._write("UPDATE units SET next_row = ?, heartbeat_at = ? WHERE id = ? AND worker = ?",
+                    (next_row, time.time(), unit_id, worker))
+        row = self._db.execute("SELECT row_end, worker FROM units WHERE id = ?", (unit_id,)).fetchone()
+        # A unit reclaimed by someone else after a stall is no longer ours to continue.
+        return row["row_end"] if row["worker"] == worker else next_row
+
+    def complete(self, unit_id, worker):
+        self._write("UPDATE units SET status = 'done', heartbeat_at = ? WHERE id = ? AND worker = ?",
+                    (time.time(), unit_id, worker))
+
+    def record_result(self, result):
+        self._write("INSERT OR REPLACE INTO results (page_name, row_index, page_url, element_type, text, outcome, "
+                    "message, elapsed_ms, worker) VALUES (:page_name, :row_index, :page_url, :element_type, :text, "
+                    ":outcome, :message, :elapsed_ms, :worker)", result)
+
+    def record_logs(self, records):
+        self._db.executemany("INSERT INTO logs (created, worker, level, message) VALUES (?, ?, ?, ?)", records)
+
+    def progress(self):
+        """Returns {status: unit count} plus the number of rows with a result."""
+        counts = Counter({row["status"]: row["n"] for row in
+                          self._db.execute("SELECT status, COUNT(*) AS n FROM units GROUP BY status")})
+        counts["rows_done"] = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return counts
+
+    def is_finished(self):
+        return self._db.execute("SELECT COUNT(*) FROM units WHERE status != 'done'").fetchone()[0] == 0
+
+    def results(self):
+        return [dict(row) for row in self._db.execute("SELECT * FROM results ORDER BY page_name, row_index")]
+
+    def logs(self):
+        return [dict(row) for row in self._db.execute("SELECT * FROM logs ORDER BY created")]
+
+
+class QueueLogHandler(logging.Handler):
+    """Buffers a worker's log records and writes them to the queue's logs table in batches."""
+
+    def __init__(self, queue, worker, capacity=100):
+        super().__init__(level=logging.INFO)
+        self._queue = queue
+        self._worker = worker
+        self._capacity = capacity
+        self._buffer = []
+        self.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+
+    def emit(self, record):
+        self._buffer.append((record.created, self._worker, record.levelname, self.format(record)))
+        if len(self._buffer) >= self._capacity:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            records, self._buffer = self._buffer, []
+            try:
+                self._queue.record_logs(records)
+            except sqlite3.Error:
+                pass
+
+
+def split_into_units(page_name, csv_path):
+    """Splits one data CSV into [(page_name, csv_path, page_url, row_start, row_end)] units.
+
+    Each unit is a contiguous run of rows sharing a page_url, at most MAX_UNIT_ROWS long.
+    Rows without a page_url are skipped, as in the generator and the matrix runner.
+    """
+    rows = CsvRows(csv_path)
+    units, run_start, run_url = [], 0, None
+    relative_path = os.path.relpath(csv_path, PROJECT_DIR)
+    for index in range(len(rows) + 1):
+        page_url = (rows[index].get("page_url") or "").strip() if index < len(rows) else None
+        if index == len(rows) or page_url != run_url or index - run_start >= MAX_UNIT_ROWS:
+            if index > run_start and run_url:
+                units.append((page_name, relative_path, run_url, run_start, index))
+            elif index > run_start:
+                logger.warning(f"Distributed: skipping rows {run_start}-{index - 1} of {csv_path}, no page_url.")
+            run_start, run_url = index, page_url
+    return units
+
+
+def run_worker(queue_path, name, headless=True):
+    """Claims and verifies units until the queue is finished. Returns the number of rows verified."""
+    from playwright.sync_api import sync_playwright
+
+    @contextmanager
+    def chromium_context():
+        with sync_playwright() as playwright:
+            with browser_profile.open_context(playwright.chromium, launch_args={"headless": headless}) as context:
+                yield context
+
+    return process_units(queue_path, name, chromium_context)
+
+
+def process_units(queue_path, name, open_context):
+    """Claims and verifies units in the browser context open_context() yields, until the queue is finished.
+
+    Returns the number of rows verified. The worker's log records, including those of opening
+    the context, go to the queue.
+    """
+    queue = WorkQueue(queue_path)
+    handler = QueueLogHandler(queue, name)
+    logging.getLogger().addHandler(handler)
+    verified = 0
+    try:
+        with open_context() as context:
+            while True:
+                unit = queue.claim(name)
+                if unit is None:
+                    if queue.is_finished():
+                        break
+                    time.sleep(IDLE_POLL_INTERVAL)
+                    continue
+                verified += run_unit(queue, name, context, unit)
+                handler.flush()
+    finally:
+        logger.info(f"{name}: finished after verifying {verified} rows")
+        handler.flush()
+        logging.getLogger().removeHandler(handler)
+        queue.close()
+    return verified
+
+
+def run_unit(queue, name, context, unit):
+    """Verifies a unit's rows on one navigation of its page, stopping early if rows are stolen."""
+    rows = CsvRows(os.path.join(PROJECT_DIR, unit["csv_path"]))
+    page = context.new_page()
+    verified = 0
+    try:
+        loaded = navigate_to_url(page, unit["page_url"])
+        index, row_end = unit["next_row"], unit["row_end"]
+        logger.info(f"{name}: unit {unit['id']} {unit['page_name']} rows {index}-{row_end - 1}")
+        while index < row_end:
+            element_data = rows[index]
+            started = time.monotonic()
+            if loaded:
+                outcome, message = check_element(page, element_data)
+            else:
+                outcome, message = "failed", f"could not load page_url '{unit['page_url']}'"
+            queue.record_result({"page_name": unit["page_name"], "row_index": index, "page_url": unit["page_url"],
+                                 "element_type": element_data.get("element_type"), "text": element_data.get("text", ""),
+                                 "outcome": outcome, "message": message,
+                                 "elapsed_ms": round((time.monotonic() - started) * 1000, 1), "worker": name})
+            verified += 1
+            index += 1
+            row_end = queue.advance(unit["id"], name, index)
+        queue.complete(unit["id"], name)
+    finally:
+        page.close()
+    return verified
+
+
+def spawn_local_workers(queue_path, count, headless=True):
+    """Starts count worker processes on this machine."""
+    command = [sys.executable, os.path.abspath(__file__), "worker", "--queue", queue_path]
+    if not headless:
+        command.append("--headed")
+    # Local workers share the run ID, so a PLATO_PROFILE_RESET reseeds the browser profile once.
+    env = dict(os.environ, PLATO_PROFILE_RUN_ID=browser_profile.RUN_ID)
+    return [subprocess.Popen(command + ["--name", f"{socket.gethostname()}-{i}"], cwd=PROJECT_DIR, env=env)
+            for i in range(count)]
+
+
+def write_report(queue, report_path, log_path):
+    """Merges per-row results and worker logs from the queue. Returns the list of failed rows."""
+    results = queue.results()
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"summary": dict(Counter(result["outcome"] for result in results)),
+                   "workers": dict(Counter(result["worker"] for result in results)),
+                   "results": results}, f, indent=2)
+    os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+    with open(log_path, "w", encoding="utf-8") as f:
+        for record in queue.logs():
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["created"]))
+            f.write(f"{created} - {record['worker']} - {record['level']} - {record['message']}\n")
+    return [result for result in results if result["outcome"] == "failed"]
+
+
+def print_summary(queue, failures):
+    results = queue.results()
+    print(f"{len(results)} rows: " + ", ".join(f"{outcome} {count}" for outcome, count in
+                                               sorted(Counter(r["outcome"] for r in results).items())))
+    print("rows per worker: " + ", ".join(f"{worker} {count}" for worker, count in
+                                          sorted(Counter(r["worker"] for r in results).items())))
+    for failure in failures:
+        message = failure["message"].splitlines()[0] if failure["message"] else ""
+        print(f"FAIL {failure['page_name']}[{failure['row_index']}] ({failure['worker']}): {message}")
+
+
+def coordinate(args):
+    if os.path.exists(args.queue):
+        sys.exit(f"{args.queue} already exists; remove it or use 'report' to merge a finished run.")
+    queue = WorkQueue(args.queue)
+    units = []
+    for page_name, csv_path in find_data_files([p for p in args.pages.split(",") if p] or None, args.include_archived):
+        units.extend(split_into_units(page_name, csv_path))
+    queue.add_units(units)
+    print(f"Queued {len(units)} work units in {args.queue}", flush=True)
+
+    workers = spawn_local_workers(args.queue, args.workers, headless=not args.headed)
+    started = time.monotonic()
+    try:
+        while not queue.is_finished():
+            if workers and all(worker.poll() is not None for worker in workers) and not args.wait_for_workers:
+                print("All local workers exited before the queue was finished.", flush=True)
+                break
+            time.sleep(2)
+            progress = queue.progress()
+            print(f"[{time.monotonic() - started:.0f}s] units done {progress['done']}/{len(units)}, "
+                  f"rows verified {progress['rows_done']}", flush=True)
+    finally:
+        for worker in workers:
+            worker.wait()
+    failures = write_report(queue, args.report, args.log)
+    print_summary(queue, failures)
+    print(f"Merged report: {args.report}, merged log: {args.log}")
+    finished = queue.is_finished()
+    queue.close()
+    return 1 if failures or not finished else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the data/ checks across several workers via a SQLite queue.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = subparsers.add_parser("coordinate", help="Queue work units, start local workers and merge results.")
+    coordinator.add_argument("--queue", default="distributed_queue.sqlite")
+    coordinator.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                             help="Worker processes to start (0 = only workers started by hand on this host).")
+    coordinator.add_argument("--wait-for-workers", action="store_true",
+                             help="Keep waiting for workers started by hand after the spawned ones exit.")
+    coordinator.add_argument("--pages", default="", help="Comma-separated page names. Default: all.")
+    coordinator.add_argument("--include-archived", action="store_true")
+    coordinator.add_argument("--report", default="distributed_report.json")
+    coordinator.add_argument("--log", default=os.path.join("logs", "distributed_run.log"))
+    coordinator.add_argument("--headed", action="store_true")
+
+    worker = subparsers.add_parser("worker", help="Claim and verify units from an existing queue on this host.")
+    worker.add_argument("--queue", required=True)
+    worker.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}")
+    worker.add_argument("--headed", action="store_true")
+
+    report = subparsers.add_parser("report", help="Merge results and logs of a queue into one report.")
+    report.add_argument("--queue", required=True)
+    report.add_argument("--report", default="distributed_report.json")
+    report.add_argument("--log", default=os.path.join("logs", "distributed_run.log"))
+
+    args = parser.parse_args(argv)
+    if args.command == "coordinate":
+        configure_logging()
+        return coordinate(args)
+    if args.command == "worker":
+        # Workers log into the queue (merged by the coordinator), not into the shared run log.
+        logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+        run_worker(args.queue, args.name, headless=not args.headed)
+        return 0
+    queue = WorkQueue(args.queue)
+    failures = write_report(queue, args.report, args.log)
+    print_summary(queue, failures)
+    queue.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""Failure-only artifacts: a screenshot, the element's outerHTML and a trimmed trace per failed row.
+
+Set PLATO_FAILURE_ARTIFACTS=1 to capture them. Nothing is captured for rows that pass. With
+PLATO_FAILURE_TRACE=1 as well, each row also records a Playwright trace chunk (DOM snapshots, no
+screenshots). Only failed rows keep their chunk, so the saved trace covers just that row's check.
+
+Capturing happens on the test's thread, because Playwright's sync API is bound to it. Hashing,
+compression and writes go to a background thread pool. Artifacts are stored once per content
+hash under <PLATO_ARTIFACTS_DIR>/<run>/blobs/, so seven pages failing on the same broken header
+share one element screenshot and one outerHTML. Each failure is a line in failures.jsonl that
+points at its blobs. Blobs stop being written once the run's total reaches PLATO_ARTIFACTS_MAX_MB
+(default 200); failures past the budget are still listed, without their blobs.
+"""
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+try:
+    import fcntl
+except ImportError:  # Windows: the budget is enforced per process
+    fcntl = None
+
+import pytest
+
+import selector_resolver
+import tracing
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS_ENABLED = os.environ.get("PLATO_FAILURE_ARTIFACTS", "0") == "1"
+# Per-row trace chunks; left off when PLATO_TRACE_SLOWEST already records a chunk per row.
+ARTIFACT_TRACES = ARTIFACTS_ENABLED and os.environ.get("PLATO_FAILURE_TRACE", "0") == "1" and not tracing.TRACE_SLOWEST
+ARTIFACTS_DIR = os.environ.get("PLATO_ARTIFACTS_DIR", "artifacts")
+MAX_ARTIFACT_BYTES = int(float(os.environ.get("PLATO_ARTIFACTS_MAX_MB", "200")) * 1024 * 1024)
+# Workers of one run write into the same run directory and share its budget.
+RUN_ID = (os.environ.get("PLATO_RUN_ID") or os.environ.get("PYTEST_XDIST_TESTRUNUID")
+          or time.strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}")
+RUN_DIR = os.path.join(ARTIFACTS_DIR, RUN_ID)
+BLOBS_DIR = os.path.join(RUN_DIR, "blobs")
+WRITER_THREADS = 2
+CAPTURE_TIMEOUT = 3000
+# Whole-document HTML (captured when the element is missing) is cut to this many characters.
+MAX_DOCUMENT_CHARS = 2_000_000
+
+_executor = None
+_executor_lock = threading.Lock()
+_budget_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_traced_contexts = weakref.WeakSet()
+# The selector the row being watched on this thread resolved to; see record_resolved_selector.
+_row_state = threading.local()
+_UNRESOLVED = object()
+_stats = {"failures": 0, "blobs_written": 0, "blobs_deduplicated": 0, "blobs_over_budget": 0, "bytes_written": 0}
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WRITER_THREADS, thread_name_prefix="artifacts")
+            atexit.register(flush)
+        return _executor
+
+
+@contextmanager
+def _reserve_budget(size, needed):
+    """Holds the run's budget lock and yields whether size more bytes fit.
+
+    Yields None, reserving nothing, when needed() turns out False under the lock.
+    """
+    usage_path = os.path.join(RUN_DIR, "usage")
+    with _budget_lock, open(usage_path, "a+") as usage:
+        if fcntl is not None:
+            fcntl.flock(usage, fcntl.LOCK_EX)
+        try:
+            if not needed():
+                yield None
+                return
+            usage.seek(0)
+            used = int(usage.read() or 0)
+            fits = used + size <= MAX_ARTIFACT_BYTES
+            yield fits
+            if fits:
+                usage.seek(0)
+                usage.truncate()
+                usage.write(str(used + size))
+                usage.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(usage, fcntl.LOCK_UN)
+
+
+def _store_blob(data, extension, compress):
+    """Writes data once per content hash and returns the blob's name, or None if over budget."""
+    digest = hashlib.sha256(data).hexdigest()
+    name = f"{digest[:32]}.{extension}" + (".gz" if compress else "")
+    path = os.path.join(BLOBS_DIR, name)
+    if os.path.exists(path):
+        _count("blobs_deduplicated")
+        return name
+    if compress:
+        data = gzip.compress(data, compresslevel=6)
+    with _reserve_budget(len(data), lambda: not os.path.exists(path)) as fits:
+        if fits is None:  # written by another worker while this one compressed
+            _count("blobs_deduplicated")
+            return name
+        if not fits:
+            _count("blobs_over_budget")
+            return None
+        fd, tmp_path = tempfile.mkstemp(dir=BLOBS_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    _count("blobs_written")
+    _count("bytes_written", len(data))
+    return name
+
+
+def _write_failure(record, parts):
+    """Background job: stores the failure's blobs and appends its manifest line."""
+    try:
+        os.makedirs(BLOBS_DIR, exist_ok=True)
+        for kind, (data, extension, compress) in parts.items():
+            record[kind] = _store_blob(data, extension, compress) if data else None
+        with open(os.path.join(RUN_DIR, "failures.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception as e:
+        logger.warning(f"Could not write failure artifacts for {record.get('label')}: {e}")
+
+
+def record_resolved_selector(selector):
+    """Called by the verify_* checks with the selector the resolver matched (None when none did).
+
+    A failure inside watch() then captures that element rather than the row's CSV selector.
+    """
+    _row_state.selector = selector
+
+
+def capture(page, element_data, label, message, selector, trace_path=None):
+    """Captures a failed row's screenshot and outerHTML (plus its trace file) and queues the writes.
+
+    selector is the one the check resolved; when it is None the whole page is captured.
+    """
+    screenshot = dom = trace = None
+    try:
+        element = page.locator(selector).first if selector else None
+        if element is not None and element.count() > 0:
+            dom = element.evaluate("el => el.outerHTML", timeout=CAPTURE_TIMEOUT).encode("utf-8")
+            screenshot = element.screenshot(timeout=CAPTURE_TIMEOUT, animations="disabled")
+    except Exception as e:
+        logger.info(f"Element artifacts unavailable for {label}, capturing the page instead: {e}")
+    try:
+        if dom is None:
+            dom = page.content()[:MAX_DOCUMENT_CHARS].encode("utf-8")
+        if screenshot is None:
+            screenshot = page.screenshot(timeout=CAPTURE_TIMEOUT, animations="disabled")
+    except Exception as e:
+        logger.warning(f"Could not capture failure artifacts for {label}: {e}")
+    if trace_path:
+        with open(trace_path, "rb") as f:
+            trace = f.read()
+        os.remove(trace_path)
+    _count("failures")
+    record = {"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "label": label, "page_url": page.url, "selector": selector,
+              "element_type": element_data.get("element_type"), "text": str(element_data.get("text", "")),
+              "message": message}
+    # PNG and trace zips are already compressed; only the HTML is gzipped.
+    parts = {"screenshot": (screenshot, "png", False), "dom": (dom, "html", True), "trace": (trace, "zip", False)}
+    _get_executor().submit(_write_failure, record, parts)
+
+
+def _start_trace(context):
+    try:
+        if context not in _traced_contexts:
+            context.tracing.start(screenshots=False, snapshots=True)
+            _traced_contexts.add(context)
+        else:
+            context.tracing.start_chunk()
+        return True
+    except Exception as e:
+        logger.warning(f"Failure traces unavailable for this context: {e}")
+        return False
+
+
+@contextmanager
+def _watch(page, element_data, label):
+    traced = ARTIFACT_TRACES and _start_trace(page.context)
+    _row_state.selector = _UNRESOLVED
+    try:
+        yield
+    except pytest.skip.Exception:
+        if traced:
+            page.context.tracing.stop_chunk()
+        raise
+    except (pytest.fail.Exception, Exception) as e:
+        trace_path = None
+        if traced:
+            fd, trace_path = tempfile.mkstemp(suffix=".zip")
+            os.close(fd)
+            try:
+                page.context.tracing.stop_chunk(path=trace_path)
+            except Exception as trace_e:
+                logger.warning(f"Could not save the failure trace for {label}: {trace_e}")
+                os.remove(trace_path)
+                trace_path = None
+        selector = _row_state.selector
+        if selector is _UNRESOLVED:  # failed before the check resolved a selector
+            selector = selector_resolver.get_row_selector(element_data)
+        try:
+            capture(page, element_data, label, str(e), selector, trace_path)
+        except Exception as capture_e:
+            logger.warning(f"Could not capture failure artifacts for {label}: {capture_e}")
+        raise
+    else:
+        if traced:
+            page.context.tracing.stop_chunk()
+    finally:
+        _row_state.selector = _UNRESOLVED
+
+
+def watch(page, element_data, label):
+    """Captures artifacts if the enclosed row check fails. A no-op unless PLATO_FAILURE_ARTIFACTS=1."""
+    if not ARTIFACTS_ENABLED:
+        return nullcontext()
+    return _watch(page, element_data, label)
+
+
+def flush():
+    """Waits for queued writes to finish. Returns this process's artifact counters."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    with _stats_lock:
+        return dict(_stats)
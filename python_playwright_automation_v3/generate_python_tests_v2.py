@@ -1,6 +1,10 @@
+import argparse
+import csv
+import itertools
 import os
 import re
-import pandas as pd
+
+from common import iter_csv_rows
 
 PYTHON_PROJECT_DIR = "/home/ubuntu/python_playwright_automation_v3"
 DATA_DIR = os.path.join(PYTHON_PROJECT_DIR, "data")
@@ -14,51 +18,80 @@ def sanitize_test_name(name):
         return "element"
     return name[:50]
 
-def generate_python_test_file(csv_file_path, page_name):
-    test_file_name = f"test_{page_name}.py"
-    test_file_path = os.path.join(TESTS_DIR, test_file_name)
+def name_part(element_data, column):
+    # pandas rendered blank cells as "nan"; keep the test names that produced stable.
+    if column not in element_data:
+        return ""
+    return str(element_data[column]) or "nan"
+
+def open_page_rows(csv_file_path, page_name, test_file_path):
+    """Returns (page_url, rows) for a data CSV, streaming rows lazily.
 
+    Writes a skipping stub module and returns None when the CSV is missing, empty,
+    unreadable or has no page_url.
+    """
+    test_file_name = os.path.basename(test_file_path)
+    rows = iter_csv_rows(csv_file_path)
     try:
-        elements_df = pd.read_csv(csv_file_path)
-        if elements_df.empty:
-            print(f"Skipping {test_file_name} as CSV {csv_file_path} is empty.")
-            with open(test_file_path, "w") as f:
-                f.write("import pytest\n\n")
-                f.write("# This test file is empty because its corresponding CSV was empty.\n")
-                f.write("def test_empty_page_data():\n")
-                f.write("    pytest.skip(\"Skipping test as no data was provided for this page.\")\n")
-            return
-        elements = elements_df.to_dict("records")
-    except pd.errors.EmptyDataError:
+        first_element = next(rows, None)
+    except FileNotFoundError:
+        print(f"CSV file {csv_file_path} not found. Skipping test generation for {page_name}.")
+        return None
+    except (UnicodeDecodeError, csv.Error):
         print(f"Skipping {test_file_name} as CSV {csv_file_path} is empty or unreadable.")
         with open(test_file_path, "w") as f:
             f.write("import pytest\n\n")
             f.write("# This test file is empty because its corresponding CSV was empty or unreadable.\n")
             f.write("def test_empty_or_unreadable_page_data():\n")
             f.write("    pytest.skip(\"Skipping test as no data was provided or CSV was unreadable for this page.\")\n")
-        return
-    except FileNotFoundError:
-        print(f"CSV file {csv_file_path} not found. Skipping test generation for {page_name}.")
-        return
+        return None
 
-    if not elements:
-        print(f"No elements found in {csv_file_path} after loading. Skipping test generation for {page_name}.")
+    if first_element is None:
+        print(f"Skipping {test_file_name} as CSV {csv_file_path} is empty.")
         with open(test_file_path, "w") as f:
             f.write("import pytest\n\n")
-            f.write("# This test file is empty because its corresponding CSV was empty or contained no elements.\n")
-            f.write("def test_no_elements_in_page_data():\n")
-            f.write("    pytest.skip(\"Skipping test as no elements were provided in the data for this page.\")\n")
-        return
+            f.write("# This test file is empty because its corresponding CSV was empty.\n")
+            f.write("def test_empty_page_data():\n")
+            f.write("    pytest.skip(\"Skipping test as no data was provided for this page.\")\n")
+        return None
 
-    page_url = str(elements[0].get("page_url", ""))
+    page_url = str(first_element.get("page_url", ""))
     if not page_url:
         print(f"Could not determine PAGE_URL from {csv_file_path}. Skipping test generation for {page_name}.")
+        return None
+    return page_url, itertools.chain([first_element], rows)
+
+def row_test_name(element_data, i):
+    """Returns the test name for the i-th row, e.g. test_link_test_automation_0."""
+    element_type = element_data.get("element_type", "unknown")
+    element_text_for_name = name_part(element_data, "text")
+    element_selector_for_name = name_part(element_data, "selector_css")
+
+    if not element_text_for_name.strip() and element_selector_for_name.strip():
+        base_name = element_selector_for_name
+    else:
+        base_name = element_text_for_name
+    if not base_name.strip():
+         base_name = f"{element_type}_item_{i}"
+
+    return f"test_{sanitize_test_name(f'{element_type}_{base_name}')}_{i}"
+
+def generate_python_test_file(csv_file_path, page_name):
+    test_file_name = f"test_{page_name}.py"
+    test_file_path = os.path.join(TESTS_DIR, test_file_name)
+
+    # Rows are streamed from the CSV and written out one test at a time, so generating
+    # a module for a very large CSV never holds more than one row in memory.
+    opened = open_page_rows(csv_file_path, page_name, test_file_path)
+    if opened is None:
         return
+    page_url, rows = opened
 
     with open(test_file_path, "w") as f:
         f.write("import pytest\n")
-        f.write("from playwright.sync_api import Page\n")
-        f.write(f"from {COMMON_MODULE_PATH} import load_csv_data, navigate_to_url, verify_link_element, verify_content_element\n")
+        f.write(f"from {COMMON_MODULE_PATH} import load_csv_rows, verify_element\n")
+        f.write("from perf_metrics import verify_perf_budgets\n")
+        f.write("from soft_assertions import verify_page_soft\n")
         f.write("import os\n\n")
 
         f.write(f"PAGE_URL = \"{page_url}\"\n")
@@ -66,47 +99,110 @@ def generate_python_test_file(csv_file_path, page_name):
         
         f.write("@pytest.fixture(scope=\"module\")\n")
         f.write("def page_elements_data():\n")
-        f.write("    data = load_csv_data(DATA_FILE)\n")
+        f.write("    # Rows are parsed on access; only their offsets stay in memory\n")
+        f.write("    data = load_csv_rows(DATA_FILE)\n")
         f.write("    if not data:\n")
         f.write(f"        pytest.skip(f\"Skipping all tests in this file as no data could be loaded from {{DATA_FILE}}.\")\n")
         f.write("    return data\n\n")
 
-        for i, element_data_in_loop in enumerate(elements):
-            element_type = element_data_in_loop.get("element_type", "unknown")
-            element_text_for_name = str(element_data_in_loop.get("text", ""))
-            element_selector_for_name = str(element_data_in_loop.get("selector_css", ""))
-            
-            if not element_text_for_name.strip() and element_selector_for_name.strip():
-                base_name = element_selector_for_name
-            else:
-                base_name = element_text_for_name
-            if not base_name.strip():
-                 base_name = f"{element_type}_item_{i}"
-
-            test_name = sanitize_test_name(f"{element_type}_{base_name}")
+        for i, element_data_in_loop in enumerate(rows):
+            test_name = row_test_name(element_data_in_loop, i)
             
-            f.write(f"def test_{test_name}_{i}(page: Page, page_elements_data):\n")
+            f.write(f"def {test_name}(request, browser_name, page_elements_data):\n")
             f.write("    # Ensure data for this specific test exists in the loaded data for the page\n")
             f.write(f"    if len(page_elements_data) <= {i}:\n")
-            f.write(f"        pytest.skip(f\"Skipping test_{test_name}_{i} as data for index {i} is not available in the loaded data from {{DATA_FILE}}.\")\n")
+            f.write(f"        pytest.skip(f\"Skipping {test_name} as data for index {i} is not available in the loaded data from {{DATA_FILE}}.\")\n")
             f.write(f"    current_element_data = page_elements_data[{i}]\n")
             f.write("    \n")
-            f.write("    # Navigate to the page for each test to ensure a clean state\n")
-            f.write(f"    if not navigate_to_url(page, PAGE_URL):\n")
-            f.write(f"        pytest.fail(f\"Failed to navigate to {{PAGE_URL}} for test_{test_name}_{i}.\")\n")
-            f.write("    \n")
-            actual_element_type = element_data_in_loop.get("element_type", "unknown")
-            if actual_element_type == "link":
-                f.write(f"    verify_link_element(page, current_element_data)\n")
-            elif actual_element_type == "content":
-                f.write(f"    verify_content_element(page, current_element_data)\n")
-            else:
-                f.write(f"    pytest.skip(f\"Unsupported element type: {{actual_element_type}} in {{DATA_FILE}} for index {i}.\")\n")
+            f.write("    # browser_name keeps the --browser parametrization; the page fixture is only created when a row needs the browser\n")
+            f.write(f"    verify_element(request, PAGE_URL, current_element_data, page_elements_data)\n")
             f.write("\n")
+
+        f.write("@pytest.mark.soft_batch\n")
+        f.write("def test_all_rows_soft_assertions(request, browser_name, page_elements_data):\n")
+        f.write("    # Runs instead of the per-row tests with --soft-assertions: one page load, one failure listing every mismatched row\n")
+        f.write("    verify_page_soft(request, PAGE_URL, page_elements_data)\n\n")
+
+        f.write("def test_performance_budget(request, browser_name):\n")
+        f.write("    # Uses the metrics captured during this module's navigations; budgets live in data/perf_budgets.csv\n")
+        f.write("    verify_perf_budgets(request, PAGE_URL)\n")
             
     print(f"Generated Python test file: {test_file_path}")
 
+def table_columns(csv_file_path):
+    """Splits the CSV's columns into (shared, columns) for the compact row table.
+
+    shared maps columns that hold the same value in every row (e.g. page_url) to that value;
+    columns lists, in file order, the remaining columns that hold a value in at least one row.
+    """
+    header, used, first_values, varying = [], set(), None, set()
+    for row in iter_csv_rows(csv_file_path):
+        header = header or list(row)
+        first_values = first_values or dict(row)
+        used.update(column for column, value in row.items() if value)
+        varying.update(column for column, value in row.items() if value != first_values.get(column))
+    shared = {column: first_values[column] for column in header if column in used and column not in varying}
+    return shared, tuple(column for column in header if column in used and column in varying)
+
+def generate_compact_test_file(csv_file_path, page_name):
+    """Writes one table-driven module for a page: an embedded row table and one parametrised test.
+
+    Test IDs keep the per-row names of the verbose mode (e.g. test_link_test_automation_0),
+    so -k selections and reports read the same.
+    """
+    test_file_name = f"test_{page_name}.py"
+    test_file_path = os.path.join(TESTS_DIR, test_file_name)
+
+    opened = open_page_rows(csv_file_path, page_name, test_file_path)
+    if opened is None:
+        return
+    page_url, rows = opened
+    shared, columns = table_columns(csv_file_path)
+
+    with open(test_file_path, "w") as f:
+        f.write("import pytest\n")
+        f.write(f"from {COMMON_MODULE_PATH} import RowTable, verify_element\n")
+        f.write("from perf_metrics import verify_perf_budgets\n")
+        f.write("from soft_assertions import verify_page_soft\n\n")
+
+        f.write(f"PAGE_URL = \"{page_url}\"\n")
+        f.write(f"# Generated from data/{os.path.basename(csv_file_path)}; regenerate after editing it.\n")
+        f.write(f"SHARED = {shared!r}\n")
+        f.write(f"COLUMNS = {columns!r}\n")
+        f.write("# (test id, *COLUMNS) for each CSV row\n")
+        f.write("ROWS = (\n")
+        for i, element_data in enumerate(rows):
+            values = ", ".join(repr(element_data.get(column, "")) for column in columns)
+            f.write(f"    ({row_test_name(element_data, i)!r}, {values}),\n")
+        f.write(")\n\n")
+
+        f.write("@pytest.fixture(scope=\"module\")\n")
+        f.write("def page_elements_data():\n")
+        f.write("    return RowTable(COLUMNS, tuple(row[1:] for row in ROWS), SHARED)\n\n")
+
+        f.write("@pytest.mark.parametrize(\"index\", range(len(ROWS)), ids=[row[0] for row in ROWS])\n")
+        f.write("def test_row(request, browser_name, page_elements_data, index):\n")
+        f.write("    # browser_name keeps the --browser parametrization; the page fixture is only created when a row needs the browser\n")
+        f.write("    verify_element(request, PAGE_URL, page_elements_data[index], page_elements_data)\n\n")
+
+        f.write("@pytest.mark.soft_batch\n")
+        f.write("def test_all_rows_soft_assertions(request, browser_name, page_elements_data):\n")
+        f.write("    # Runs instead of test_row with --soft-assertions: one page load, one failure listing every mismatched row\n")
+        f.write("    verify_page_soft(request, PAGE_URL, page_elements_data)\n\n")
+
+        f.write("def test_performance_budget(request, browser_name):\n")
+        f.write("    # Uses the metrics captured during this module's navigations; budgets live in data/perf_budgets.csv\n")
+        f.write("    verify_perf_budgets(request, PAGE_URL)\n")
+
+    print(f"Generated compact Python test file: {test_file_path}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate pytest modules from data/*_data.csv.")
+    parser.add_argument("--compact", action="store_true",
+                        help="Emit one table-driven module per page (row table + one parametrised test).")
+    args = parser.parse_args()
+    generate = generate_compact_test_file if args.compact else generate_python_test_file
+
     os.makedirs(TESTS_DIR, exist_ok=True)
     init_py_tests = os.path.join(TESTS_DIR, "__init__.py")
     if not os.path.exists(init_py_tests):
@@ -131,7 +227,7 @@ def main():
             if page_name_match:
                 page_name = page_name_match.group(1)
                 csv_file_path = os.path.join(DATA_DIR, file_name)
-                generate_python_test_file(csv_file_path, page_name)
+                generate(csv_file_path, page_name)
 
 if __name__ == "__main__":
     main()
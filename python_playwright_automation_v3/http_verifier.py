@@ -0,0 +1,186 @@
+import logging
+import os
+import threading
+from urllib.parse import urljoin
+
+import requests
+from cssselect import SelectorError
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+from requests.adapters import HTTPAdapter
+
+import result_cache
+import selector_resolver
+import text_matching
+import url_canonical
+from common import hrefs_match, is_checkable_link, is_link_status_ok, normalize_href, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Opt-in with PLATO_HTTP_TIER=1. Static HTML can't show what a stylesheet hides or how CSS renders
+# text, so by default every row gets the browser's to_be_visible / inner_text checks.
+HTTP_TIER_ENABLED = os.environ.get("PLATO_HTTP_TIER", "0") == "1"
+HTTP_TIMEOUT = 20
+HTTP_POOL_SIZE = 16
+USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/124.0 Safari/537.36")
+
+_session = None
+_session_lock = threading.Lock()
+_documents = {}
+_link_statuses = {}
+_cache_lock = threading.Lock()
+
+
+def get_http_session():
+    """Returns the shared, connection-pooled HTTP session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT})
+            _session = session
+        return _session
+
+
+def fetch_document(page_url):
+    """Fetches and parses page_url once per run. Returns None when the page can't be used."""
+    with _cache_lock:
+        if page_url in _documents:
+            return _documents[page_url]
+    tree = None
+    try:
+        response = get_http_session().get(page_url, timeout=HTTP_TIMEOUT)
+        content_type = response.headers.get("Content-Type", "")
+        if response.status_code >= 400:
+            logger.info(f"HTTP tier: {page_url} returned {response.status_code}, rows will use Playwright.")
+        elif "html" not in content_type:
+            logger.info(f"HTTP tier: {page_url} is not HTML ({content_type}), rows will use Playwright.")
+        else:
+            tree = lxml_html.fromstring(response.content, base_url=response.url)
+            result_cache.remember_page_fingerprint(page_url, response.content)
+            logger.info(f"HTTP tier: fetched and parsed {page_url}")
+    except Exception as e:
+        logger.warning(f"HTTP tier: failed to fetch {page_url}: {e}")
+    with _cache_lock:
+        _documents[page_url] = tree
+    return tree
+
+
+def probe_link_status(url):
+    """Returns the HTTP status for url (following redirects), or None when unreachable."""
+    with _cache_lock:
+        if url in _link_statuses:
+            return _link_statuses[url]
+    status = result_cache.get_link_status(url)
+    if status is not None:
+        return status
+    # The redirect chain is recorded once per URL (and for every hop on it), so hrefs that
+    # point at an already-seen hop, e.g. the http:// or slash-less form, are lookups.
+    chain = url_canonical.resolve_redirects(url)
+    if chain is not None:
+        status = chain.status
+        result_cache.record_link_status(url, status)
+    with _cache_lock:
+        _link_statuses[url] = status
+    return status
+
+
+def find_static_element(tree, element_data):
+    """Walks the row's selector fallback chain against the parsed page. Returns (element, reason)."""
+    for strategy, kind, value in selector_resolver.build_candidates(element_data):
+        try:
+            if kind == "id":
+                matches = tree.xpath("//*[@id=$value]", value=value)
+            elif kind == "css":
+                matches = CSSSelector(value)(tree)
+            else:
+                matches = [
+                    element for element in CSSSelector(value["css"])(tree)
+                    if (not value["text"] or normalize_text(element.text_content()) == value["text"])
+                    and (not value["href"] or normalize_href(element.get("href") or "") == value["href"])
+                ]
+        except SelectorError:
+            continue
+        if matches:
+            return matches[0], None
+    return None, "no selector in the fallback chain is present in static HTML"
+
+
+def _is_statically_hidden(element):
+    while element is not None:
+        if element.get("hidden") is not None or element.get("aria-hidden") == "true":
+            return True
+        style = (element.get("style") or "").replace(" ", "").lower()
+        if "display:none" in style or "visibility:hidden" in style:
+            return True
+        element = element.getparent()
+    return False
+
+
+def verify_row_http(page_url, element_data):
+    """Verifies a CSV row against the server-rendered HTML of page_url.
+
+    Returns (True, None) when the row is verified, otherwise (False, reason). A False
+    result is never a test failure on its own; the caller escalates to Playwright.
+    """
+    selector = selector_resolver.get_row_selector(element_data)
+    element_type = element_data.get("element_type")
+    if element_type not in ("link", "content"):
+        return False, f"unsupported element type {element_type}"
+    if selector and selector_resolver.is_playwright_only(selector):
+        return False, f"selector '{selector}' needs JS rendering"
+
+    tree = fetch_document(page_url)
+    if tree is None:
+        return False, "page HTML unavailable"
+    element, reason = find_static_element(tree, element_data)
+    if element is None:
+        return False, reason
+    if _is_statically_hidden(element):
+        return False, f"element for '{selector}' is hidden in static HTML"
+
+    expected_text = str(element_data.get("text", "")).strip()
+    actual_text = normalize_text(element.text_content())
+
+    if element_type == "content":
+        try:
+            mode, min_similarity = text_matching.match_settings(element_data)
+        except ValueError as e:
+            return False, f"invalid min_similarity: {e}"
+        match = text_matching.match_text(normalize_text(expected_text), actual_text, mode, min_similarity)
+        if not match.matched:
+            return False, f"content mismatch ({mode} mode, similarity {match.score:.2f}), expected '{expected_text}', got '{actual_text}'"
+        logger.info(f"HTTP tier: content MATCH on {page_url} for selector '{selector}'")
+        return True, None
+
+    if expected_text.lower() == "plato logo":
+        img = element.find(".//img")
+        img_alt = img.get("alt") if img is not None else None
+        if not img_alt or "plato" not in img_alt.lower():
+            return False, f"logo alt text mismatch, got '{img_alt}'"
+    elif expected_text and actual_text != expected_text:
+        return False, f"link text mismatch, expected '{expected_text}', got '{actual_text}'"
+
+    expected_href = str(element_data.get("href", "")).strip()
+    actual_href = element.get("href")
+    if actual_href:
+        actual_href = actual_href.strip()
+        if not hrefs_match(expected_href, actual_href, page_url)[0]:
+            return False, f"href mismatch, expected '{expected_href}', got '{actual_href}'"
+    elif expected_href:
+        return False, "href attribute missing in static HTML"
+
+    if is_checkable_link(expected_href):
+        url_to_check = actual_href if actual_href else expected_href
+        if not url_to_check.startswith("http"):
+            url_to_check = urljoin(page_url, url_to_check)
+        status = probe_link_status(url_to_check)
+        if not is_link_status_ok(status):
+            return False, f"link {url_to_check} returned {status} over HTTP"
+
+    logger.info(f"HTTP tier: link MATCH on {page_url} for selector '{selector}'")
+    return True, None
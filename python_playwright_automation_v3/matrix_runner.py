@@ -0,0 +1,178 @@
+"""Runs the data/*_data.csv checks across a browser x viewport matrix concurrently.
+
+Each combination runs in its own process, so module-level state (resolved selectors, captured
+metrics, audited pages) is never shared between browsers or viewports.
+
+Usage:
+    python matrix_runner.py                                   # chromium,firefox,webkit x desktop,mobile
+    python matrix_runner.py --browsers chromium,webkit --viewports mobile --pages careers,training
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import browser_profile
+import perf_metrics
+from common import check_element, configure_logging, is_checkable_link, load_csv_data, navigate_to_url
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+BROWSERS = ("chromium", "firefox", "webkit")
+VIEWPORTS = {
+    "desktop": {"viewport": {"width": 1366, "height": 768}},
+    "mobile": {"viewport": {"width": 390, "height": 844}, "device_scale_factor": 3, "has_touch": True,
+               "is_mobile": True},
+}
+
+
+def load_data_bundle(page_names=None, data_dir=DATA_DIR):
+    """Parses every data/*_data.csv once. Returns {page_name: (page_url, rows)} shared by all combinations."""
+    bundle = {}
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, "*_data.csv"))):
+        if csv_path.endswith("_archived_data.csv"):
+            continue
+        page_name = re.match(r"(.+)_data\.csv", os.path.basename(csv_path)).group(1)
+        if page_names and page_name not in page_names:
+            continue
+        rows = load_csv_data(csv_path)
+        page_url = str(rows[0].get("page_url", "")) if rows else ""
+        if not page_url:
+            logger.warning(f"Matrix: skipping {csv_path}, no page_url column or no rows.")
+            continue
+        bundle[page_name] = (page_url, rows)
+    return bundle
+
+
+def prefetch_link_statuses(bundle):
+    """Probes every distinct link once over HTTP before the matrix starts.
+
+    Reachability doesn't depend on the browser, so successful statuses land in the shared
+    result cache and no combination repeats the probe. Links that fail over HTTP are left
+    for the browser probe in verify_link_element.
+    """
+    from http_verifier import probe_link_status
+
+    urls = set()
+    for page_url, rows in bundle.values():
+        for row in rows:
+            href = str(row.get("href", "")).strip()
+            if row.get("element_type") == "link" and is_checkable_link(href):
+                urls.add(href if href.startswith("http") else urljoin(page_url, href))
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        statuses = dict(zip(urls, executor.map(probe_link_status, urls)))
+    logger.info(f"Matrix: pre-probed {len(urls)} distinct links once for all combinations.")
+    return statuses
+
+
+def _init_combination_process():
+    # Forked processes inherit the parent's log handler; spawned ones append to the same log.
+    if not logging.getLogger().handlers:
+        configure_logging(filemode="a")
+
+
+def run_combination(browser_name, viewport_name, bundle, headless=True):
+    """Runs every page of the bundle in one browser/viewport combination (in its own process)."""
+    from playwright.sync_api import sync_playwright
+
+    combo = f"{browser_name}/{viewport_name}"
+    perf_metrics.combination = (browser_name, viewport_name)
+    results = {}
+    context_args = dict(VIEWPORTS[viewport_name])
+    if browser_name == "firefox":
+        context_args.pop("is_mobile", None)  # Firefox doesn't support mobile emulation
+    started = time.monotonic()
+    page_urls = sorted({page_url for page_url, _ in bundle.values()})
+    with sync_playwright() as playwright, browser_profile.open_context(
+            getattr(playwright, browser_name), page_urls, launch_args={"headless": headless}, **context_args) as context:
+        for page_name, (page_url, rows) in bundle.items():
+            page = context.new_page()
+            if not navigate_to_url(page, page_url):
+                for index in range(len(rows)):
+                    results[(page_name, index)] = ("failed", f"navigation to {page_url} failed")
+                page.close()
+                continue
+            for index, element_data in enumerate(rows):
+                results[(page_name, index)] = check_element(page, element_data)
+            page.close()
+    logger.info(f"Matrix: {combo} finished in {time.monotonic() - started:.1f}s")
+    return combo, results
+
+
+def run_matrix(browsers, viewports, bundle, headless=True, workers=None):
+    """Runs all combinations concurrently and returns {combo: {(page_name, index): (outcome, message)}}."""
+    combinations = [(browser, viewport) for browser in browsers for viewport in viewports]
+    prefetch_link_statuses(bundle)
+    # A fresh process per combination (max_tasks_per_child=1), also when --workers makes them queue.
+    with ProcessPoolExecutor(max_workers=workers or len(combinations), max_tasks_per_child=1,
+                             initializer=_init_combination_process) as executor:
+        futures = [executor.submit(run_combination, browser, viewport, bundle, headless)
+                   for browser, viewport in combinations]
+        return dict(future.result() for future in futures)
+
+
+def print_matrix_report(bundle, matrix):
+    """Prints one combined table: a row per CSV row, a column per combination."""
+    combos = list(matrix)
+    symbols = {"passed": "PASS", "failed": "FAIL", "skipped": "SKIP"}
+    print(f"{'page/row':<48}" + "".join(f"{combo:>18}" for combo in combos))
+    failures = []
+    for page_name, (page_url, rows) in bundle.items():
+        for index, element_data in enumerate(rows):
+            label = f"{page_name}[{index}] {element_data.get('element_type')} {str(element_data.get('text', ''))[:20]}"
+            cells = []
+            for combo in combos:
+                outcome, message = matrix[combo].get((page_name, index), ("skipped", "not run"))
+                cells.append(f"{symbols[outcome]:>18}")
+                if outcome == "failed":
+                    failures.append((combo, page_name, index, message))
+            print(f"{label:<48}" + "".join(cells))
+    totals = {combo: sum(1 for outcome, _ in matrix[combo].values() if outcome == "passed") for combo in combos}
+    print("passed per combination: " + ", ".join(f"{combo} {count}" for combo, count in totals.items()))
+    for combo, page_name, index, message in failures:
+        print(f"FAIL {combo} {page_name}[{index}]: {message.splitlines()[0] if message else ''}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the CSV checks across browsers and viewports concurrently.")
+    parser.add_argument("--browsers", default=",".join(BROWSERS))
+    parser.add_argument("--viewports", default=",".join(VIEWPORTS))
+    parser.add_argument("--pages", default="", help="Comma-separated page names (e.g. careers,training). Default: all.")
+    parser.add_argument("--workers", type=int, default=None, help="Max combinations running at once.")
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--report", help="Write the JSON matrix report to this path.")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    browsers = [b for b in args.browsers.split(",") if b]
+    viewports = [v for v in args.viewports.split(",") if v]
+    for name in browsers:
+        if name not in BROWSERS:
+            parser.error(f"Unknown browser {name}")
+    for name in viewports:
+        if name not in VIEWPORTS:
+            parser.error(f"Unknown viewport {name}")
+
+    bundle = load_data_bundle([p for p in args.pages.split(",") if p] or None)
+    started = time.monotonic()
+    matrix = run_matrix(browsers, viewports, bundle, headless=not args.headed, workers=args.workers)
+    failures = print_matrix_report(bundle, matrix)
+    print(f"{len(matrix)} combinations in {time.monotonic() - started:.1f}s")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({combo: {f"{page}[{index}]": {"outcome": outcome, "message": message}
+                               for (page, index), (outcome, message) in results.items()}
+                       for combo, results in matrix.items()}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
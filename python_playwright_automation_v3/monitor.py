@@ -0,0 +1,422 @@
+"""Long-running synthetic monitor: re-runs the data/*_data.csv checks on a per-page schedule.
+
+The data rows are parsed once (and re-parsed only when a CSV changes) and each worker thread keeps
+a warm browser, so a check costs a navigation plus the row checks, with none of the per-run start-up
+of a cron-driven pytest run. Results are appended to a JSON Lines file and exposed as Prometheus
+metrics; alerts fire only when a row's outcome changes.
+
+Usage:
+    python monitor.py [--interval 300] [--schedule careers=60,training=900] [--jitter 0.1]
+                      [--concurrency 2] [--results monitor_results.jsonl] [--metrics-port 9109]
+                      [--alerts monitor_alerts.jsonl] [--alert-webhook URL] [--max-file-mb 100]
+                      [--file-backups 3] [--once]
+"""
+import argparse
+import glob
+import heapq
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+import a11y_audit
+import browser_profile
+import result_cache
+import selector_resolver
+import url_canonical
+from common import check_element, configure_logging, is_checkable_link, iter_csv_rows, navigate_to_url
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_INTERVAL = 300.0
+DEFAULT_JITTER = 0.1
+DATA_RELOAD_INTERVAL = 10.0
+# The results and alerts files are rotated (file -> file.1 -> ... -> file.<backups>) past this size.
+DEFAULT_MAX_FILE_MB = 100.0
+DEFAULT_FILE_BACKUPS = 3
+WEBHOOK_TIMEOUT = 10
+
+
+class MonitoredPage:
+    """A page_url, the CSV rows checked on it and its check interval in seconds."""
+
+    def __init__(self, page_name, page_url, rows, interval):
+        self.page_name = page_name
+        self.page_url = page_url
+        self.rows = rows  # [(index, row)]
+        self.interval = interval
+
+    def link_urls(self):
+        """The absolute URLs of the page's checkable link rows."""
+        return [urljoin(self.page_url, str(row.get("href", "")).strip()) for _, row in self.rows
+                if row.get("element_type") == "link" and is_checkable_link(str(row.get("href", "")).strip())]
+
+
+def load_pages(data_dir=DATA_DIR, page_names=None, interval=DEFAULT_INTERVAL, schedule=None):
+    """Parses the current data CSVs into {page_url: MonitoredPage}. Rows without a page_url are skipped."""
+    pages = {}
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, "*_data.csv"))):
+        if csv_path.endswith("_archived_data.csv"):
+            continue
+        page_name = re.match(r"(.+)_data\.csv", os.path.basename(csv_path)).group(1)
+        if page_names and page_name not in page_names:
+            continue
+        try:
+            for index, row in enumerate(iter_csv_rows(csv_path)):
+                page_url = (row.get("page_url") or "").strip()
+                if not page_url:
+                    continue
+                if page_url not in pages:
+                    pages[page_url] = MonitoredPage(page_name, page_url, [], (schedule or {}).get(page_name, interval))
+                pages[page_url].rows.append((index, row))
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"Monitor: could not read {csv_path}: {e}")
+    return pages
+
+
+def data_mtimes(data_dir=DATA_DIR):
+    return {path: os.stat(path).st_mtime_ns for path in glob.glob(os.path.join(data_dir, "*_data.csv"))}
+
+
+class Scheduler:
+    """Hands out pages as they fall due; a page is re-queued only after its check finishes,
+    so it is never checked by two workers at once."""
+
+    def __init__(self, jitter=DEFAULT_JITTER):
+        self.jitter = jitter
+        self._pages = {}
+        self._heap = []  # (due, page_url)
+        self._condition = threading.Condition()
+
+    def _next_due(self, interval, now):
+        return now + interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def sync(self, pages):
+        """Replaces the monitored pages. New pages are staggered across their first interval."""
+        now = time.monotonic()
+        with self._condition:
+            for page_url, page in pages.items():
+                if page_url not in self._pages:
+                    heapq.heappush(self._heap, (now + random.uniform(0, page.interval * self.jitter), page_url))
+            self._pages = dict(pages)
+            self._condition.notify_all()
+
+    def take(self, stop):
+        """Blocks until a page is due (returning it) or stop is set (returning None)."""
+        with self._condition:
+            while not stop.is_set():
+                # Entries for pages dropped by sync are discarded as they come up.
+                while self._heap and self._heap[0][1] not in self._pages:
+                    heapq.heappop(self._heap)
+                delay = self._heap[0][0] - time.monotonic() if self._heap else 1.0
+                if self._heap and delay <= 0:
+                    return self._pages[heapq.heappop(self._heap)[1]]
+                self._condition.wait(min(delay, 1.0))
+        return None
+
+    def done(self, page):
+        with self._condition:
+            if page.page_url in self._pages:
+                heapq.heappush(self._heap, (self._next_due(self._pages[page.page_url].interval, time.monotonic()),
+                                            page.page_url))
+                self._condition.notify()
+
+
+class StateTracker:
+    """Remembers each row's last outcome and reports only the rows whose outcome changed."""
+
+    def __init__(self):
+        self._outcomes = {}
+        self._lock = threading.Lock()
+
+    def update(self, page, results):
+        """Returns the changed rows of a page check. A first observation counts only if it failed."""
+        changed = []
+        with self._lock:
+            for result in results:
+                if result["outcome"] == "skipped":
+                    continue
+                key = (page.page_url, result["row_key"])
+                previous = self._outcomes.get(key)
+                self._outcomes[key] = result["outcome"]
+                if previous != result["outcome"] and (previous is not None or result["outcome"] == "failed"):
+                    changed.append(dict(result, previous=previous))
+        return changed
+
+
+class Metrics:
+    """Per-page gauges and counters, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._pages = {}
+        self._alerts_total = 0
+        self._lock = threading.Lock()
+
+    def record(self, page, loaded, results, duration):
+        failing = sum(1 for result in results if result["outcome"] == "failed")
+        with self._lock:
+            entry = self._pages.setdefault(page.page_url, {"page": page.page_name, "checks": 0})
+            entry.update(up=int(loaded and not failing), failing=failing, duration=round(duration, 3),
+                         last=round(time.time(), 3))
+            entry["checks"] += 1
+
+    def any_failing(self):
+        with self._lock:
+            return any(not entry["up"] for entry in self._pages.values())
+
+    def count_alert(self):
+        with self._lock:
+            self._alerts_total += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            series = [("plato_monitor_page_up", "gauge", "1 if the page loaded and every row passed", "up"),
+                      ("plato_monitor_rows_failing", "gauge", "Rows failing on the last check", "failing"),
+                      ("plato_monitor_check_duration_seconds", "gauge", "Duration of the last check", "duration"),
+                      ("plato_monitor_last_check_timestamp_seconds", "gauge", "Unix time of the last check", "last"),
+                      ("plato_monitor_checks_total", "counter", "Checks run", "checks")]
+            for name, kind, help_text, field in series:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for page_url, entry in sorted(self._pages.items()):
+                    lines.append(f'{name}{{page="{entry["page"]}",url="{page_url}"}} {entry[field]}')
+            lines += ["# HELP plato_monitor_alerts_total State-change alerts sent",
+                      "# TYPE plato_monitor_alerts_total counter", f"plato_monitor_alerts_total {self._alerts_total}"]
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(metrics, port):
+    """Serves metrics.render() at http://127.0.0.1:<port>/metrics from a background thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+class Monitor:
+    """Shared state of a monitor run: the schedule, row outcomes, metrics and output files."""
+
+    def __init__(self, scheduler, results_path=None, alerts_path=None, alert_webhook=None,
+                 max_file_bytes=int(DEFAULT_MAX_FILE_MB * 1024 * 1024), file_backups=DEFAULT_FILE_BACKUPS):
+        self.scheduler = scheduler
+        self.states = StateTracker()
+        self.metrics = Metrics()
+        self.results_path = results_path
+        self.alerts_path = alerts_path
+        self.alert_webhook = alert_webhook
+        self.max_file_bytes = max_file_bytes
+        self.file_backups = file_backups
+        self._write_lock = threading.Lock()
+        # Cached link statuses and redirect chains would hide a link that broke since the last check.
+        result_cache.LINK_CACHE_TTL_SECONDS = 0
+
+    def _rotate(self, path):
+        # Called under _write_lock. A long-running monitor would otherwise grow the file without limit.
+        try:
+            if os.path.getsize(path) < self.max_file_bytes:
+                return
+        except OSError:
+            return
+        if self.file_backups < 1:
+            os.remove(path)
+            return
+        for backup in range(self.file_backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{backup}"):
+                os.replace(f"{path}.{backup}", f"{path}.{backup + 1}")
+        os.replace(path, f"{path}.1")
+        logger.info(f"Monitor: rotated {path}")
+
+    def _append(self, path, records):
+        if not path or not records:
+            return
+        with self._write_lock:
+            self._rotate(path)
+            with open(path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+
+    def check_page(self, warm_pages, context, page):
+        """Navigates the worker's warm page for page_url and checks every row on it."""
+        started = time.monotonic()
+        # Redirect chains, the page fingerprint and the audit findings are kept for the process's
+        # lifetime; a monitor must see the page and its links change between checks. Only this
+        # page's chains are dropped: other workers may be looking theirs up mid-check.
+        url_canonical.forget_chains(page.link_urls())
+        result_cache.forget_page_fingerprint(page.page_url)
+        a11y_audit.forget_page(page.page_url)
+        browser_page = warm_pages.get(page.page_url)
+        if browser_page is None or browser_page.is_closed():
+            browser_page = warm_pages[page.page_url] = context.new_page()
+        loaded = navigate_to_url(browser_page, page.page_url)
+        if loaded:
+            selector_resolver.forget_page(browser_page.url)
+            selector_resolver.prime_page_rows(browser_page.url, [row for _, row in page.rows])
+        checked_at = time.time()
+        results = []
+        for index, element_data in page.rows:
+            row_started = time.monotonic()
+            if loaded:
+                outcome, message = check_element(browser_page, element_data)
+            else:
+                outcome, message = "failed", f"could not load page_url '{page.page_url}'"
+            results.append({"checked_at": checked_at, "page": page.page_name, "page_url": page.page_url,
+                            "index": index, "row_key": result_cache.compute_row_key(element_data),
+                            "element_type": element_data.get("element_type"), "text": element_data.get("text", ""),
+                            "outcome": outcome, "message": message,
+                            "elapsed_ms": round((time.monotonic() - row_started) * 1000, 1)})
+        duration = time.monotonic() - started
+        self.metrics.record(page, loaded, results, duration)
+        self._append(self.results_path, results)
+        changed = self.states.update(page, results)
+        if changed:
+            self.alert(page, changed)
+        failing = sum(1 for result in results if result["outcome"] == "failed")
+        logger.info(f"Monitor: {page.page_name} {len(results)} rows, {failing} failing, {duration:.1f}s")
+        return results
+
+    def alert(self, page, changed):
+        """Reports rows whose outcome changed, to stdout, the alerts file and the webhook."""
+        self.metrics.count_alert()
+        alert = {"at": time.time(), "page": page.page_name, "page_url": page.page_url,
+                 "rows": [{key: row[key] for key in ("index", "element_type", "text", "previous", "outcome", "message")}
+                          for row in changed]}
+        for row in alert["rows"]:
+            detail = f" - {row['message'].splitlines()[0]}" if row["outcome"] == "failed" and row["message"] else ""
+            print(f"ALERT {page.page_name}[{row['index']}] {row['element_type']} '{row['text']}': "
+                  f"{row['previous'] or 'new'} -> {row['outcome']}{detail}", flush=True)
+        self._append(self.alerts_path, [alert])
+        if self.alert_webhook:
+            from http_verifier import get_http_session
+
+            try:
+                get_http_session().post(self.alert_webhook, json=alert, timeout=WEBHOOK_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Monitor: alert webhook {self.alert_webhook} failed: {e}")
+
+
+def run_worker(monitor, stop, headless=True, once_pages=None):
+    """Checks due pages with one warm browser until stop is set (or, with once_pages, until none are left)."""
+    from playwright.sync_api import sync_playwright
+
+    warm_pages = {}
+    with sync_playwright() as playwright, \
+            browser_profile.open_context(playwright.chromium, launch_args={"headless": headless}) as context:
+        while not stop.is_set():
+            if once_pages is not None:
+                try:
+                    page = once_pages.pop()
+                except IndexError:
+                    return
+            else:
+                page = monitor.scheduler.take(stop)
+                if page is None:
+                    return
+            try:
+                monitor.check_page(warm_pages, context, page)
+            except Exception as e:
+                logger.error(f"Monitor: check of {page.page_url} failed: {e}")
+            finally:
+                if once_pages is None:
+                    monitor.scheduler.done(page)
+
+
+def parse_schedule(text):
+    """Parses "careers=60,training=900" into {page_name: seconds}."""
+    schedule = {}
+    for item in filter(None, text.split(",")):
+        page_name, _, seconds = item.partition("=")
+        schedule[page_name.strip()] = float(seconds)
+    return schedule
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Continuously re-run the CSV checks and alert on state changes.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--pages", default="", help="Comma-separated page names (e.g. careers,training). Default: all.")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between checks of a page.")
+    parser.add_argument("--schedule", default="", help="Per-page intervals, e.g. careers=60,training=900.")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_JITTER,
+                        help="Fraction of the interval each check is randomly moved by.")
+    parser.add_argument("--concurrency", type=int, default=2, help="Pages checked at once (one browser each).")
+    parser.add_argument("--results", default="monitor_results.jsonl", help="JSON Lines file of every row result.")
+    parser.add_argument("--alerts", default="monitor_alerts.jsonl", help="JSON Lines file of state-change alerts.")
+    parser.add_argument("--alert-webhook", help="POST each alert as JSON to this URL.")
+    parser.add_argument("--max-file-mb", type=float, default=DEFAULT_MAX_FILE_MB,
+                        help="Rotate the results and alerts files once they reach this size.")
+    parser.add_argument("--file-backups", type=int, default=DEFAULT_FILE_BACKUPS,
+                        help="Rotated files kept per file (e.g. monitor_results.jsonl.1 .. .3).")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on 127.0.0.1:<port>/metrics.")
+    parser.add_argument("--once", action="store_true", help="Check every page once and exit (1 if any row failed).")
+    parser.add_argument("--headed", action="store_true")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    page_names = [p for p in args.pages.split(",") if p] or None
+    schedule = parse_schedule(args.schedule)
+
+    def reload_pages():
+        return load_pages(args.data_dir, page_names, args.interval, schedule)
+
+    scheduler = Scheduler(args.jitter)
+    monitor = Monitor(scheduler, args.results, args.alerts, args.alert_webhook,
+                      int(args.max_file_mb * 1024 * 1024), args.file_backups)
+    if args.metrics_port:
+        serve_metrics(monitor.metrics, args.metrics_port)
+        print(f"Metrics at http://127.0.0.1:{args.metrics_port}/metrics", flush=True)
+
+    pages = reload_pages()
+    stop = threading.Event()
+    once_pages = list(pages.values()) if args.once else None
+    if not args.once:
+        scheduler.sync(pages)
+    workers = [threading.Thread(target=run_worker, args=(monitor, stop, not args.headed, once_pages),
+                                name=f"monitor-{i}") for i in range(max(1, min(args.concurrency, len(pages))))]
+    for worker in workers:
+        worker.start()
+    print(f"Monitoring {len(pages)} pages with {len(workers)} workers (Ctrl+C to stop)...", flush=True)
+
+    mtimes = data_mtimes(args.data_dir)
+    try:
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(DATA_RELOAD_INTERVAL if not args.once else 0.5)
+            current = data_mtimes(args.data_dir)
+            if not args.once and current != mtimes:
+                mtimes = current
+                pages = reload_pages()
+                scheduler.sync(pages)
+                logger.info(f"Monitor: data changed, now monitoring {len(pages)} pages")
+    except KeyboardInterrupt:
+        print("Stopping monitor...")
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+    if args.once:
+        return 1 if monitor.metrics.any_failing() else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import csv
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends aren't serialised between processes
+    fcntl = None
+
+import pytest
+
+from browser_profile import RUN_ID
+
+logger = logging.getLogger(__name__)
+
+# Set PLATO_PERF_METRICS=0 to skip metric collection in navigate_to_url.
+PERF_METRICS_ENABLED = os.environ.get("PLATO_PERF_METRICS", "1") != "0"
+METRICS_DIR = "metrics"
+METRICS_FILE = os.path.join(METRICS_DIR, "perf_metrics.csv")
+BUDGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "perf_budgets.csv")
+# navigate_to_url returns at domcontentloaded and metrics are sampled right away: timings the page
+# hasn't reached yet (load, often the paints) are recorded as absent. Set PLATO_PERF_WAIT_FOR_LOAD=1
+# to wait for the load event first (up to LOAD_TIMEOUT ms), for complete load timings and request counts.
+WAIT_FOR_LOAD = os.environ.get("PLATO_PERF_WAIT_FOR_LOAD", "0") == "1"
+LOAD_TIMEOUT = 15000
+
+RESOURCE_TYPES = ("script", "css", "img", "font", "fetch", "other")
+METRIC_COLUMNS = [
+    "ttfb_ms", "dom_interactive_ms", "dom_content_loaded_ms", "load_event_ms",
+    "first_paint_ms", "first_contentful_paint_ms", "document_transfer_bytes",
+    "request_count", "total_transfer_bytes",
+] + [f"{resource_type}_transfer_bytes" for resource_type in RESOURCE_TYPES] \
+  + [f"{resource_type}_request_count" for resource_type in RESOURCE_TYPES]
+
+# Reads everything from the browser's performance timeline in a single round trip.
+COLLECT_METRICS_JS = """
+() => {
+    const nav = performance.getEntriesByType("navigation")[0];
+    const paints = {};
+    for (const entry of performance.getEntriesByType("paint")) {
+        paints[entry.name] = entry.startTime;
+    }
+    const resources = performance.getEntriesByType("resource").map(entry => ({
+        initiator: entry.initiatorType,
+        name: entry.name,
+        transfer: entry.transferSize || 0,
+    }));
+    return {
+        ttfb: nav ? nav.responseStart : null,
+        domInteractive: nav ? nav.domInteractive : null,
+        domContentLoaded: nav ? nav.domContentLoadedEventEnd : null,
+        loadEvent: nav ? nav.loadEventEnd : null,
+        documentTransfer: nav ? nav.transferSize : null,
+        firstPaint: paints["first-paint"] ?? null,
+        firstContentfulPaint: paints["first-contentful-paint"] ?? null,
+        resources: resources,
+    };
+}
+"""
+
+# Each sample records the browser and viewport it was taken in, so runs of several
+# combinations (matrix_runner.py) keep separate series in the one file, and the run it belongs
+# to, so a budget check on one xdist worker can read the sample another worker took.
+SAMPLE_COLUMNS = ["timestamp", "run_id", "page_url", "browser", "viewport"] + METRIC_COLUMNS
+
+_latest_metrics = {}
+_budgets = None
+_write_lock = threading.Lock()
+# (browser, viewport name) set by a runner for every sample of this process; see sample_context.
+combination = None
+
+
+def _resource_type(resource):
+    initiator = resource["initiator"]
+    name = resource["name"].split("?")[0].lower()
+    if name.endswith((".woff", ".woff2", ".ttf", ".otf", ".eot")):
+        return "font"
+    if initiator == "img" or name.endswith((".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".avif", ".ico")):
+        return "img"
+    if initiator == "script" or name.endswith(".js"):
+        return "script"
+    if initiator == "css" or name.endswith(".css"):
+        return "css"
+    if initiator in ("fetch", "xmlhttprequest", "beacon"):
+        return "fetch"
+    return "other"
+
+
+def _milliseconds(value):
+    # Timeline fields that haven't happened yet (e.g. loadEventEnd on a page still
+    # loading when it is sampled) are reported as 0 by the browser.
+    return round(value, 1) if value else None
+
+
+def wait_for_load(page, page_url):
+    """Waits for the load event, so the sample includes the load timing and every request it waited on."""
+    try:
+        page.wait_for_load_state("load", timeout=LOAD_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"{page_url} did not fire the load event within {LOAD_TIMEOUT} ms, sampling partial metrics: {e}")
+
+
+def collect_page_metrics(page):
+    """Collects Navigation Timing, paint timings and per-type transfer sizes for the loaded page."""
+    raw = page.evaluate(COLLECT_METRICS_JS)
+    metrics = {
+        "ttfb_ms": _milliseconds(raw["ttfb"]),
+        "dom_interactive_ms": _milliseconds(raw["domInteractive"]),
+        "dom_content_loaded_ms": _milliseconds(raw["domContentLoaded"]),
+        "load_event_ms": _milliseconds(raw["loadEvent"]),
+        "first_paint_ms": _milliseconds(raw["firstPaint"]),
+        "first_contentful_paint_ms": _milliseconds(raw["firstContentfulPaint"]),
+        "document_transfer_bytes": raw["documentTransfer"],
+    }
+    for resource_type in RESOURCE_TYPES:
+        metrics[f"{resource_type}_transfer_bytes"] = 0
+        metrics[f"{resource_type}_request_count"] = 0
+    for resource in raw["resources"]:
+        resource_type = _resource_type(resource)
+        metrics[f"{resource_type}_transfer_bytes"] += resource["transfer"]
+        metrics[f"{resource_type}_request_count"] += 1
+    metrics["request_count"] = len(raw["resources"]) + 1
+    metrics["total_transfer_bytes"] = (raw["documentTransfer"] or 0) + sum(r["transfer"] for r in raw["resources"])
+    return metrics
+
+
+def sample_context(page):
+    """Returns (browser, viewport) for a sample: the runner's combination, else what the page reports."""
+    if combination is not None:
+        return combination
+    browser = page.context.browser  # None for a persistent context
+    size = page.viewport_size
+    return (browser.browser_type.name if browser else "", f"{size['width']}x{size['height']}" if size else "")
+
+
+def _rotate_old_format():
+    # Files written before the browser/viewport columns keep their own header; start a new one beside them.
+    with open(METRICS_FILE, newline="") as f:
+        header = next(csv.reader(f), None)
+    if header and header != SAMPLE_COLUMNS:
+        os.replace(METRICS_FILE, os.path.join(METRICS_DIR, f"perf_metrics_{time.strftime('%Y%m%d_%H%M%S')}.csv"))
+
+
+def record_page_metrics(page_url, metrics, browser="", viewport=""):
+    """Appends one sample for page_url to the metrics time series.
+
+    Appends are serialised between threads and (with fcntl) processes, so concurrent runners
+    never interleave rows or write the header twice.
+    """
+    _latest_metrics[page_url] = metrics
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    row = [time.strftime("%Y-%m-%dT%H:%M:%S"), RUN_ID, page_url, browser, viewport] + [metrics.get(c) for c in METRIC_COLUMNS]
+    with _write_lock, open(METRICS_FILE + ".lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(METRICS_FILE):
+                _rotate_old_format()
+            write_header = not os.path.exists(METRICS_FILE)
+            with open(METRICS_FILE, "a", newline="") as f:
+                writer = csv.writer(f)
+                if write_header:
+                    writer.writerow(SAMPLE_COLUMNS)
+                writer.writerow(row)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def capture_navigation_metrics(page, page_url):
+    """Collects and records metrics for a page navigate_to_url has just loaded."""
+    if not PERF_METRICS_ENABLED:
+        return None
+    try:
+        if WAIT_FOR_LOAD:
+            wait_for_load(page, page_url)
+        metrics = collect_page_metrics(page)
+        record_page_metrics(page_url, metrics, *sample_context(page))
+        logger.info(f"Performance metrics for {page_url}: DOMContentLoaded {metrics['dom_content_loaded_ms']} ms, "
+                    f"{metrics['request_count']} requests, {metrics['total_transfer_bytes']} bytes")
+        return metrics
+    except Exception as e:
+        logger.warning(f"Could not collect performance metrics for {page_url}: {e}")
+        return None
+
+
+def _metric_value(cell):
+    if not cell:
+        return None
+    value = float(cell)
+    return int(value) if value.is_integer() else value
+
+
+def _read_run_metrics(page_url):
+    """Returns the last sample this run wrote for page_url to the metrics file, or None."""
+    if not os.path.exists(METRICS_FILE):
+        return None
+    latest = None
+    with _write_lock, open(METRICS_FILE + ".lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+        try:
+            with open(METRICS_FILE, newline="") as f:
+                for row in csv.DictReader(f):
+                    if row.get("run_id") == RUN_ID and row.get("page_url") == page_url:
+                        latest = row
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return {column: _metric_value(latest.get(column)) for column in METRIC_COLUMNS} if latest else None
+
+
+def get_latest_metrics(page_url):
+    """Returns the most recent metrics captured for page_url in this run, or None.
+
+    Samples from this process come from memory; under pytest-xdist the page may have been loaded
+    by another worker of the run, whose sample is read back from the metrics file.
+    """
+    return _latest_metrics.get(page_url) or _read_run_metrics(page_url)
+
+
+def load_perf_budgets():
+    """Loads data/perf_budgets.csv as {page_url: {metric: max_value}}."""
+    global _budgets
+    if _budgets is None:
+        _budgets = {}
+        if os.path.exists(BUDGETS_FILE):
+            with open(BUDGETS_FILE, newline="") as f:
+                for row in csv.DictReader(f):
+                    metric = row["metric"].strip()
+                    if metric not in METRIC_COLUMNS:
+                        logger.warning(f"Unknown metric '{metric}' in {BUDGETS_FILE}, ignoring.")
+                        continue
+                    _budgets.setdefault(row["page_url"].strip(), {})[metric] = float(row["max_value"])
+    return _budgets
+
+
+def check_perf_budgets(page_url, metrics):
+    """Returns (violations, unrecorded): budget violations for page_url, and budgeted metrics absent from the sample.
+
+    A metric is absent when the page hadn't reached it when sampled (e.g. load_event_ms without
+    PLATO_PERF_WAIT_FOR_LOAD=1); that is not a violation.
+    """
+    violations, unrecorded = [], []
+    for metric, max_value in load_perf_budgets().get(page_url, {}).items():
+        value = metrics.get(metric)
+        if value is None:
+            unrecorded.append(metric)
+        elif value > max_value:
+            violations.append(f"{metric} = {value:g} exceeds budget {max_value:g}")
+    return violations, unrecorded
+
+
+def verify_perf_budgets(request, page_url):
+    """Asserts the budgets in data/perf_budgets.csv against the metrics already captured for page_url.
+
+    Budgets ride on the navigations the row checks already made; the page is never loaded just for them.
+    """
+    if not load_perf_budgets().get(page_url):
+        pytest.skip(f"No performance budgets defined for {page_url}.")
+    if not PERF_METRICS_ENABLED:
+        pytest.skip("Performance metrics are off (PLATO_PERF_METRICS=0).")
+    metrics = get_latest_metrics(page_url)
+    if metrics is None:
+        pytest.skip(f"No row in this run loaded {page_url} in the browser (e.g. all verified over HTTP), "
+                    f"so no metrics were captured for its budgets.")
+    violations, unrecorded = check_perf_budgets(page_url, metrics)
+    if unrecorded:
+        logger.warning(f"Budgeted metrics not recorded for {page_url}, not checked: {', '.join(unrecorded)}")
+    if violations:
+        logger.error(f"Performance budget exceeded on {page_url}: {'; '.join(violations)}")
+        pytest.fail(f"Performance budget exceeded on {page_url}: {'; '.join(violations)}")
+    logger.info(f"Performance budgets met on {page_url}")
+    return True
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+
+import text_matching
+
+logger = logging.getLogger(__name__)
+
+# Shared with javascript_playwright_automation_v3/utils/result_cache.js. Both suites
+# must agree on the directory layout, fingerprinting and key derivation below.
+CACHE_DIR = os.environ.get("PLATO_CACHE_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".verification_cache"))
+CACHE_ENABLED = os.environ.get("PLATO_RESULT_CACHE", "1") != "0"
+CACHE_TTL_SECONDS = int(os.environ.get("PLATO_RESULT_CACHE_TTL", "3600"))
+# Link statuses and redirect chains are read back only while younger than this. A long-running
+# monitor sets it to 0, so each check probes links again (results are still recorded).
+LINK_CACHE_TTL_SECONDS = CACHE_TTL_SECONDS
+
+# Each suite and tier checks rows under different rules (the JS suite compares text and hrefs
+# exactly, the HTTP tier can't see CSS), so row passes are stored per rule set and are only
+# reused under the same rules. Link statuses don't depend on them and stay shared.
+# Run-wide text match defaults (PLATO_TEXT_MATCH_MODE / PLATO_TEXT_MIN_SIMILARITY) change what a row
+# without its own match_mode accepts, so runs with non-default ones record under their own rule sets.
+_MATCH_DEFAULTS = ("" if text_matching.DEFAULT_MATCH_MODE == "exact"
+                   else f"-{text_matching.DEFAULT_MATCH_MODE}-{text_matching.DEFAULT_MIN_SIMILARITY:g}")
+BROWSER_RULES = "python-browser" + _MATCH_DEFAULTS
+HTTP_RULES = "python-http" + _MATCH_DEFAULTS
+
+_SCRIPT_RE = re.compile(r"<script\b[^>]*>[\s\S]*?</script>", re.IGNORECASE)
+_COMMENT_RE = re.compile(r"<!--[\s\S]*?-->")
+
+_page_fingerprints = {}
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compute_page_fingerprint(document_html):
+    """Hashes a page's document HTML, ignoring scripts, comments and whitespace."""
+    if isinstance(document_html, bytes):
+        document_html = document_html.decode("utf-8", errors="replace")
+    stripped = _COMMENT_RE.sub("", _SCRIPT_RE.sub("", document_html))
+    return _sha256(" ".join(stripped.split()))
+
+
+def remember_page_fingerprint(page_url, document_html):
+    """Fingerprints the document served for page_url and remembers it for this run."""
+    fingerprint = compute_page_fingerprint(document_html)
+    _page_fingerprints[page_url] = fingerprint
+    return fingerprint
+
+
+def get_page_fingerprint(page_url):
+    """Returns the fingerprint recorded for page_url in this run, or None."""
+    return _page_fingerprints.get(page_url)
+
+
+def forget_page_fingerprint(page_url):
+    """Drops page_url's fingerprint, so the next navigation fingerprints the document it is served."""
+    _page_fingerprints.pop(page_url, None)
+
+
+def compute_row_key(element_data):
+    """Derives a stable key for a CSV row from the fields that affect verification."""
+    fields = [
+        element_data.get("element_type"),
+        element_data.get("selector_css") or element_data.get("selector"),
+        element_data.get("text"),
+        element_data.get("href"),
+        element_data.get("match_mode"),
+        element_data.get("min_similarity"),
+    ]
+    values = ["" if value is None else str(value).strip() for value in fields]
+    return _sha256(json.dumps(values, separators=(",", ":"), ensure_ascii=False))
+
+
+def _read_entry(path, ttl_seconds=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("checked_at", 0) > (CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds):
+        return None
+    return entry
+
+
+def _write_entry(path, entry):
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write result cache entry {path}: {e}")
+
+
+def _row_path(fingerprint, row_key, rules):
+    return os.path.join(CACHE_DIR, "results", fingerprint, rules, f"{row_key}.json")
+
+
+def _link_path(url):
+    return os.path.join(CACHE_DIR, "links", f"{_sha256(url)}.json")
+
+
+def is_row_verified(fingerprint, element_data, rules=BROWSER_RULES):
+    """Returns True when this row already passed under the given rules against the same page fingerprint."""
+    if not CACHE_ENABLED or not fingerprint:
+        return False
+    entry = _read_entry(_row_path(fingerprint, compute_row_key(element_data), rules))
+    return bool(entry and entry.get("status") == "passed")
+
+
+def record_row_verified(fingerprint, element_data, rules=BROWSER_RULES):
+    """Records that this row passed under the given rules against the given page fingerprint."""
+    if not CACHE_ENABLED or not fingerprint:
+        return
+    _write_entry(_row_path(fingerprint, compute_row_key(element_data), rules),
+                 {"status": "passed", "checked_at": time.time(), "suite": "python", "rules": rules})
+
+
+def get_link_status(url):
+    """Returns a cached, successful HTTP status for url, or None."""
+    if not CACHE_ENABLED:
+        return None
+    entry = _read_entry(_link_path(url), LINK_CACHE_TTL_SECONDS)
+    return entry.get("status") if entry else None
+
+
+def record_link_status(url, status):
+    """Caches a link status. Only successful statuses are cached so failures are re-probed."""
+    if not CACHE_ENABLED or status is None or status >= 400:
+        return
+    _write_entry(_link_path(url), {"url": url, "status": status, "checked_at": time.time(), "suite": "python"})
+
+
+def _redirect_path(url):
+    # Python-only: the JS suite doesn't read redirect chains.
+    return os.path.join(CACHE_DIR, "redirects", f"{_sha256(url)}.json")
+
+
+def get_redirect_chain(url):
+    """Returns the cached redirect chain ([[url, status], ...]) starting at canonical url, or None."""
+    if not CACHE_ENABLED:
+        return None
+    entry = _read_entry(_redirect_path(url), LINK_CACHE_TTL_SECONDS)
+    return entry.get("hops") if entry else None
+
+
+def record_redirect_chain(url, hops):
+    """Caches the redirect chain starting at canonical url when it ends in a successful status."""
+    if not CACHE_ENABLED or not hops or hops[-1][1] is None or hops[-1][1] >= 400:
+        return
+    _write_entry(_redirect_path(url), {"url": url, "hops": hops, "checked_at": time.time(), "suite": "python"})
+
+
+def _a11y_path(fingerprint, ruleset):
+    # Python-only, like the redirect chains.
+    return os.path.join(CACHE_DIR, "a11y", fingerprint, f"{ruleset}.json")
+
+
+def get_a11y_findings(fingerprint, ruleset):
+    """Returns the accessibility findings cached for this page version and rule set, or None."""
+    if not CACHE_ENABLED or not fingerprint:
+        return None
+    entry = _read_entry(_a11y_path(fingerprint, ruleset))
+    return entry.get("findings") if entry else None
+
+
+def record_a11y_findings(fingerprint, ruleset, findings):
+    """Caches a page version's accessibility findings (an empty list is a valid result)."""
+    if not CACHE_ENABLED or not fingerprint:
+        return
+    _write_entry(_a11y_path(fingerprint, ruleset),
+                 {"findings": findings, "checked_at": time.time(), "suite": "python"})
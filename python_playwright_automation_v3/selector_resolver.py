@@ -0,0 +1,199 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+
+import result_cache
+
+logger = logging.getLogger(__name__)
+
+SELECTOR_CACHE_DIR = os.path.join(result_cache.CACHE_DIR, "selectors")
+# Selectors using Playwright-only syntax can't be resolved with querySelector or an HTML parser.
+BROWSER_ONLY_SELECTOR_MARKERS = (">>", "text=", "xpath=", ":has-text(", ":text(", ":text-is(", ":visible", "internal:")
+# Rows are resolved at most this many per browser call, and at most this many resolved
+# selectors are kept per page, so memory stays flat however many rows a page has.
+RESOLVE_BATCH_SIZE = int(os.environ.get("PLATO_RESOLVE_BATCH_SIZE", "500"))
+
+# Tries every row's candidate chain in one round trip. For each row returns
+# [strategy index, nth match] for the first candidate that finds an element, or null.
+RESOLVE_ROWS_JS = """
+(rows) => {
+    const norm = (s) => (s || "").split(/\\s+/).filter(Boolean).join(" ");
+    const normHref = (s) => (s || "").trim().replace(/\\/+$/, "");
+    return rows.map((candidates) => {
+        for (let i = 0; i < candidates.length; i++) {
+            const [kind, value] = candidates[i];
+            try {
+                if (kind === "id") {
+                    if (document.getElementById(value)) return [i, 0];
+                } else if (kind === "css") {
+                    if (document.querySelector(value)) return [i, 0];
+                } else if (kind === "filtered") {
+                    const matches = document.querySelectorAll(value.css);
+                    for (let nth = 0; nth < matches.length; nth++) {
+                        const el = matches[nth];
+                        if (value.text && norm(el.innerText) !== value.text) continue;
+                        if (value.href && normHref(el.getAttribute("href")) !== value.href) continue;
+                        return [i, nth];
+                    }
+                }
+            } catch (e) {
+                // Invalid selector syntax for querySelector: try the next candidate.
+            }
+        }
+        return null;
+    });
+}
+"""
+
+_resolved = {}
+_pending_rows = {}
+
+
+def _clean(value):
+    value = "" if value is None else str(value).strip()
+    return "" if value.lower() == "nan" else value
+
+
+def is_playwright_only(selector):
+    """Returns True when a selector can only be resolved by Playwright's own engine."""
+    return any(marker in selector for marker in BROWSER_ONLY_SELECTOR_MARKERS)
+
+
+def get_row_selector(element_data):
+    """Returns the row's primary CSS selector (the CSVs use selector_css, older ones selector)."""
+    return _clean(element_data.get("selector_css")) or _clean(element_data.get("selector"))
+
+
+def build_candidates(element_data):
+    """Returns the row's fallback chain as [(strategy, kind, value)]: id, selector_css, tag+classes+text."""
+    candidates = []
+    element_id = _clean(element_data.get("id"))
+    if element_id:
+        candidates.append(("id", "id", element_id))
+    for column in ("selector_css", "selector"):
+        selector = _clean(element_data.get(column))
+        if selector and not is_playwright_only(selector) and all(selector != c[2] for c in candidates):
+            candidates.append((column, "css", selector))
+    tag = _clean(element_data.get("tag_name")) or ("a" if element_data.get("element_type") == "link" else "")
+    classes = "".join(f".{cls}" for cls in _clean(element_data.get("classes")).split())
+    text = " ".join(_clean(element_data.get("text")).split())
+    href = _clean(element_data.get("href")).rstrip("/")
+    if text.lower() == "plato logo":
+        text = ""
+    if (tag or classes) and (text or href):
+        candidates.append(("tag_classes_text", "filtered", {"css": f"{tag}{classes}", "text": text, "href": href}))
+    return candidates
+
+
+def to_playwright_selector(kind, value, nth):
+    """Turns a resolved candidate into a selector page.locator() accepts."""
+    if kind == "id":
+        return f"[id={json.dumps(value)}]"
+    if kind == "css":
+        return value
+    return f"{value['css']} >> nth={nth}"
+
+
+def _cache_path(page_url):
+    return os.path.join(SELECTOR_CACHE_DIR, f"{hashlib.sha256(page_url.encode('utf-8')).hexdigest()}.json")
+
+
+def _load_cached_strategies(page_url):
+    try:
+        with open(_cache_path(page_url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cached_strategies(page_url, strategies):
+    try:
+        os.makedirs(SELECTOR_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=SELECTOR_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(strategies, f)
+        os.replace(tmp_path, _cache_path(page_url))
+    except OSError as e:
+        logger.warning(f"Could not save selector cache for {page_url}: {e}")
+
+
+def resolve_page_selectors(page, page_url, rows):
+    """Resolves every row's working selector on the loaded page in one browser call.
+
+    Returns {row_key: selector or None} and remembers it for the rest of the run.
+    """
+    cached = _load_cached_strategies(page_url)
+    chains, keys = [], []
+    for element_data in rows:
+        row_key = result_cache.compute_row_key(element_data)
+        candidates = build_candidates(element_data)
+        preferred = cached.get(row_key)
+        candidates.sort(key=lambda candidate: candidate[0] != preferred)
+        chains.append(candidates)
+        keys.append(row_key)
+
+    results = page.evaluate(RESOLVE_ROWS_JS, [[[kind, value] for _, kind, value in chain] for chain in chains])
+
+    resolved = _resolved.setdefault(page_url, {})
+    changed = False
+    for element_data, row_key, chain, result in zip(rows, keys, chains, results):
+        if result is None:
+            # Leave Playwright-only selectors to Playwright; anything else is genuinely missing.
+            primary = get_row_selector(element_data)
+            resolved[row_key] = primary if primary and is_playwright_only(primary) else None
+            continue
+        index, nth = result
+        strategy, kind, value = chain[index]
+        resolved[row_key] = to_playwright_selector(kind, value, nth)
+        if index > 0 or cached.get(row_key) != strategy:
+            logger.info(f"Selector for row {row_key[:12]} on {page_url} resolved via {strategy}: {resolved[row_key]}")
+        if cached.get(row_key) != strategy:
+            cached[row_key] = strategy
+            changed = True
+    if changed:
+        _save_cached_strategies(page_url, cached)
+    return {row_key: resolved[row_key] for row_key in keys}
+
+
+def resolve_selector(page, element_data, page_url=None):
+    """Returns the working selector for a row, resolving it (and any primed rows) on first use.
+
+    Returns None when no candidate in the chain matches, so callers can fail straight away
+    instead of waiting out a visibility timeout.
+    """
+    page_url = page_url or page.url
+    row_key = result_cache.compute_row_key(element_data)
+    resolved = _resolved.get(page_url, {})
+    if row_key not in resolved:
+        if len(resolved) >= RESOLVE_BATCH_SIZE:
+            forget_page(page_url, keep_pending=True)
+            resolved = {}
+        pending = _pending_rows.get(page_url)
+        batch = list(itertools.islice(pending, RESOLVE_BATCH_SIZE - 1)) if pending is not None else []
+        rows = [row for row in batch if result_cache.compute_row_key(row) not in resolved] + [element_data]
+        try:
+            resolved = dict(resolved, **resolve_page_selectors(page, page_url, rows))
+        except Exception as e:
+            logger.warning(f"Selector resolution failed on {page_url}: {e}")
+            return get_row_selector(element_data)
+    return resolved.get(row_key)
+
+
+def prime_page_rows(page_url, rows):
+    """Registers a page's rows so resolutions on it cover the following rows in bounded batches.
+
+    rows may be any iterable (a list, CsvRows or a generator); it is consumed lazily,
+    RESOLVE_BATCH_SIZE rows per browser call.
+    """
+    if page_url not in _pending_rows and page_url not in _resolved:
+        _pending_rows[page_url] = iter(rows)
+
+
+def forget_page(page_url, keep_pending=False):
+    """Drops the in-memory selectors resolved for a page (the on-disk strategy cache stays)."""
+    _resolved.pop(page_url, None)
+    if not keep_pending:
+        _pending_rows.pop(page_url, None)
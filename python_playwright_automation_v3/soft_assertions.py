@@ -0,0 +1,95 @@
+import logging
+import time
+from collections import namedtuple
+
+import pytest
+
+import a11y_audit
+import result_cache
+import selector_resolver
+from common import check_element, navigate_to_url, verify_row_over_http
+
+logger = logging.getLogger(__name__)
+
+RowResult = namedtuple("RowResult", ["index", "element_type", "text", "selector", "outcome", "via", "message",
+                                     "elapsed_ms"])
+
+
+class SoftAssertionCollector:
+    """Records every row's outcome on a page and fails once, at the end, with a per-row breakdown."""
+
+    def __init__(self, page_url):
+        self.page_url = page_url
+        self.results = []
+
+    def record(self, index, element_data, outcome, via, message="", elapsed_ms=0.0):
+        self.results.append(RowResult(index, element_data.get("element_type"), str(element_data.get("text", "")),
+                                      selector_resolver.get_row_selector(element_data), outcome, via, message,
+                                      round(elapsed_ms, 1)))
+
+    @property
+    def failures(self):
+        return [result for result in self.results if result.outcome == "failed"]
+
+    def format_report(self):
+        """Returns the per-row breakdown of failed rows as text."""
+        failures = self.failures
+        lines = [f"{len(failures)} of {len(self.results)} rows failed on {self.page_url}:"]
+        for result in failures:
+            message = result.message.strip().splitlines()[0] if result.message.strip() else ""
+            lines.append(f"  [{result.index:>4}] {result.element_type:<7} '{result.text[:40]}' "
+                         f"({result.selector}) via {result.via}: {message}")
+        return "\n".join(lines)
+
+    def as_dicts(self):
+        return [result._asdict() for result in self.results]
+
+    def assert_all(self):
+        """Fails the test once if any recorded row failed."""
+        counts = {outcome: sum(1 for r in self.results if r.outcome == outcome) for outcome in ("passed", "failed", "skipped")}
+        logger.info(f"Soft assertions on {self.page_url}: {counts}")
+        if self.failures:
+            logger.error(self.format_report())
+            pytest.fail(self.format_report(), pytrace=False)
+
+
+def verify_page_soft(request, page_url, rows):
+    """Checks every row of a page against a single page load, failing once with all mismatches.
+
+    With PLATO_HTTP_TIER=1 rows go through the HTTP tier first, as in verify_element. The rest share one navigation.
+    The per-row results are also attached to the test report as the 'soft_assertions' user
+    property, so --junitxml keeps the full breakdown. A summary of the page's accessibility
+    findings, when it was loaded, is attached as 'accessibility', as verify_element does.
+    """
+    collector = SoftAssertionCollector(page_url)
+    escalated = []
+    for index, element_data in enumerate(rows):
+        started = time.monotonic()
+        if verify_row_over_http(page_url, element_data):
+            collector.record(index, element_data, "passed", "http", elapsed_ms=(time.monotonic() - started) * 1000)
+        else:
+            escalated.append((index, element_data))
+
+    if escalated:
+        selector_resolver.prime_page_rows(page_url, [element_data for _, element_data in escalated])
+        page = request.getfixturevalue("page")
+        loaded = navigate_to_url(page, page_url)
+        fingerprint = result_cache.get_page_fingerprint(page_url)
+        for index, element_data in escalated:
+            started = time.monotonic()
+            if not loaded:
+                outcome, message = "failed", f"Failed to navigate to {page_url}."
+            elif result_cache.is_row_verified(fingerprint, element_data):
+                outcome, message = "passed", ""
+            else:
+                outcome, message = check_element(page, element_data)
+                if outcome == "passed":
+                    result_cache.record_row_verified(fingerprint, element_data)
+            collector.record(index, element_data, outcome, "playwright", message, (time.monotonic() - started) * 1000)
+
+    request.node.user_properties.append(("soft_assertions", collector.as_dicts()))
+    findings = a11y_audit.get_findings(page_url) if escalated else None
+    if findings is not None:
+        request.node.user_properties.append(("accessibility", a11y_audit.summarize(findings)))
+    collector.assert_all()
+    return collector
@@ -0,0 +1,197 @@
+"""Pre-seeded storage state and third-party widget blocking, so pages load without overlays.
+
+Set PLATO_STORAGE_STATE=1 to have the first worker of a run accept the consent banners on every
+data page once and save the resulting cookies and localStorage to
+<PLATO_CACHE_DIR>/storage_state.json. Every context (and so every link-probe page opened from
+it) then starts from that state. The state is re-seeded when it is older than
+PLATO_STORAGE_STATE_MAX_AGE seconds (default 86400), or on demand with
+`python storage_state.py --refresh`.
+
+Hosts listed in data/blocked_hosts.txt (chat and survey widgets) are blocked as well. In Chromium
+this happens at DNS level through --host-resolver-rules, which leaves the HTTP cache on; routing
+requests through page.route would turn it off. Firefox and WebKit contexts abort those requests
+with context.route instead.
+"""
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows: seeding isn't serialised between workers
+    fcntl = None
+
+import result_cache
+
+logger = logging.getLogger(__name__)
+
+STATE_ENABLED = os.environ.get("PLATO_STORAGE_STATE", "0") == "1"
+STATE_PATH = os.environ.get("PLATO_STORAGE_STATE_PATH", os.path.join(result_cache.CACHE_DIR, "storage_state.json"))
+STATE_MAX_AGE_SECONDS = int(os.environ.get("PLATO_STORAGE_STATE_MAX_AGE", "86400"))
+BLOCKED_HOSTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "blocked_hosts.txt")
+SEED_TIMEOUT = 30000
+CONSENT_CLICK_TIMEOUT = 3000
+# Accept buttons of the consent managers seen on the site, most specific first.
+# Extend with PLATO_CONSENT_SELECTORS (comma-separated).
+CONSENT_SELECTORS = [
+    "#hs-eu-confirmation-button",
+    "#onetrust-accept-btn-handler",
+    "#CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll",
+    ".cky-btn-accept",
+    "#cookie_action_close_header",
+    ".cmplz-accept",
+    "button:has-text('Accept All')",
+    "button:has-text('Accept')",
+] + [s.strip() for s in os.environ.get("PLATO_CONSENT_SELECTORS", "").split(",") if s.strip()]
+
+_blocked_hosts = None
+
+
+def load_blocked_hosts():
+    """Reads data/blocked_hosts.txt: one host pattern per line (e.g. *.intercom.io), # for comments."""
+    global _blocked_hosts
+    if _blocked_hosts is None:
+        _blocked_hosts = []
+        if os.path.exists(BLOCKED_HOSTS_FILE):
+            with open(BLOCKED_HOSTS_FILE, encoding="utf-8") as f:
+                _blocked_hosts = [line.split("#")[0].strip() for line in f if line.split("#")[0].strip()]
+    return _blocked_hosts
+
+
+def is_blocked_url(url):
+    host = (urlsplit(url).hostname or "").lower()
+    return any(fnmatch.fnmatch(host, pattern) or host == pattern.lstrip("*.") for pattern in load_blocked_hosts())
+
+
+def with_launch_args(browser_name, args=None):
+    """Returns browser launch args with the blocked hosts added (Chromium only; see the module docstring)."""
+    args = dict(args or {})
+    if browser_name != "chromium" or not load_blocked_hosts():
+        return args
+    # Patterns match the host and its subdomains, like is_blocked_url.
+    rules = ", ".join(f"MAP {host} ~NOTFOUND" for pattern in load_blocked_hosts()
+                      for host in dict.fromkeys([pattern, pattern.lstrip("*.")]))
+    args["args"] = list(args.get("args", [])) + [f"--host-resolver-rules={rules}"]
+    return args
+
+
+def with_context_args(args=None):
+    """Returns browser context args that start from the saved storage state, when there is one."""
+    args = dict(args or {})
+    if os.path.exists(STATE_PATH) and "storage_state" not in args:
+        args["storage_state"] = STATE_PATH
+    return args
+
+
+def install_routes(context, browser_name):
+    """Aborts requests to blocked hosts in a Firefox or WebKit context (Chromium blocks them at DNS level)."""
+    if browser_name != "chromium" and load_blocked_hosts():
+        context.route(is_blocked_url, lambda route: route.abort("blockedbyclient"))
+    return context
+
+
+def needs_seeding():
+    try:
+        return time.time() - os.path.getmtime(STATE_PATH) > STATE_MAX_AGE_SECONDS
+    except OSError:
+        return True
+
+
+@contextmanager
+def _state_lock():
+    os.makedirs(os.path.dirname(os.path.abspath(STATE_PATH)), exist_ok=True)
+    with open(STATE_PATH + ".lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def accept_overlays(page):
+    """Clicks the first visible consent accept button, if any. Returns the selector clicked."""
+    for selector in CONSENT_SELECTORS:
+        button = page.locator(selector).first
+        try:
+            if button.is_visible():
+                button.click(timeout=CONSENT_CLICK_TIMEOUT)
+                return selector
+        except Exception as e:
+            logger.info(f"Storage state: could not click {selector} on {page.url}: {e}")
+    return None
+
+
+def seed(browser_type, page_urls, launch_args=None, force=False):
+    """Accepts the overlays on each page once and saves the storage state, unless a fresh one exists."""
+    if not force and not needs_seeding():
+        return STATE_PATH
+    with _state_lock():
+        # Another worker may have seeded while this one waited for the lock.
+        if not force and not needs_seeding():
+            return STATE_PATH
+        started = time.monotonic()
+        browser = browser_type.launch(**with_launch_args(browser_type.name, launch_args))
+        try:
+            context = browser.new_context()
+            install_routes(context, browser_type.name)
+            page = context.new_page()
+            for page_url in page_urls:
+                try:
+                    page.goto(page_url, wait_until="load", timeout=SEED_TIMEOUT)
+                    clicked = accept_overlays(page)
+                    logger.info(f"Storage state: {page_url} consent {'accepted via ' + clicked if clicked else 'not shown'}")
+                except Exception as e:
+                    logger.warning(f"Storage state: could not seed {page_url}: {e}")
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(STATE_PATH)), suffix=".tmp")
+            os.close(fd)
+            context.storage_state(path=tmp_path)
+            os.replace(tmp_path, STATE_PATH)
+        finally:
+            browser.close()
+        logger.info(f"Storage state: saved {STATE_PATH} from {len(page_urls)} pages in {time.monotonic() - started:.1f}s")
+    return STATE_PATH
+
+
+def prepare(browser_type, page_urls=None, launch_args=None):
+    """Seeds the storage state if it is missing or stale."""
+    from browser_profile import default_page_urls
+
+    return seed(browser_type, default_page_urls() if page_urls is None else page_urls, launch_args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed or inspect the saved consent storage state.")
+    parser.add_argument("--refresh", action="store_true", help="Re-seed now even if the saved state is fresh.")
+    parser.add_argument("--browser", default="chromium", choices=["chromium", "firefox", "webkit"])
+    parser.add_argument("--show", action="store_true", help="Print the saved cookies and localStorage origins.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.show:
+        with open(STATE_PATH, encoding="utf-8") as f:
+            state = json.load(f)
+        for cookie in state.get("cookies", []):
+            print(f"cookie {cookie['domain']} {cookie['name']}")
+        for origin in state.get("origins", []):
+            print(f"localStorage {origin['origin']}: {', '.join(item['name'] for item in origin['localStorage'])}")
+        return 0
+
+    from browser_profile import default_page_urls
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as playwright:
+        seed(getattr(playwright, args.browser), default_page_urls(), force=args.refresh)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
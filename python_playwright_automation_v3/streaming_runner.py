@@ -0,0 +1,176 @@
+"""Memory-bounded runner for very large data CSVs.
+
+Rows are read lazily, grouped by page_url through on-disk spool files and verified in
+fixed-size batches against one loaded page per page_url. Results are streamed to a
+JSON Lines report, so peak memory depends on --batch-size, not on how many rows a page has.
+
+Usage:
+    python streaming_runner.py [--batch-size 200] [--pages careers,training] [--include-archived]
+                               [--report results.jsonl]
+"""
+import argparse
+import glob
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter, OrderedDict
+
+import a11y_audit
+import browser_profile
+import result_cache
+import selector_resolver
+from common import check_element, configure_logging, iter_csv_rows, navigate_to_url
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_BATCH_SIZE = 200
+# Spool files kept open at once while grouping; older ones are closed and reopened for append.
+MAX_OPEN_SPOOLS = 64
+
+
+def batched(iterable, size):
+    """Yields lists of at most size items from iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def spool_rows_by_page(rows, spool_dir):
+    """Writes (index, row) pairs into one JSON Lines spool file per page_url.
+
+    Returns {page_url: spool_path} in first-seen order. Only file handles are held in memory,
+    so grouping works the same whether the rows are sorted by page_url or not.
+    """
+    paths = OrderedDict()
+    handles = OrderedDict()
+    try:
+        for index, row in rows:
+            page_url = (row.get("page_url") or "").strip()
+            handle = handles.pop(page_url, None)
+            if handle is None:
+                if page_url not in paths:
+                    paths[page_url] = os.path.join(spool_dir, f"{len(paths)}.jsonl")
+                handle = open(paths[page_url], "a", encoding="utf-8")
+                if len(handles) >= MAX_OPEN_SPOOLS:
+                    handles.popitem(last=False)[1].close()
+            handles[page_url] = handle
+            handle.write(json.dumps([index, row]) + "\n")
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return paths
+
+
+def iter_spooled_rows(spool_path):
+    """Yields the (index, row) pairs written by spool_rows_by_page."""
+    with open(spool_path, encoding="utf-8") as f:
+        for line in f:
+            index, row = json.loads(line)
+            yield index, row
+
+
+def verify_page_rows(context, page_url, indexed_rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Verifies a page's rows in batches against a single navigation of page_url.
+
+    Yields one result dict per row as soon as it is known.
+    """
+    page = context.new_page()
+    try:
+        loaded = bool(page_url) and navigate_to_url(page, page_url)
+        fingerprint = result_cache.get_page_fingerprint(page_url) if loaded else None
+        for batch in batched(indexed_rows, batch_size):
+            if loaded:
+                # Resolve this batch's selectors in one browser call and drop the previous batch's.
+                selector_resolver.forget_page(page.url)
+                selector_resolver.prime_page_rows(page.url, [row for _, row in batch])
+            for index, element_data in batch:
+                started = time.monotonic()
+                if not loaded:
+                    outcome, message = "failed", f"could not load page_url '{page_url}'"
+                elif result_cache.is_row_verified(fingerprint, element_data):
+                    outcome, message = "passed", "cached"
+                else:
+                    outcome, message = check_element(page, element_data)
+                    if outcome == "passed":
+                        result_cache.record_row_verified(fingerprint, element_data)
+                yield {"page_url": page_url, "index": index, "element_type": element_data.get("element_type"),
+                       "text": element_data.get("text", ""), "outcome": outcome, "message": message,
+                       "elapsed_ms": round((time.monotonic() - started) * 1000, 1)}
+        if loaded:
+            selector_resolver.forget_page(page.url)
+    finally:
+        page.close()
+
+
+def find_data_files(page_names=None, include_archived=False, data_dir=DATA_DIR):
+    """Returns [(page_name, csv_path)] for the data CSVs to stream."""
+    files = []
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, "*_data.csv"))):
+        if csv_path.endswith("_archived_data.csv") and not include_archived:
+            continue
+        page_name = re.match(r"(.+)_data\.csv", os.path.basename(csv_path)).group(1)
+        if page_names and page_name not in page_names and page_name.replace("_archived", "") not in page_names:
+            continue
+        files.append((page_name, csv_path))
+    return files
+
+
+def run_stream(data_files, report_path, batch_size=DEFAULT_BATCH_SIZE, headless=True):
+    """Streams every row of data_files through verification. Returns a Counter of outcomes."""
+    from playwright.sync_api import sync_playwright
+
+    totals = Counter()
+    with open(report_path, "w", encoding="utf-8") as report, sync_playwright() as playwright:
+        with browser_profile.open_context(playwright.chromium, launch_args={"headless": headless}) as context:
+            for page_name, csv_path in data_files:
+                with tempfile.TemporaryDirectory(prefix="plato_spool_") as spool_dir:
+                    spools = spool_rows_by_page(enumerate(iter_csv_rows(csv_path)), spool_dir)
+                    for page_url, spool_path in spools.items():
+                        page_totals = Counter()
+                        for result in verify_page_rows(context, page_url, iter_spooled_rows(spool_path), batch_size):
+                            result["page"] = page_name
+                            report.write(json.dumps(result) + "\n")
+                            page_totals[result["outcome"]] += 1
+                            if result["outcome"] == "failed":
+                                print(f"FAIL {page_name}[{result['index']}]: {result['message'].splitlines()[0]}",
+                                      flush=True)
+                        findings = a11y_audit.get_findings(page_url)
+                        if findings is not None:
+                            report.write(json.dumps({"page": page_name, "page_url": page_url,
+                                                     "accessibility": findings}) + "\n")
+                        logger.info(f"Streaming: {page_name} {page_url or '(no page_url)'} {dict(page_totals)}")
+                        totals.update(page_totals)
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify very large data CSVs with bounded memory.")
+    parser.add_argument("--pages", default="", help="Comma-separated page names (e.g. careers,training). Default: all.")
+    parser.add_argument("--include-archived", action="store_true", help="Also stream the *_archived_data.csv files.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows resolved and verified per batch; bounds peak memory.")
+    parser.add_argument("--report", default="streaming_results.jsonl", help="JSON Lines report, one result per row.")
+    parser.add_argument("--headed", action="store_true")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    data_files = find_data_files([p for p in args.pages.split(",") if p] or None, args.include_archived)
+    started = time.monotonic()
+    totals = run_stream(data_files, args.report, batch_size=args.batch_size, headless=not args.headed)
+    print(f"{sum(totals.values())} rows in {time.monotonic() - started:.1f}s: "
+          + ", ".join(f"{outcome} {count}" for outcome, count in sorted(totals.items())))
+    print(f"Per-row results written to {args.report}")
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
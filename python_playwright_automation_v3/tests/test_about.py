@@ -1,6 +1,7 @@
 import pytest
-from playwright.sync_api import Page
-from common import load_csv_data, navigate_to_url, verify_link_element, verify_content_element
+from common import load_csv_rows, verify_element
+from perf_metrics import verify_perf_budgets
+from soft_assertions import verify_page_soft
 import os
 
 PAGE_URL = "https://platotech.com/about/"
@@ -8,32 +9,35 @@ DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "about_data.cs
 
 @pytest.fixture(scope="module")
 def page_elements_data():
-    data = load_csv_data(DATA_FILE)
+    # Rows are parsed on access; only their offsets stay in memory
+    data = load_csv_rows(DATA_FILE)
     if not data:
         pytest.skip(f"Skipping all tests in this file as no data could be loaded from {DATA_FILE}.")
     return data
 
-def test_link_plato_logo_0(page: Page, page_elements_data):
+def test_link_plato_logo_0(request, browser_name, page_elements_data):
     # Ensure data for this specific test exists in the loaded data for the page
     if len(page_elements_data) <= 0:
         pytest.skip(f"Skipping test_link_plato_logo_0 as data for index 0 is not available in the loaded data from {DATA_FILE}.")
     current_element_data = page_elements_data[0]
     
-    # Navigate to the page for each test to ensure a clean state
-    if not navigate_to_url(page, PAGE_URL):
-        pytest.fail(f"Failed to navigate to {PAGE_URL} for test_link_plato_logo_0.")
-    
-    verify_link_element(page, current_element_data)
+    # browser_name keeps the --browser parametrization; the page fixture is only created when a row needs the browser
+    verify_element(request, PAGE_URL, current_element_data, page_elements_data)
 
-def test_link_nan_1(page: Page, page_elements_data):
+def test_link_nan_1(request, browser_name, page_elements_data):
     # Ensure data for this specific test exists in the loaded data for the page
     if len(page_elements_data) <= 1:
         pytest.skip(f"Skipping test_link_nan_1 as data for index 1 is not available in the loaded data from {DATA_FILE}.")
     current_element_data = page_elements_data[1]
     
-    # Navigate to the page for each test to ensure a clean state
-    if not navigate_to_url(page, PAGE_URL):
-        pytest.fail(f"Failed to navigate to {PAGE_URL} for test_link_nan_1.")
-    
-    verify_link_element(page, current_element_data)
+    # browser_name keeps the --browser parametrization; the page fixture is only created when a row needs the browser
+    verify_element(request, PAGE_URL, current_element_data, page_elements_data)
+
+@pytest.mark.soft_batch
+def test_all_rows_soft_assertions(request, browser_name, page_elements_data):
+    # Runs instead of the per-row tests with --soft-assertions: one page load, one failure listing every mismatched row
+    verify_page_soft(request, PAGE_URL, page_elements_data)
 
+def test_performance_budget(request, browser_name):
+    # Uses the metrics captured during this module's navigations; budgets live in data/perf_budgets.csv
+    verify_perf_budgets(request, PAGE_URL)
@@ -0,0 +1,105 @@
+import asyncio
+import functools
+import socket
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import crawler
+import result_cache
+
+# A small site: two good pages, an internal 404, a robots.txt-disallowed page and an
+# outbound link to a port nothing listens on.
+FIXTURE_PAGES = {
+    "robots.txt": "User-agent: *\nDisallow: /private/\n",
+    "index.html": """<html><body>
+        <a href="/about.html">About</a>
+        <a href="/missing.html">Missing</a>
+        <a href="/private/secret.html">Private</a>
+        <a href="mailto:info@example.com">Mail</a>
+        <a href="#top">Top</a>
+        <a href="{outbound}">Outbound</a>
+    </body></html>""",
+    "about.html": """<html><body>
+        <a href="/">Home</a>
+        <a href="/missing.html">Missing again</a>
+        <a href="/team.html">Team</a>
+    </body></html>""",
+    "team.html": "<html><body><a href='/about.html'>About</a></body></html>",
+    "private/secret.html": "<html><body>secret</body></html>",
+}
+
+
+class RecordingHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def fixture_site(tmp_path, monkeypatch):
+    """Serves FIXTURE_PAGES on 127.0.0.1 and points the result cache at a temp dir. Yields the server."""
+    monkeypatch.setattr(result_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    site = tmp_path / "site"
+    outbound = f"http://127.0.0.1:{unused_port()}/gone"
+    for name, content in FIXTURE_PAGES.items():
+        (site / name).parent.mkdir(parents=True, exist_ok=True)
+        (site / name).write_text(content.replace("{outbound}", outbound))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(RecordingHandler, directory=str(site)))
+    server.paths = []
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    server.outbound = outbound
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def crawl(*seeds, **kwargs):
+    kwargs.setdefault("requests_per_second", 0)
+    return asyncio.run(crawler.LinkCrawler(list(seeds), **kwargs).run())
+
+
+def test_reports_broken_internal_and_outbound_links(fixture_site):
+    report = crawl(fixture_site.base_url + "/index.html", concurrency=8)
+
+    broken = {item["url"]: item for item in report["broken_links"]}
+    missing = fixture_site.base_url + "/missing.html"
+    assert set(broken) == {missing, fixture_site.outbound}
+    assert broken[missing]["status"] == 404
+    assert broken[missing]["internal"] is True
+    assert {fixture_site.base_url + "/about.html", fixture_site.base_url + "/index.html"} <= set(broken[missing]["found_on"])
+    assert broken[fixture_site.outbound]["internal"] is False
+    assert broken[fixture_site.outbound]["status"] is None
+    # index, about, team and / (the same index page under another URL)
+    assert report["pages_crawled"] == 4
+    assert report["max_pages_reached"] is False
+
+
+def test_honours_robots_txt_and_fetches_it_once(fixture_site):
+    # Several seeds on one origin, so workers reach it at the same time.
+    report = crawl(*(fixture_site.base_url + path for path in ("/index.html", "/about.html", "/team.html")),
+                   concurrency=8)
+
+    assert "/private/secret.html" not in fixture_site.paths
+    assert all("/private/" not in item["url"] for item in report["broken_links"])
+    assert fixture_site.paths.count("/robots.txt") == 1
+
+
+def test_reports_pages_left_uncrawled_at_max_pages(fixture_site):
+    report = crawl(fixture_site.base_url + "/index.html", concurrency=1, max_pages=2, check_external=False)
+
+    assert report["max_pages_reached"] is True
+    assert report["pages_not_crawled"] == len(report["pages_not_crawled_sample"]) > 0
+    assert fixture_site.base_url + "/team.html" not in fixture_site.paths
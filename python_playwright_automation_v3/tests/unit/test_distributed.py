@@ -0,0 +1,127 @@
+import csv
+import json
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import distributed
+
+# A worker process with the browser stubbed out: navigation always succeeds and check_element
+# fails rows whose text contains "broken". Each row takes a little time, so idle workers steal.
+STUB_WORKER = textwrap.dedent("""
+    import contextlib, logging, sys, time
+    import distributed
+
+    class StubPage:
+        def close(self):
+            pass
+
+    class StubContext:
+        def new_page(self):
+            return StubPage()
+
+    def check_element(page, element_data):
+        time.sleep(0.02)
+        if "broken" in element_data["text"]:
+            return "failed", f"text mismatch for {element_data['text']}"
+        return "passed", ""
+
+    distributed.navigate_to_url = lambda page, url: True
+    distributed.check_element = check_element
+    distributed.IDLE_POLL_INTERVAL = 0.05
+    # As in `distributed.py worker`: records only go to the queue.
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+    distributed.process_units(sys.argv[1], sys.argv[2], lambda: contextlib.nullcontext(StubContext()))
+""")
+
+
+def write_data_csv(path, page_url, texts):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["page_url", "element_type", "text", "selector_css"])
+        for text in texts:
+            writer.writerow([page_url, "content", text, "p"])
+    return str(path)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    work_queue = distributed.WorkQueue(str(tmp_path / "queue.sqlite"))
+    yield work_queue
+    work_queue.close()
+
+
+def test_claim_hands_each_pending_unit_to_one_worker(queue):
+    queue.add_units([("about", "a.csv", "https://example.com/a", 0, 5),
+                     ("careers", "c.csv", "https://example.com/c", 0, 3)])
+
+    first, second = queue.claim("w1"), queue.claim("w2")
+
+    assert {first["id"], second["id"]} == {1, 2}
+    assert first["row_end"] - first["row_start"] == 5  # largest unit first
+    assert (first["worker"], second["worker"]) == ("w1", "w2")
+    assert queue.claim("w3") is None  # nothing pending and both units too small to split
+    assert queue.progress()["claimed"] == 2
+
+
+def test_idle_worker_steals_the_unstarted_half_of_a_running_unit(queue):
+    queue.add_units([("training", "t.csv", "https://example.com/t", 0, 40)])
+    victim = queue.claim("w1")
+    assert queue.advance(victim["id"], "w1", 10) == 40
+
+    stolen = queue.claim("w2")
+
+    # Row 10 may be in progress; the 29 rows after it are split 14 / 15.
+    assert (stolen["row_start"], stolen["row_end"], stolen["worker"]) == (25, 40, "w2")
+    assert queue.advance(victim["id"], "w1", 11) == 25
+    assert queue.get_unit(victim["id"])["row_end"] == 25
+
+
+def test_unit_with_an_expired_lease_is_reclaimed(queue, monkeypatch):
+    queue.add_units([("about", "a.csv", "https://example.com/a", 0, 3)])
+    stalled = queue.claim("w1")
+    queue.advance(stalled["id"], "w1", 1)
+    assert queue.claim("w2") is None  # lease still valid, unit too small to steal from
+
+    monkeypatch.setattr(distributed, "LEASE_TIMEOUT", -1.0)
+    reclaimed = queue.claim("w2")
+
+    assert (reclaimed["id"], reclaimed["worker"], reclaimed["next_row"]) == (stalled["id"], "w2", 1)
+    # The stalled worker is told to stop: advance no longer extends its range.
+    assert queue.advance(stalled["id"], "w1", 2) == 2
+    queue.complete(stalled["id"], "w1")
+    assert queue.get_unit(stalled["id"])["status"] == "claimed"
+
+
+def test_local_worker_processes_share_the_queue_and_merge_one_report(tmp_path):
+    pages = {
+        "careers": write_data_csv(tmp_path / "careers_data.csv", "https://example.com/careers/",
+                                  [f"row {i}" + (" broken" if i in (7, 30) else "") for i in range(60)]),
+        "about": write_data_csv(tmp_path / "about_data.csv", "https://example.com/about/",
+                                [f"about {i}" for i in range(6)]),
+    }
+    queue_path = str(tmp_path / "run.sqlite")
+    work_queue = distributed.WorkQueue(queue_path)
+    work_queue.add_units([unit for name, path in pages.items() for unit in distributed.split_into_units(name, path)])
+
+    workers = [subprocess.Popen([sys.executable, "-c", STUB_WORKER, queue_path, f"w{i}"], cwd=distributed.PROJECT_DIR)
+               for i in range(3)]
+    for worker in workers:
+        assert worker.wait(timeout=60) == 0
+
+    assert work_queue.is_finished()
+    report_path, log_path = tmp_path / "report.json", tmp_path / "run.log"
+    failures = distributed.write_report(work_queue, str(report_path), str(log_path))
+    work_queue.close()
+
+    with open(report_path, encoding="utf-8") as f:
+        report = json.load(f)
+    rows = {(result["page_name"], result["row_index"]) for result in report["results"]}
+    assert rows == {("careers", i) for i in range(60)} | {("about", i) for i in range(6)}
+    assert report["summary"] == {"passed": 64, "failed": 2}
+    assert sorted(failure["row_index"] for failure in failures) == [7, 30]
+    assert len(report["workers"]) >= 2  # the big page was shared through stealing
+    merged_log = log_path.read_text(encoding="utf-8")
+    assert all(f"w{i}: finished after verifying" in merged_log for i in range(3))
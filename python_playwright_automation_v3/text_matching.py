@@ -0,0 +1,142 @@
+import logging
+import os
+import re
+import unicodedata
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+try:
+    from rapidfuzz import fuzz as _rapidfuzz
+except ImportError:  # fall back to difflib, which is slower and scores slightly differently
+    _rapidfuzz = None
+
+logger = logging.getLogger(__name__)
+
+MATCH_MODES = ("exact", "normalized", "similarity")
+# Per-row overrides come from the optional match_mode / min_similarity CSV columns.
+DEFAULT_MATCH_MODE = os.environ.get("PLATO_TEXT_MATCH_MODE", "exact")
+DEFAULT_MIN_SIMILARITY = float(os.environ.get("PLATO_TEXT_MIN_SIMILARITY", "0.9"))
+INDEX_MIN_SCORE = 0.6
+
+MatchResult = namedtuple("MatchResult", ["matched", "score", "mode"])
+IndexHit = namedtuple("IndexHit", ["selector", "text", "score"])
+
+# Collects every element that directly owns visible text, with a CSS path to it,
+# so a missing selector can be searched for in one round trip.
+BUILD_TEXT_INDEX_JS = """
+() => {
+    const cssPath = (el) => {
+        if (el.id) return "#" + CSS.escape(el.id);
+        const parts = [];
+        while (el && el.nodeType === 1 && el !== document.body) {
+            if (el.id) { parts.unshift("#" + CSS.escape(el.id)); break; }
+            let part = el.tagName.toLowerCase();
+            const parent = el.parentElement;
+            if (parent) {
+                const siblings = Array.from(parent.children).filter(s => s.tagName === el.tagName);
+                if (siblings.length > 1) part += ":nth-of-type(" + (siblings.indexOf(el) + 1) + ")";
+            }
+            parts.unshift(part);
+            el = parent;
+        }
+        if (el === document.body) parts.unshift("body");
+        return parts.join(" > ");
+    };
+    const entries = [];
+    for (const el of document.body.querySelectorAll("*")) {
+        if (["SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE"].includes(el.tagName)) continue;
+        const ownsText = Array.from(el.childNodes).some(n => n.nodeType === 3 && n.textContent.trim());
+        if (!ownsText || !el.checkVisibility || !el.checkVisibility()) continue;
+        const text = el.innerText;
+        if (text && text.trim()) entries.push([cssPath(el), text]);
+    }
+    return entries;
+}
+"""
+
+_PUNCTUATION_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def collapse_whitespace(text):
+    """Collapses runs of whitespace; the comparison used by exact mode."""
+    return " ".join(str(text).split()).strip()
+
+
+def normalize_for_match(text):
+    """Normalises unicode (compatibility forms, accents), case and punctuation for normalized/similarity modes."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return " ".join(_PUNCTUATION_RE.sub(" ", text).split())
+
+
+def similarity(expected, actual):
+    """Scores two already-normalised strings from 0.0 to 1.0 (best of edit ratio and token-sort ratio).
+
+    Both ratios count every character of both strings, so added words lower the score:
+    "we are hiring" vs "we are not hiring" is about 0.87, not a match at the default 0.9.
+    """
+    if expected == actual:
+        return 1.0
+    if not expected or not actual:
+        return 0.0
+    if _rapidfuzz is not None:
+        return max(_rapidfuzz.ratio(expected, actual), _rapidfuzz.token_sort_ratio(expected, actual)) / 100.0
+    ratio = SequenceMatcher(None, expected, actual, autojunk=False).ratio()
+    sorted_expected, sorted_actual = " ".join(sorted(expected.split())), " ".join(sorted(actual.split()))
+    token_sort_ratio = SequenceMatcher(None, sorted_expected, sorted_actual, autojunk=False).ratio()
+    return max(ratio, token_sort_ratio)
+
+
+def match_settings(element_data):
+    """Returns (mode, min_similarity) for a CSV row, falling back to the run defaults.
+
+    Raises ValueError when the row's min_similarity isn't a number.
+    """
+    mode = str(element_data.get("match_mode") or DEFAULT_MATCH_MODE).strip().lower()
+    if mode not in MATCH_MODES:
+        logger.warning(f"Unknown match_mode '{mode}', falling back to 'exact'.")
+        mode = "exact"
+    min_similarity = element_data.get("min_similarity")
+    min_similarity = float(min_similarity) if min_similarity not in (None, "") else DEFAULT_MIN_SIMILARITY
+    return mode, min_similarity
+
+
+def match_text(expected, actual, mode="exact", min_similarity=DEFAULT_MIN_SIMILARITY):
+    """Compares expected and actual text under the given mode and returns a MatchResult.
+
+    The score is always the similarity of the normalised strings, so even an exact-mode
+    failure reports how large the change was.
+    """
+    if mode == "exact" and collapse_whitespace(expected) == collapse_whitespace(actual):
+        return MatchResult(True, 1.0, mode)
+    normalized_expected, normalized_actual = normalize_for_match(expected), normalize_for_match(actual)
+    score = similarity(normalized_expected, normalized_actual)
+    if mode == "normalized":
+        return MatchResult(normalized_expected == normalized_actual, score, mode)
+    if mode == "similarity":
+        return MatchResult(score >= min_similarity, score, mode)
+    return MatchResult(False, score, mode)
+
+
+def build_page_text_index(page):
+    """Returns [(selector, text)] for every visible element on the page that owns text."""
+    return [(selector, collapse_whitespace(text)) for selector, text in page.evaluate(BUILD_TEXT_INDEX_JS)]
+
+
+def find_text_in_index(index, expected, min_score=INDEX_MIN_SCORE):
+    """Finds where expected text lives in a page text index, in a single pass. Returns an IndexHit or None."""
+    target = normalize_for_match(expected)
+    if not target:
+        return None
+    best = None
+    for selector, text in index:
+        candidate = normalize_for_match(text)
+        if candidate == target:
+            return IndexHit(selector, text, 1.0)
+        # Candidates far longer or shorter than the target are containers or fragments, not the moved text.
+        if not candidate or min(len(candidate), len(target)) * 2 < min_score * (len(candidate) + len(target)):
+            continue
+        score = similarity(target, candidate)
+        if score >= min_score and (best is None or score > best.score):
+            best = IndexHit(selector, text, score)
+    return best
@@ -0,0 +1,196 @@
+"""Opt-in timing of the Playwright calls made by common.py.
+
+Set PLATO_TRACE=1 to time every wrapped call with a monotonic clock. At exit the run writes
+traces/trace_<pid>.json (Chrome trace-event format, opens in https://ui.perfetto.dev) and
+traces/histograms_<pid>.txt (per-call latency histograms). Set PLATO_TRACE_SLOWEST=N as well
+to record a Playwright trace for every row and keep only the N slowest under traces/playwright/.
+"""
+import atexit
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import weakref
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENABLED = os.environ.get("PLATO_TRACE", "0") == "1"
+TRACE_SLOWEST = int(os.environ.get("PLATO_TRACE_SLOWEST", "0")) if TRACE_ENABLED else 0
+TRACE_DIR = os.environ.get("PLATO_TRACE_DIR", "traces")
+PLAYWRIGHT_TRACE_DIR = os.path.join(TRACE_DIR, "playwright")
+# Events beyond this are still counted in the histograms but not written to the trace file.
+MAX_TRACE_EVENTS = 500_000
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended.
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+_origin_ns = time.perf_counter_ns()
+_lock = threading.Lock()
+_events = []
+_dropped_events = 0
+_histograms = {}
+_slowest_rows = []  # min-heap of (duration_ms, sequence, trace_path)
+_row_sequence = itertools.count()
+_traced_contexts = weakref.WeakSet()
+_untraceable_contexts = weakref.WeakSet()
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, duration_ms):
+        index = next((i for i, bound in enumerate(BUCKET_BOUNDS_MS) if duration_ms < bound), len(BUCKET_BOUNDS_MS))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def percentile(self, fraction):
+        """Returns the upper bound (ms) of the bucket holding the given fraction of calls."""
+        target, seen = fraction * self.count, 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return min(BUCKET_BOUNDS_MS[index], self.max_ms) if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+
+def _record(name, category, started_ns, ended_ns, args, histogram_name=None):
+    global _dropped_events
+    duration_ms = (ended_ns - started_ns) / 1e6
+    with _lock:
+        _histograms.setdefault(histogram_name or name, _Histogram()).add(duration_ms)
+        if len(_events) < MAX_TRACE_EVENTS:
+            _events.append({"name": name, "cat": category, "ph": "X", "pid": os.getpid(),
+                            "tid": threading.get_ident(), "ts": (started_ns - _origin_ns) / 1000,
+                            "dur": (ended_ns - started_ns) / 1000, "args": args})
+        else:
+            _dropped_events += 1
+    return duration_ms
+
+
+@contextmanager
+def _span(name, category, args):
+    started_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _record(name, category, started_ns, time.perf_counter_ns(), args)
+
+
+def span(name, **args):
+    """Times the enclosed Playwright call under name. A no-op unless PLATO_TRACE=1."""
+    if not TRACE_ENABLED:
+        return nullcontext()
+    return _span(name, "playwright", args)
+
+
+def _start_row_trace(context):
+    if context in _untraceable_contexts:
+        return False
+    try:
+        if context not in _traced_contexts:
+            context.tracing.start(screenshots=True, snapshots=True)
+            _traced_contexts.add(context)
+        else:
+            context.tracing.start_chunk()
+        return True
+    except Exception as e:
+        # e.g. pytest-playwright's --tracing already owns this context's tracing
+        logger.warning(f"Playwright tracing unavailable for this context: {e}")
+        _untraceable_contexts.add(context)
+        return False
+
+
+def _stop_row_trace(context, label, duration_ms):
+    sequence = next(_row_sequence)
+    with _lock:
+        keep = len(_slowest_rows) < TRACE_SLOWEST or duration_ms > _slowest_rows[0][0]
+    if not keep:
+        context.tracing.stop_chunk()
+        return
+    os.makedirs(PLAYWRIGHT_TRACE_DIR, exist_ok=True)
+    trace_path = os.path.join(PLAYWRIGHT_TRACE_DIR, f"{sequence:05d}_{re.sub(r'[^A-Za-z0-9_.-]+', '_', label)[:80]}.zip")
+    context.tracing.stop_chunk(path=trace_path)
+    with _lock:
+        if len(_slowest_rows) < TRACE_SLOWEST:
+            heapq.heappush(_slowest_rows, (duration_ms, sequence, trace_path))
+            return
+        evicted = heapq.heappushpop(_slowest_rows, (duration_ms, sequence, trace_path))
+    try:
+        os.remove(evicted[2])
+    except OSError:
+        pass
+
+
+@contextmanager
+def _row(label, context):
+    chunked = bool(TRACE_SLOWEST) and context is not None and _start_row_trace(context)
+    started_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        duration_ms = _record(label, "row", started_ns, time.perf_counter_ns(), {}, histogram_name="row (whole check)")
+        if chunked:
+            try:
+                _stop_row_trace(context, label, duration_ms)
+            except Exception as e:
+                logger.warning(f"Could not save Playwright trace for {label}: {e}")
+
+
+def row(label, context=None):
+    """Times one CSV row; with PLATO_TRACE_SLOWEST, also records a Playwright trace chunk for it."""
+    if not TRACE_ENABLED:
+        return nullcontext()
+    return _row(label, context)
+
+
+def format_histograms():
+    """Returns the per-call latency histograms as printable lines, slowest total first."""
+    with _lock:
+        histograms = sorted(_histograms.items(), key=lambda item: item[1].total_ms, reverse=True)
+    labels = [f"<{bound}" for bound in BUCKET_BOUNDS_MS] + [f">={BUCKET_BOUNDS_MS[-1]}"]
+    lines = [f"{'call':<44}{'count':>7}{'total ms':>11}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}  buckets (ms)"]
+    for name, histogram in histograms:
+        buckets = " ".join(f"{label}:{count}" for label, count in zip(labels, histogram.buckets) if count)
+        lines.append(f"{name[:43]:<44}{histogram.count:>7}{histogram.total_ms:>11.0f}{histogram.percentile(0.5):>9.0f}"
+                     f"{histogram.percentile(0.95):>9.0f}{histogram.max_ms:>9.0f}  {buckets}")
+    return lines
+
+
+def slowest_row_traces():
+    """Returns [(duration_ms, trace_path)] for the kept Playwright traces, slowest first."""
+    with _lock:
+        return [(duration_ms, path) for duration_ms, _, path in sorted(_slowest_rows, reverse=True)]
+
+
+def write_reports():
+    """Writes the Chrome trace-event JSON and the histogram table for this process."""
+    if not _histograms:
+        return None
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    trace_path = os.path.join(TRACE_DIR, f"trace_{os.getpid()}.json")
+    with _lock:
+        events = list(_events)
+        dropped = _dropped_events
+    metadata = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": f"plato pid {os.getpid()}"}}]
+    with open(trace_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms",
+                   "otherData": {"dropped_events": dropped}}, f)
+    with open(os.path.join(TRACE_DIR, f"histograms_{os.getpid()}.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(format_histograms()) + "\n")
+        for duration_ms, path in slowest_row_traces():
+            f.write(f"slow row trace: {duration_ms:.0f} ms {path}\n")
+    return trace_path
+
+
+if TRACE_ENABLED:
+    atexit.register(write_reports)
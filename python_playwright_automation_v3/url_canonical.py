@@ -0,0 +1,141 @@
+import logging
+import threading
+from collections import namedtuple
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urljoin, urlsplit, urlunsplit
+
+import result_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+REDIRECT_TIMEOUT = 20
+
+# hops is ((url, status), ...) from the requested URL to the final one; status is the final hop's.
+RedirectChain = namedtuple("RedirectChain", ["hops", "final_url", "status"])
+
+_chains = {}
+_lock = threading.Lock()
+
+
+def canonicalize_url(url, base_url=None):
+    """Returns the canonical form of url used for comparisons and cache keys.
+
+    Relative URLs are resolved against base_url. Scheme and host are lower-cased and default
+    ports, fragments and trailing slashes are dropped. Query parameters are sorted, and
+    percent-escapes are normalised so equivalent spellings compare equal.
+    """
+    url = str(url).strip()
+    if base_url:
+        url = urljoin(base_url, url)
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return url
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    path = quote(unquote(parts.path), safe="/:@!$&'()*+,;=~").rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def _remember(hops):
+    """Stores the chain under every hop, so a later href pointing at any hop is a lookup."""
+    chains = [RedirectChain(tuple(hops[position:]), hops[-1][0], hops[-1][1]) for position in range(len(hops))]
+    with _lock:
+        for (url, _), chain in zip(hops, chains):
+            _chains[canonicalize_url(url)] = chain
+    return chains[0]
+
+
+def record_chain(hops):
+    """Records a redirect chain [(url, status), ...] observed by any probe and returns it."""
+    hops = [(str(url), status) for url, status in hops]
+    if not hops:
+        return None
+    chain = _remember(hops)
+    result_cache.record_redirect_chain(canonicalize_url(hops[0][0]), [list(hop) for hop in hops])
+    return chain
+
+
+def get_cached_chain(url):
+    """Returns the RedirectChain already known for url (this run or the shared cache), or None."""
+    canonical = canonicalize_url(url)
+    with _lock:
+        chain = _chains.get(canonical)
+    if chain is not None:
+        return chain
+    hops = result_cache.get_redirect_chain(canonical)
+    return _remember([tuple(hop) for hop in hops]) if hops else None
+
+
+def forget_chains(urls=None):
+    """Drops chains held in memory, so the next lookup goes back to the shared cache or the network.
+
+    With urls, only the chains that start at or pass through one of them are dropped, leaving
+    other threads' lookups of unrelated links alone; without, every chain is.
+    """
+    with _lock:
+        if urls is None:
+            _chains.clear()
+            return
+        targets = {canonicalize_url(url) for url in urls}
+        stale = [key for key, chain in _chains.items()
+                 if key in targets or any(canonicalize_url(url) in targets for url, _ in chain.hops)]
+        for key in stale:
+            del _chains[key]
+
+
+def resolve_redirects(url):
+    """Follows url's redirects once over HTTP and returns its RedirectChain (None if unreachable)."""
+    chain = get_cached_chain(url)
+    if chain is not None:
+        return chain
+    from http_verifier import get_http_session
+
+    try:
+        response = get_http_session().get(url, timeout=REDIRECT_TIMEOUT, allow_redirects=True, stream=True)
+        hops = [(hop.url, hop.status_code) for hop in response.history] + [(response.url, response.status_code)]
+        response.close()
+    except Exception as e:
+        logger.warning(f"Redirect resolution for {url} failed: {e}")
+        return None
+    if len(hops) > 1:
+        logger.info(f"Redirect chain for {url}: " + " -> ".join(f"{hop_url} ({status})" for hop_url, status in hops))
+    return record_chain(hops)
+
+
+def chain_from_playwright_response(response):
+    """Builds the [(url, status), ...] chain behind a Playwright navigation response."""
+    request = response.request
+    hops = [(request.url, response.status)]
+    previous = request.redirected_from
+    while previous is not None:
+        previous_response = previous.response()
+        hops.insert(0, (previous.url, previous_response.status if previous_response else None))
+        previous = previous.redirected_from
+    return hops
+
+
+def hrefs_equivalent(expected_href, actual_href, base_url):
+    """Compares two hrefs by their canonical forms, without making any request.
+
+    Returns (matched, how) where how is "canonical", or "scheme" when the two differ only in
+    http:// versus https://, the canonical redirect every site makes. A scheme match is logged as
+    a warning, since the CSV should be updated to the https:// form. Trailing slashes are already
+    dropped by canonicalize_url. Other redirects are never followed: an href that merely
+    redirects to the expected URL is a mismatch.
+    """
+    expected = canonicalize_url(expected_href, base_url)
+    actual = canonicalize_url(actual_href, base_url)
+    if expected == actual:
+        return True, "canonical"
+    expected_parts, actual_parts = urlsplit(expected), urlsplit(actual)
+    if {expected_parts.scheme, actual_parts.scheme} == set(DEFAULT_PORTS) and expected_parts[1:] == actual_parts[1:]:
+        logger.warning(f"href {actual_href} differs from expected {expected_href} only in http:// vs https://; update the CSV")
+        return True, "scheme"
+    return False, "canonical"
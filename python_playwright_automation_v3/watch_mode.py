@@ -0,0 +1,199 @@
+"""Watches data/ and re-verifies only added or changed CSV rows against warm browser pages.
+
+Usage:
+    python watch_mode.py [--headed] [--max-page-age 300]
+"""
+import argparse
+import ctypes
+import ctypes.util
+import glob
+import logging
+import os
+import struct
+import sys
+import time
+
+import browser_profile
+import result_cache
+from common import check_element, configure_logging, iter_csv_rows, navigate_to_url
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+POLL_INTERVAL = 0.5
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Minimal inotify wrapper (via libc) yielding the names of files written into a directory."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(0)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self._fd, directory.encode(), mask) < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def wait(self):
+        """Blocks until at least one event arrives and returns the set of changed file names."""
+        buffer = os.read(self._fd, 64 * 1024)
+        names, offset = set(), 0
+        while offset < len(buffer):
+            _, _, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            names.add(buffer[offset:offset + length].rstrip(b"\0").decode())
+            offset += length
+        return names
+
+
+class PollingWatcher:
+    """mtime-polling fallback for platforms without inotify."""
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._mtimes = self._scan()
+
+    def _scan(self):
+        return {os.path.basename(p): os.stat(p).st_mtime_ns for p in glob.glob(os.path.join(self._directory, "*.csv"))}
+
+    def wait(self):
+        while True:
+            time.sleep(POLL_INTERVAL)
+            current = self._scan()
+            changed = {name for name, mtime in current.items() if self._mtimes.get(name) != mtime}
+            self._mtimes = current
+            if changed:
+                return changed
+
+
+def make_watcher(directory):
+    """Returns an inotify watcher on Linux, or the polling fallback elsewhere."""
+    try:
+        return InotifyWatcher(directory)
+    except (OSError, AttributeError, TypeError) as e:
+        logger.warning(f"inotify unavailable ({e}), falling back to polling {directory}")
+        return PollingWatcher(directory)
+
+
+def parse_rows(csv_path):
+    """Returns {row_key: (index, row)} for a data CSV, using the cheap csv-module reader."""
+    try:
+        return {result_cache.compute_row_key(row): (index, row) for index, row in enumerate(iter_csv_rows(csv_path))}
+    except (OSError, UnicodeDecodeError) as e:
+        logger.warning(f"Could not read {csv_path}: {e}")
+        return None
+
+
+def diff_rows(previous, current):
+    """Returns (added_or_changed, removed) rows between two parses of the same CSV."""
+    added = [current[key] for key in current if key not in previous]
+    removed = [previous[key] for key in previous if key not in current]
+    return sorted(added, key=lambda item: item[0]), sorted(removed, key=lambda item: item[0])
+
+
+class WarmPages:
+    """Keeps one already-navigated page per page_url so re-verification skips navigation."""
+
+    def __init__(self, context, max_age):
+        self._context = context
+        self._max_age = max_age
+        self._pages = {}
+
+    def get(self, page_url):
+        page, loaded_at = self._pages.get(page_url, (None, 0))
+        if page is not None and time.monotonic() - loaded_at < self._max_age:
+            return page
+        if page is None:
+            page = self._context.new_page()
+        if not navigate_to_url(page, page_url):
+            return None
+        self._pages[page_url] = (page, time.monotonic())
+        return page
+
+
+def print_result(page_name, index, element_data, outcome, message, elapsed):
+    label = f"{page_name}[{index}] {element_data.get('element_type')} '{element_data.get('text', '')}'"
+    detail = f" - {message.splitlines()[0]}" if outcome == "failed" and message else ""
+    print(f"{outcome.upper():<7} {label} ({elapsed * 1000:.0f} ms){detail}", flush=True)
+
+
+def reverify(csv_name, rows, warm_pages):
+    """Verifies the given (index, row) pairs against the warm page for their page_url."""
+    page_name = csv_name[:-len("_data.csv")]
+    for index, element_data in rows:
+        page_url = (element_data.get("page_url") or "").strip()
+        started = time.monotonic()
+        page = warm_pages.get(page_url) if page_url else None
+        if page is None:
+            print_result(page_name, index, element_data, "failed", f"could not load page_url '{page_url}'", 0)
+            continue
+        outcome, message = check_element(page, element_data)
+        print_result(page_name, index, element_data, outcome, message, time.monotonic() - started)
+
+
+def watch(data_dir=DATA_DIR, headless=True, max_page_age=300.0, verify_existing=False):
+    """Runs the watch loop until interrupted."""
+    from playwright.sync_api import sync_playwright
+
+    def is_data_csv(name):
+        return name.endswith("_data.csv") and not name.endswith("_archived_data.csv")
+
+    parsed = {}
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, "*_data.csv"))):
+        if is_data_csv(os.path.basename(csv_path)):
+            parsed[os.path.basename(csv_path)] = parse_rows(csv_path) or {}
+
+    with sync_playwright() as playwright, \
+            browser_profile.open_context(playwright.chromium, launch_args={"headless": headless}) as context:
+        warm_pages = WarmPages(context, max_page_age)
+        # Navigate every known page up front so the first edit is verified against a warm page.
+        for rows in parsed.values():
+            page_urls = {(row.get("page_url") or "").strip() for _, row in rows.values()}
+            for page_url in page_urls - {""}:
+                warm_pages.get(page_url)
+        if verify_existing:
+            for csv_name, rows in parsed.items():
+                reverify(csv_name, sorted(rows.values(), key=lambda item: item[0]), warm_pages)
+        watcher = make_watcher(data_dir)
+        print(f"Watching {data_dir} for CSV changes (Ctrl+C to stop)...", flush=True)
+        try:
+            while True:
+                for name in sorted(watcher.wait()):
+                    if not is_data_csv(name):
+                        continue
+                    current = parse_rows(os.path.join(data_dir, name))
+                    if current is None:
+                        continue
+                    added, removed = diff_rows(parsed.get(name, {}), current)
+                    parsed[name] = current
+                    if removed:
+                        print(f"{name}: {len(removed)} row(s) removed", flush=True)
+                    if added:
+                        print(f"{name}: re-verifying {len(added)} added/changed row(s)", flush=True)
+                        reverify(name, added, warm_pages)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-verify added or changed CSV rows as data/ is edited.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--max-page-age", type=float, default=300.0,
+                        help="Seconds before a warm page is re-navigated to pick up site changes.")
+    parser.add_argument("--verify-existing", action="store_true", help="Verify every current row once at start-up.")
+    args = parser.parse_args(argv)
+    configure_logging()
+    watch(args.data_dir, headless=not args.headed, max_page_age=args.max_page_age,
+          verify_existing=args.verify_existing)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())